@@ -1,9 +1,12 @@
 import streamlit as st
 import requests
 import json
-import time
+import uuid
+import pandas as pd
 from datetime import datetime
+from urllib.parse import quote
 import config
+import utils
 
 # Set page configuration
 st.set_page_config(
@@ -12,20 +15,59 @@ st.set_page_config(
     layout=config.DEFAULT_LAYOUT
 )
 
-# Function to fetch movie ratings from API with caching
-@st.cache_data(ttl=config.CACHE_TTL, show_spinner=False)
-def fetch_movie_ratings(movie_name):
+# Progress bar labels for the backend's progress stages
+STAGE_LABELS = {
+    "started": "Checking for cached ratings...",
+    "starting": "Starting the search...",
+    "searching": "Searching ticket booking platforms...",
+    "reading_results": "Reading search results...",
+    "parsing": "Collecting ratings...",
+    "done": "Done!"
+}
+
+# Shared across reruns and sessions: background prefetching and the results it keeps
+@st.cache_resource
+def get_prefetcher():
+    """Return the process-wide ratings prefetcher."""
+    return utils.RatingsPrefetcher()
+
+def client_headers():
+    """Headers identifying this browser session to the API."""
+    return {"X-Client-ID": st.session_state.get('client_id', "")}
+
+def show_busy(retry_after):
+    """Tell the user the rating service is shedding load and when to retry.
+
+    Args:
+        retry_after: Seconds to wait, as sent by the API (may be None)
+    """
+    wait = f" in about {retry_after} seconds" if retry_after else " in a moment"
+    st.warning(f"🚦 Our rating service is busy right now. Please try again{wait}.")
+
+# Function to fetch movie ratings from API with live progress
+def fetch_movie_ratings(movie_name, progress_bar=None, status_message=None):
     """Fetch movie ratings from the API with proper error handling and caching.
 
+    Results already fetched (or prefetched in the background) are returned
+    immediately. Otherwise the streaming endpoint is used and its progress
+    events drive the progress bar.
+
     Args:
         movie_name: Name of the movie to search for
+        progress_bar: Optional Streamlit progress bar to update
+        status_message: Optional Streamlit placeholder for the current stage
 
     Returns:
         Movie ratings data or None if an error occurs
     """
+    prefetcher = get_prefetcher()
+    cached = prefetcher.get(movie_name)
+    if cached is not None:
+        return cached
+
     try:
         # API endpoint
-        url = f"{config.API_BASE_URL}/movie-ratings"
+        url = f"{config.API_BASE_URL}/stream/movie-ratings/{quote(movie_name, safe='')}"
 
         # Prepare request payload
         payload = {
@@ -39,36 +81,17 @@ def fetch_movie_ratings(movie_name):
             'endpoint': url
         })
 
-        # Show a spinner while waiting for the API response
-        with st.spinner(f"Searching for ratings for '{movie_name}'..."):
-            # Set a timeout for the request to prevent hanging
-            response = requests.post(url, json=payload, timeout=config.API_TIMEOUT)
-
+        # Set a timeout for the request to prevent hanging
+        with utils.get_http_session().get(url, stream=True, headers=client_headers(), timeout=config.API_TIMEOUT) as response:
             # Add response to logs
             st.session_state['api_logs'][-1]['status_code'] = response.status_code
 
-            if response.status_code == 200:
-                data = response.json()
-
-                # Add successful response to logs
-                st.session_state['api_logs'][-1]['response_size'] = len(str(data))
+            if response.status_code in (429, 503):
+                st.session_state['api_logs'][-1]['error'] = f"HTTP {response.status_code}: {response.text}"
+                show_busy(response.headers.get("Retry-After"))
+                return None
 
-                # Check if the expected keys exist
-                if "status" in data and "data" in data:
-                    return data["data"]
-                else:
-                    # Log the error
-                    st.session_state['api_logs'][-1]['error'] = "Invalid response structure"
-
-                    # Show error in UI with collapsible details
-                    st.error("😕 We couldn't process the movie data correctly.")
-                    with st.expander("Technical Details"):
-                        st.write("API response does not contain the expected data structure.")
-                        st.write("Expected keys: status, data")
-                        st.write("Actual response structure:")
-                        st.json(data)
-                    return None
-            else:
+            if response.status_code != 200:
                 # Log the error
                 st.session_state['api_logs'][-1]['error'] = f"HTTP {response.status_code}: {response.text}"
 
@@ -79,6 +102,47 @@ def fetch_movie_ratings(movie_name):
                     st.code(response.text)
                 return None
 
+            data = None
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+
+                # Update the progress bar with the backend's real progress
+                if progress_bar is not None:
+                    stage = STAGE_LABELS.get(event.get("stage"), "Working...")
+                    utils.update_progress(progress_bar, status_message, event.get("progress", 0) * 100, 100, stage)
+
+                if event.get("stage") == "done":
+                    if event.get("status_code") in (429, 503):
+                        st.session_state['api_logs'][-1]['error'] = event["result"].get("message")
+                        show_busy(event.get("retry_after"))
+                        return None
+                    data = event.get("result")
+
+        # Add successful response to logs
+        st.session_state['api_logs'][-1]['response_size'] = len(str(data))
+
+        # Check if the expected keys exist
+        if data and "status" in data and "data" in data:
+            if data["status"] == "success" and data["data"]:
+                prefetcher.put(movie_name, data["data"])
+            elif data["status"] == "estimated":
+                st.warning(f"⚠️ {data.get('message')}. Treat the review percentages as rough estimates.")
+            return data["data"]
+        else:
+            # Log the error
+            st.session_state['api_logs'][-1]['error'] = "Invalid response structure"
+
+            # Show error in UI with collapsible details
+            st.error("😕 We couldn't process the movie data correctly.")
+            with st.expander("Technical Details"):
+                st.write("API response does not contain the expected data structure.")
+                st.write("Expected keys: status, data")
+                st.write("Actual response structure:")
+                st.json(data)
+            return None
+
     except requests.exceptions.Timeout:
         st.error("⏱️ The request timed out. Our rating service is taking longer than expected.")
         st.info("Please try again with a different movie name.")
@@ -193,6 +257,122 @@ def display_movie_ratings(ratings_data):
         """
         st.markdown(html, unsafe_allow_html=True)
 
+# Function to fetch ratings for several movies in one backend call
+def fetch_movie_comparison(movie_names):
+    """Fetch ratings for several movies, sending every title not already at hand in one request.
+
+    Args:
+        movie_names: Movie names to compare
+
+    Returns:
+        Dictionary mapping each movie name to its list of ratings (empty if none were found)
+    """
+    prefetcher = get_prefetcher()
+    results = {}
+    missing = []
+    for movie_name in movie_names:
+        cached = prefetcher.get(movie_name)
+        if cached is not None:
+            results[movie_name] = cached
+        else:
+            missing.append(movie_name)
+
+    if missing:
+        url = f"{config.API_BASE_URL}/movie-ratings/batch"
+        payload = {"movie_names": missing}
+        st.session_state.setdefault('api_logs', []).append({
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'request': payload,
+            'endpoint': url
+        })
+
+        try:
+            response = utils.get_http_session().post(url, json=payload, headers=client_headers(), timeout=config.API_TIMEOUT)
+            st.session_state['api_logs'][-1]['status_code'] = response.status_code
+            if response.status_code in (429, 503):
+                st.session_state['api_logs'][-1]['error'] = f"HTTP {response.status_code}: {response.text}"
+                show_busy(response.headers.get("Retry-After"))
+                return None
+            if response.status_code != 200:
+                st.session_state['api_logs'][-1]['error'] = f"HTTP {response.status_code}: {response.text}"
+                st.error("😕 We're having trouble comparing these movies right now. Please try again later.")
+                with st.expander("Technical Details"):
+                    st.write(f"Error: API returned status code {response.status_code}")
+                    st.code(response.text)
+                return None
+
+            retry_after = None
+            estimated = []
+            for item in response.json().get("results", []):
+                result = item.get("result") or {}
+                data = result.get("data") or []
+                if result.get("status") == "success" and data:
+                    prefetcher.put(item["movie_name"], data)
+                elif result.get("status") == "estimated":
+                    estimated.append(item["movie_name"])
+                if result.get("retry_after"):
+                    # This title was refused by admission control rather than not found
+                    retry_after = max(retry_after or 0, result["retry_after"])
+                results[item["movie_name"]] = data
+            if retry_after:
+                show_busy(retry_after)
+            if estimated:
+                st.warning(f"⚠️ Review percentages for {', '.join(estimated)} are estimated from their ratings.")
+
+        except requests.exceptions.Timeout:
+            st.error("⏱️ The request timed out. Our rating service is taking longer than expected.")
+            return None
+
+        except requests.exceptions.ConnectionError:
+            st.error("🔌 Connection error. We couldn't reach our rating service.")
+            st.info("Please check your internet connection and try again.")
+            return None
+
+    return {movie_name: results.get(movie_name, []) for movie_name in movie_names}
+
+def build_comparison_frame(results):
+    """Flatten per-movie ratings into one DataFrame with a row per movie and platform.
+
+    Args:
+        results: Dictionary mapping movie names to lists of platform ratings
+
+    Returns:
+        DataFrame with a movie column followed by the platform rating fields
+    """
+    rows = [
+        {"movie": movie_name, **rating}
+        for movie_name, ratings in results.items()
+        for rating in ratings
+    ]
+    columns = ["movie", "platform", "movie_title", "movie_rating", "type_of_movie",
+               "positive_review_percentage", "negative_review_percentage"]
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+def display_movie_comparison(frame):
+    """Display a side-by-side comparison as a fixed set of elements, however many movies there are.
+
+    Args:
+        frame: DataFrame built by build_comparison_frame
+    """
+    if frame.empty:
+        st.warning("No ratings found for these movies.")
+        return
+
+    summary = frame.groupby("movie", sort=False).agg(
+        average_rating=("movie_rating", "mean"),
+        positive_reviews=("positive_review_percentage", "mean"),
+        negative_reviews=("negative_review_percentage", "mean"),
+        platforms=("platform", "nunique")
+    ).round(1)
+    st.dataframe(summary)
+
+    st.markdown("#### Rating by platform")
+    by_platform = frame.pivot_table(index="platform", columns="movie", values="movie_rating", aggfunc="mean")
+    st.bar_chart(by_platform)
+
+    with st.expander("All ratings"):
+        st.dataframe(frame, hide_index=True)
+
 # Initialize session state
 def init_session_state():
     """Initialize session state variables."""
@@ -202,6 +382,11 @@ def init_session_state():
         st.session_state.current_movie = None
     if 'loading' not in st.session_state:
         st.session_state.loading = False
+    if 'compare_movies' not in st.session_state:
+        st.session_state.compare_movies = []
+    if 'client_id' not in st.session_state:
+        # Lets the API rate limit each browser session separately
+        st.session_state.client_id = uuid.uuid4().hex
 
 # Main app
 def main():
@@ -213,65 +398,96 @@ def main():
     st.title(f"{config.APP_ICON} Movie Rating Aggregator")
     st.markdown("Search for a movie to see ratings and reviews from multiple platforms.")
 
-    # Search form
-    with st.form(key="search_form"):
-        movie_name = st.text_input("Enter movie name:", placeholder="e.g., Dune: Part Two")
-        col1, col2 = st.columns([1, 5])
-        with col1:
-            search_button = st.form_submit_button("Search")
-        with col2:
-            st.markdown("")  # Empty space for alignment
-
-    # Process search when button is clicked
-    if search_button and movie_name:
-        st.session_state.loading = True
-        st.session_state.current_movie = movie_name
+    # Choose between a single search and a side-by-side comparison
+    mode = st.radio("Mode", ["Search a movie", "Compare movies"], horizontal=True, label_visibility="collapsed")
+
+    if mode == "Compare movies":
+        with st.form(key="compare_form"):
+            titles = st.text_area(
+                f"Enter up to {config.MAX_COMPARE_MOVIES} movie names, one per line:",
+                value="\n".join(st.session_state.compare_movies or st.session_state.search_history),
+                placeholder="Dune: Part Two\nOppenheimer"
+            )
+            compare_button = st.form_submit_button("Compare")
+
+        if compare_button:
+            movie_names = list(dict.fromkeys(line.strip() for line in titles.splitlines() if line.strip()))
+            if len(movie_names) > config.MAX_COMPARE_MOVIES:
+                st.warning(f"Comparing the first {config.MAX_COMPARE_MOVIES} movies.")
+            st.session_state.compare_movies = movie_names[:config.MAX_COMPARE_MOVIES]
+
+        if st.session_state.compare_movies:
+            with st.spinner(f"Fetching ratings for {len(st.session_state.compare_movies)} movies..."):
+                results = fetch_movie_comparison(st.session_state.compare_movies)
+            if results is not None:
+                st.subheader("Comparison")
+                display_movie_comparison(build_comparison_frame(results))
+                missing = [movie for movie, ratings in results.items() if not ratings]
+                if missing:
+                    st.info("No ratings found for: " + ", ".join(missing))
+    else:
+        # Search form
+        with st.form(key="search_form"):
+            movie_name = st.text_input("Enter movie name:", placeholder="e.g., Dune: Part Two")
+            col1, col2 = st.columns([1, 5])
+            with col1:
+                search_button = st.form_submit_button("Search")
+            with col2:
+                st.markdown("")  # Empty space for alignment
+
+        # Process search when button is clicked
+        if search_button and movie_name:
+            st.session_state.loading = True
+            st.session_state.current_movie = movie_name
         
-        # Add to search history if not already present
-        if movie_name not in st.session_state.search_history:
-            st.session_state.search_history.append(movie_name)
-            # Keep only the last 5 searches
-            if len(st.session_state.search_history) > 5:
-                st.session_state.search_history.pop(0)
-
-    # Display search history
-    if st.session_state.search_history:
-        st.sidebar.header("Recent Searches")
-        for movie in st.session_state.search_history:
-            if st.sidebar.button(movie, key=f"history_{movie}"):
-                st.session_state.current_movie = movie
-                st.session_state.loading = True
-                st.experimental_rerun()
-
-    # If loading or we have a current movie, fetch and display data
-    if st.session_state.loading or st.session_state.current_movie:
-        # Get movie name from session state if available
-        if st.session_state.current_movie:
-            movie_name = st.session_state.current_movie
-
-        # Show a progress bar while loading
-        if st.session_state.loading:
-            progress_bar = st.progress(0)
-            for i in range(100):
-                # Update progress bar
-                progress_bar.progress(i + 1)
-                # Add a small delay for visual effect
-                time.sleep(0.01)
-            st.session_state.loading = False
-
-        # Fetch data from API with error handling
-        try:
-            with st.spinner(f"Fetching ratings for '{movie_name}'..."):
-                ratings_data = fetch_movie_ratings(movie_name)
-
-            # Display the results
-            if ratings_data:
-                st.subheader(f"Ratings for '{movie_name}'")
-                display_movie_ratings(ratings_data)
-            else:
-                st.error(f"No ratings found for '{movie_name}'. Please try another movie.")
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
+            # Add to search history if not already present
+            if movie_name not in st.session_state.search_history:
+                st.session_state.search_history.append(movie_name)
+                # Keep only the last 5 searches
+                if len(st.session_state.search_history) > 5:
+                    st.session_state.search_history.pop(0)
+
+        # Display search history
+        if st.session_state.search_history:
+            # Warm the cache for the other history entries so clicking one renders instantly; the
+            # current movie is fetched in the foreground, and a background request for it would
+            # compete with that one (and be charged to the client a second time)
+            get_prefetcher().prefetch(
+                [movie for movie in st.session_state.search_history if movie != st.session_state.current_movie],
+                client_headers()["X-Client-ID"]
+            )
+
+            st.sidebar.header("Recent Searches")
+            for movie in st.session_state.search_history:
+                if st.sidebar.button(movie, key=f"history_{movie}"):
+                    st.session_state.current_movie = movie
+                    st.session_state.loading = True
+                    st.experimental_rerun()
+
+        # If loading or we have a current movie, fetch and display data
+        if st.session_state.loading or st.session_state.current_movie:
+            # Get movie name from session state if available
+            if st.session_state.current_movie:
+                movie_name = st.session_state.current_movie
+
+            # Fetch data from API with error handling; the progress bar follows the backend
+            try:
+                ratings_data = get_prefetcher().get(movie_name)
+                if ratings_data is None:
+                    progress_bar, status_message = utils.create_progress_bar(100)
+                    ratings_data = fetch_movie_ratings(movie_name, progress_bar, status_message)
+                    progress_bar.empty()
+                    status_message.empty()
+                st.session_state.loading = False
+
+                # Display the results
+                if ratings_data:
+                    st.subheader(f"Ratings for '{movie_name}'")
+                    display_movie_ratings(ratings_data)
+                else:
+                    st.error(f"No ratings found for '{movie_name}'. Please try another movie.")
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
 
     # Add a footer
     st.markdown("---")
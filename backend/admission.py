@@ -0,0 +1,239 @@
+"""
+Admission control for agent runs.
+
+Cache hits are cheap and always served. A miss has to run the agent, which is
+slow and costs Groq and Serper calls, so before it starts it must pass two
+checks:
+
+- the client's token bucket (``CLIENT_RATE_LIMIT`` runs per minute, bursts of
+  ``CLIENT_BURST``), otherwise 429;
+- a free slot among ``MAX_CONCURRENT_AGENT_RUNS``, waiting in a queue of at
+  most ``MAX_QUEUED_AGENT_RUNS`` for up to ``ADMISSION_QUEUE_TIMEOUT``
+  seconds, otherwise 503.
+
+Rejections carry a Retry-After estimate, so clients back off instead of
+piling up requests that would time out anyway.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque
+
+import config
+from backend.metrics import REGISTRY
+
+admitted_runs = REGISTRY.counter(
+    "movieratings_agent_runs_admitted_total", "Agent runs admitted by admission control"
+)
+shed_requests = REGISTRY.counter(
+    "movieratings_requests_shed_total", "Requests rejected by admission control", ("reason",)
+)
+cache_hits = REGISTRY.counter(
+    "movieratings_cache_hits_total", "Rating lookups answered from the cache without running the agent"
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request that needs an agent run is not admitted
+    """
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(f"Request not admitted ({reason}), retry after {math.ceil(retry_after)}s")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``rate`` tokens per second
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float, amount: float = 1.0) -> float:
+        """
+        Take tokens if enough are available
+
+        Args:
+            now: Current time.monotonic()
+            amount: Tokens to take (at most the capacity)
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds until enough are available
+        """
+        amount = min(amount, self.capacity)
+        # now may predate the bucket's creation (it is read before the lookup)
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(now, self.updated)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float(config.ADMISSION_QUEUE_TIMEOUT)
+
+
+class ClientRateLimiter:
+    """
+    Per-client token buckets, keeping the most recently seen ``max_clients``
+    """
+    def __init__(self, per_minute: float, burst: int, max_clients: int = 10_000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client_id: str):
+        """
+        Charge one agent run to a client
+
+        Raises:
+            AdmissionRejected: With status 429 if the client is over its limit
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[client_id] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_id)
+            wait = bucket.take(now)
+        if wait > 0:
+            shed_requests.inc(reason="rate_limited")
+            raise AdmissionRejected(429, "rate_limited", wait)
+
+    def refund(self, client_id: str):
+        """Give back the run charged by check() when the run never started."""
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is not None:
+                bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+
+
+class AgentRunQueue:
+    """
+    Bounded FIFO queue in front of a fixed number of concurrent agent runs
+
+    Used from the event loop only; slots are handed directly from a finishing
+    run to the next waiter.
+    """
+    def __init__(self, max_running: int, max_queued: int, max_wait: float):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Exponential moving average of run duration, for Retry-After estimates
+        self._average_run = 10.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """Estimate how long until a newly queued run would start."""
+        return (self.queued + 1) * self._average_run / max(1, self.max_running)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one agent run slot for the duration of the block
+
+        Raises:
+            AdmissionRejected: With status 503 if the queue is full or the wait times out
+        """
+        if self.running < self.max_running and not self._waiters:
+            self.running += 1
+        elif self.queued >= self.max_queued:
+            shed_requests.inc(reason="queue_full")
+            raise AdmissionRejected(503, "queue_full", self.retry_after())
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+            except asyncio.TimeoutError:
+                if not self._hand_back(waiter):
+                    shed_requests.inc(reason="queue_timeout")
+                    raise AdmissionRejected(503, "queue_timeout", self.retry_after())
+            except asyncio.CancelledError:
+                # The client went away while queued
+                if self._hand_back(waiter):
+                    self._release()
+                raise
+
+        admitted_runs.inc()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._average_run = 0.8 * self._average_run + 0.2 * (time.monotonic() - started)
+            self._release()
+
+    def _hand_back(self, waiter: asyncio.Future) -> bool:
+        # Leave the queue; returns True if a slot had already been handed over
+        if waiter.done():
+            return True
+        self._waiters.remove(waiter)
+        waiter.cancel()
+        return False
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the next waiter; running is unchanged
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+
+client_limiter = ClientRateLimiter(config.CLIENT_RATE_LIMIT, config.CLIENT_BURST)
+agent_runs = AgentRunQueue(
+    config.MAX_CONCURRENT_AGENT_RUNS,
+    config.MAX_QUEUED_AGENT_RUNS,
+    config.ADMISSION_QUEUE_TIMEOUT,
+)
+
+REGISTRY.gauge(
+    "movieratings_agent_runs_in_progress", "Agent runs currently executing",
+    callback=lambda: agent_runs.running
+)
+REGISTRY.gauge(
+    "movieratings_agent_run_queue_depth", "Agent runs waiting for a slot",
+    callback=lambda: agent_runs.queued
+)
+
+
+@asynccontextmanager
+async def admit_agent_run(client_id: str) -> AsyncIterator[None]:
+    """
+    Admit one agent run for a client, holding its slot for the block
+
+    A run that never gets a slot (queue full or timed out, client gone) is not
+    charged to the client.
+
+    Raises:
+        AdmissionRejected: If the client is rate limited or the queue is full
+    """
+    client_limiter.check(client_id)
+    started = False
+    try:
+        async with agent_runs.slot():
+            started = True
+            yield
+    except (AdmissionRejected, asyncio.CancelledError):
+        if not started:
+            client_limiter.refund(client_id)
+        raise
@@ -0,0 +1,484 @@
+"""
+Shared cache tier for the Movie Rating Aggregator backend.
+
+Every uvicorn/gunicorn worker talks to the same backend, so a title looked up by
+one worker is a hit for all of them:
+
+- ``memory``: per-process dictionary (development and tests)
+- ``sqlite``: host-local SQLite database in WAL mode, shared by workers on one host
+- ``redis``: any server speaking the Redis protocol, shared across hosts
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import config
+from backend import encoding
+
+logger = logging.getLogger(__name__)
+
+# Seconds between purges of expired rows from the SQLite cache; each set checks whether one is due
+PURGE_INTERVAL = 60
+
+
+def canonical_title(movie_name: str) -> str:
+    """
+    Normalize a movie name so that trivial variations share a cache entry
+
+    Args:
+        movie_name: Movie name as typed by the user
+
+    Returns:
+        Lower-cased title with punctuation and repeated whitespace removed
+    """
+    title = unicodedata.normalize("NFKC", movie_name).casefold()
+    title = re.sub(r"[^\w\s]", " ", title)
+    return " ".join(title.split())
+
+
+def cache_key(namespace: str, value: str) -> str:
+    """
+    Build a cache key for a value within a namespace
+
+    Args:
+        namespace: Kind of cached data (e.g. "ratings", "serper")
+        value: Identifying value, hashed to keep keys short and safe
+
+    Returns:
+        Cache key string
+    """
+    digest = hashlib.sha1(value.encode("utf-8")).hexdigest()
+    return f"movieratings:{namespace}:{digest}"
+
+
+class CacheBackend:
+    """
+    Base class for cache backends storing bytes values with a TTL
+    """
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set the key only if it does not exist; returns True if it was set."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def release(self, key: str, value: bytes) -> bool:
+        """Delete the key only if it still holds value (a lock taken with add); returns True if deleted."""
+        raise NotImplementedError
+
+    def get_json(self, key: str) -> Any:
+        value = self.get(key)
+        return encoding.loads(value) if value is not None else None
+
+    def set_json(self, key: str, value: Any, ttl: float):
+        self.set(key, encoding.dumps(value), ttl)
+
+
+class MemoryCache(CacheBackend):
+    """
+    Per-process cache; not shared between workers
+    """
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.time():
+                return False
+            self._data[key] = (value, time.time() + ttl)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def release(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != value:
+                return False
+            del self._data[key]
+            return True
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Host-local cache shared by all workers through a WAL-mode SQLite file
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._next_purge = 0.0
+        self._purge_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; WAL lets readers proceed while another worker writes
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl)
+        )
+        self._maybe_purge()
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def release(self, key: str, value: bytes) -> bool:
+        cursor = self._connection().execute("DELETE FROM cache WHERE key = ? AND value = ?", (key, value))
+        return cursor.rowcount == 1
+
+    def _maybe_purge(self):
+        # get skips expired rows without deleting them, so writers clear them out now and then
+        now = time.monotonic()
+        if now < self._next_purge or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = now + PURGE_INTERVAL
+            self.purge_expired()
+        except sqlite3.Error as e:
+            logger.warning("Cache purge failed: %s", e)
+        finally:
+            self._purge_lock.release()
+
+    def purge_expired(self) -> int:
+        """
+        Remove expired rows
+
+        Returns:
+            Number of rows removed
+        """
+        cursor = self._connection().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+
+class RedisError(Exception):
+    """Error reply returned by a Redis-protocol server."""
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache backed by any Redis-protocol server
+
+    Speaks the RESP protocol directly over a socket, one connection per thread,
+    so no client library is required.
+    """
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=5)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._send("AUTH", self.password)
+        if self.db:
+            self._send("SELECT", str(self.db))
+
+    def _close(self):
+        for name in ("reader", "sock"):
+            handle = getattr(self._local, name, None)
+            if handle is not None:
+                try:
+                    handle.close()
+                except OSError:
+                    pass
+                setattr(self._local, name, None)
+
+    def _send(self, *args) -> Any:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self) -> Any:
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply from cache server: {line!r}")
+
+    def _command(self, *args) -> Any:
+        # Retry once on a stale connection (server restart, idle timeout)
+        for attempt in range(2):
+            if getattr(self._local, "sock", None) is None:
+                self._connect()
+            try:
+                return self._send(*args)
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt == 1:
+                    raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return self._command("SET", key, value, "NX", "PX", max(1, int(ttl * 1000))) is not None
+
+    def delete(self, key: str):
+        self._command("DEL", key)
+
+    def release(self, key: str, value: bytes) -> bool:
+        # GET and DEL in one optimistic transaction: EXEC fails if the key changed after WATCH
+        for attempt in range(2):
+            if getattr(self._local, "sock", None) is None:
+                self._connect()
+            try:
+                self._send("WATCH", key)
+                if self._send("GET", key) != value:
+                    self._send("UNWATCH")
+                    return False
+                self._send("MULTI")
+                self._send("DEL", key)
+                return self._send("EXEC") is not None
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt == 1:
+                    raise
+
+
+class TieredCache(CacheBackend):
+    """
+    In-process tier in front of the shared cache
+
+    Hits in the local tier skip the shared backend and JSON decoding entirely.
+    Local entries live at most ``local_ttl`` seconds so that workers converge
+    on the shared value. Locks (add/delete) always go to the shared tier.
+    """
+    def __init__(self, local: CacheBackend, shared: CacheBackend, local_ttl: float):
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value, self.local_ttl)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.shared.set(key, value, ttl)
+        self.local.set(key, value, min(ttl, self.local_ttl))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return self.shared.add(key, value, ttl)
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def release(self, key: str, value: bytes) -> bool:
+        return self.shared.release(key, value)
+
+    def get_json(self, key: str) -> Any:
+        value = self.local.get_json(key)
+        if value is None:
+            value = self.shared.get_json(key)
+            if value is not None:
+                self.local.set_json(key, value, self.local_ttl)
+        return value
+
+    def set_json(self, key: str, value: Any, ttl: float):
+        self.shared.set_json(key, value, ttl)
+        self.local.set_json(key, value, min(ttl, self.local_ttl))
+
+
+def create_cache(backend: str, url: str) -> CacheBackend:
+    """
+    Create a cache backend
+
+    Args:
+        backend: One of "memory", "sqlite" or "redis"
+        url: SQLite file path or redis:// URL, depending on the backend
+
+    Returns:
+        Cache backend instance
+    """
+    if backend == "sqlite":
+        return SQLiteCache(url)
+    if backend == "redis":
+        return RedisCache(url)
+    if backend == "memory":
+        return MemoryCache()
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+_shared_cache = None
+
+
+def get_shared_cache() -> CacheBackend:
+    """
+    Return the process-wide cache configured by CACHE_BACKEND / CACHE_URL
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = create_cache(config.CACHE_BACKEND, config.CACHE_URL)
+    return _shared_cache
+
+
+async def single_flight(
+    cache: CacheBackend,
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    ttl: float,
+    cacheable: Callable[[Any], bool] = lambda value: value is not None,
+    negative: Callable[[Any], bool] = lambda value: False,
+    negative_ttl: Optional[float] = None,
+) -> Tuple[bytes, bool]:
+    """
+    Return a cached value, computing it in at most one worker at a time
+
+    The worker that wins the lock computes and stores the value; the others poll
+    the cache until it appears, the lock is released, or the wait times out.
+    Values are cached in their encoded form, so a hit is returned without any
+    decoding or re-encoding.
+
+    Args:
+        cache: Cache backend shared between workers
+        key: Cache key of the value
+        compute: Coroutine function producing the value on a miss
+        ttl: Time-to-live of the cached value in seconds
+        cacheable: Predicate deciding whether a computed value is stored
+        negative: Predicate marking cacheable values that record the absence of
+            data (e.g. an unknown title); these are stored for ``negative_ttl``
+        negative_ttl: Time-to-live of negative values, defaults to ``ttl``
+
+    Returns:
+        Encoded JSON of the cached or freshly computed value, and whether that
+        value is cacheable (always true for hits)
+    """
+    # The in-process tier is answered inline; every shared-backend call is blocking I/O and runs in a thread
+    body = cache.local.get(key) if isinstance(cache, TieredCache) else None
+    if body is None:
+        body = await asyncio.to_thread(cache.get, key)
+    if body is not None:
+        return body, True
+
+    lock_key = f"{key}:lock"
+    # Unique per call: coroutines of one worker share a thread
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}".encode("utf-8")
+    deadline = time.monotonic() + config.CACHE_LOCK_WAIT
+
+    while not await asyncio.to_thread(cache.add, lock_key, owner, config.CACHE_LOCK_TTL):
+        # Another worker is computing this key; wait for its result
+        await asyncio.sleep(config.CACHE_POLL_INTERVAL)
+        body = await asyncio.to_thread(cache.get, key)
+        if body is not None:
+            return body, True
+        if time.monotonic() > deadline:
+            logger.warning("Timed out waiting for another worker, computing locally", extra={"key": key})
+            value = await compute()
+            return encoding.dumps(value), cacheable(value)
+
+    try:
+        value = await compute()
+        body = encoding.dumps(value)
+        is_cacheable = cacheable(value)
+        if is_cacheable:
+            value_ttl = negative_ttl if negative_ttl is not None and negative(value) else ttl
+            await asyncio.to_thread(cache.set, key, body, value_ttl)
+        return body, is_cacheable
+    finally:
+        # A run that outlived CACHE_LOCK_TTL must not release the lock another worker has taken since
+        if not await asyncio.to_thread(cache.release, lock_key, owner):
+            logger.warning("Lock expired before the value was computed", extra={"key": key})
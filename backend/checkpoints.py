@@ -0,0 +1,383 @@
+"""
+Checkpoints of agent runs, so an interrupted lookup resumes where it stopped.
+
+The compiled agent graph saves its state to SQLite after every node. Runs are
+keyed on the canonical title and the CHECKPOINT_WINDOW the request falls in,
+so a client retry after a timeout, a retry after an upstream error, or a
+follow-up lookup from another worker continues from the last completed node
+instead of repeating the searches it already made.
+
+Only the latest checkpoint of a run and its parent are kept. Runs idle for
+longer than CHECKPOINT_TTL are dropped, and the oldest runs are dropped
+first while the stored checkpoints exceed CHECKPOINT_MAX_MB.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Seconds between retention passes; each put checks whether one is due
+PRUNE_INTERVAL = 30
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpoint saver on a local SQLite file, with bounded retention
+    """
+    def __init__(self, path: str, ttl: float, max_bytes: int, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._next_prune = 0.0
+        self._prune_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT NOT NULL, "
+            "checkpoint_ns TEXT NOT NULL, "
+            "checkpoint_id TEXT NOT NULL, "
+            "parent_id TEXT, "
+            "type TEXT NOT NULL, "
+            "checkpoint BLOB NOT NULL, "
+            "metadata_type TEXT NOT NULL, "
+            "metadata BLOB NOT NULL, "
+            "saved_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_saved_at ON checkpoints (saved_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoint_writes ("
+            "thread_id TEXT NOT NULL, "
+            "checkpoint_ns TEXT NOT NULL, "
+            "checkpoint_id TEXT NOT NULL, "
+            "task_id TEXT NOT NULL, "
+            "idx INTEGER NOT NULL, "
+            "channel TEXT NOT NULL, "
+            "type TEXT NOT NULL, "
+            "value BLOB NOT NULL, "
+            "task_path TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _tuple(self, conn: sqlite3.Connection, row: Tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        writes = conn.execute(
+            "SELECT task_id, channel, type, value FROM checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id
+            }},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Load the checkpoint named in config, or the latest one of its thread."""
+        configurable = config["configurable"]
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: List[Any] = [configurable["thread_id"], configurable.get("checkpoint_ns", "")]
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        conn = self._connection()
+        row = conn.execute(query, params).fetchone()
+        return self._tuple(conn, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Yield the stored checkpoints matching config, newest first."""
+        clauses, params = [], []
+        if config is not None:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(configurable["thread_id"])
+            if configurable.get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before is not None and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        conn = self._connection()
+        for row in conn.execute(query, params).fetchall():
+            if limit is not None and limit <= 0:
+                return
+            checkpoint = self._tuple(conn, row)
+            # Metadata is stored serialized, so it is filtered here rather than in SQL
+            if filter and not all(checkpoint.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield checkpoint
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """
+        Save a checkpoint, dropping the thread's checkpoints older than its parent
+
+        Args:
+            config: Config of the parent checkpoint
+            checkpoint: Checkpoint to save
+            metadata: Metadata of the checkpoint
+            new_versions: Channel versions written since the parent (unused;
+                the whole checkpoint is stored)
+
+        Returns:
+            Config naming the saved checkpoint
+        """
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        parent_id = configurable.get("checkpoint_id")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_id, type, "
+                "checkpoint, metadata_type, metadata, saved_at, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_, serialized,
+                 metadata_type, serialized_metadata, time.time(), len(serialized) + len(serialized_metadata))
+            )
+            # Resuming needs only the latest checkpoint; the parent is kept for its pending writes
+            keep = [checkpoint["id"], parent_id or checkpoint["id"]]
+            for table in ("checkpoints", "checkpoint_writes"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN (?, ?)",
+                    (thread_id, checkpoint_ns, *keep)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._maybe_prune()
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save the writes of a task that completed from the checkpoint in config."""
+        configurable = config["configurable"]
+        rows = []
+        for index, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append((
+                configurable["thread_id"], configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"],
+                task_id, WRITES_IDX_MAP.get(channel, index), channel, type_, serialized, task_path, len(serialized)
+            ))
+        # Special writes (errors, interrupts) replace earlier ones; regular writes are never overwritten
+        conn = self._connection()
+        special = [row for row in rows if row[4] < 0]
+        regular = [row for row in rows if row[4] >= 0]
+        for verb, selected in (("REPLACE", special), ("IGNORE", regular)):
+            conn.executemany(
+                f"INSERT OR {verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+                "channel, type, value, task_path, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                selected
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and write of a thread."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM checkpoint_writes WHERE thread_id = ?", (thread_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now < self._next_prune or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_prune = now + PRUNE_INTERVAL
+            self.prune_expired()
+        except sqlite3.Error as e:
+            logger.warning("Checkpoint pruning failed: %s", e)
+        finally:
+            self._prune_lock.release()
+
+    def prune_expired(self) -> int:
+        """
+        Enforce the retention period and the size cap
+
+        Threads whose latest checkpoint is older than ``ttl`` are deleted, then
+        the least recently saved threads until the stored checkpoints and
+        writes fit in ``max_bytes``.
+
+        Returns:
+            Number of threads deleted
+        """
+        conn = self._connection()
+        threads = conn.execute(
+            "SELECT thread_id, MAX(saved_at), SUM(size) FROM checkpoints GROUP BY thread_id ORDER BY MAX(saved_at)"
+        ).fetchall()
+        write_sizes = dict(conn.execute("SELECT thread_id, SUM(size) FROM checkpoint_writes GROUP BY thread_id"))
+        total = sum(size for _, _, size in threads) + sum(write_sizes.values())
+
+        expired = []
+        cutoff = time.time() - self.ttl
+        for thread_id, saved_at, size in threads:
+            if saved_at >= cutoff and total <= self.max_bytes:
+                break
+            expired.append(thread_id)
+            total -= size + write_sizes.get(thread_id, 0)
+
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        if expired:
+            logger.debug("Pruned %d checkpoint thread(s)", len(expired))
+        return len(expired)
+
+    # The graph runs async from ainvoke/astream; SQLite calls move to a worker thread
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def lookup_thread(canonical_title: str, now: Optional[float] = None) -> str:
+    """
+    Checkpoint thread of a lookup: its canonical title and request window
+
+    Lookups of the same title within one CHECKPOINT_WINDOW share a thread, so
+    a retry resumes the run of the request it replaces.
+    """
+    now = time.time() if now is None else now
+    return f"{canonical_title}@{int(now // config.CHECKPOINT_WINDOW)}"
+
+
+_checkpointer = None
+
+
+def get_checkpointer() -> Optional[SQLiteCheckpointer]:
+    """
+    Return the process-wide checkpointer, or None with CHECKPOINT_ENABLED off
+    """
+    global _checkpointer
+    if not config.CHECKPOINT_ENABLED:
+        return None
+    if _checkpointer is None:
+        _checkpointer = SQLiteCheckpointer(
+            config.CHECKPOINT_DB_PATH, config.CHECKPOINT_TTL, int(config.CHECKPOINT_MAX_MB * 1024 * 1024)
+        )
+    return _checkpointer
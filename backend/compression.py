@@ -0,0 +1,203 @@
+"""
+Response compression.
+
+Responses are compressed with brotli when it is installed and the client
+accepts it, otherwise with gzip. Small bodies are sent as-is because the
+compression framing would outweigh the savings. Streaming responses are
+compressed chunk by chunk with a flush after every chunk, so progress events
+still reach the client as soon as they are produced.
+"""
+import zlib
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Media types that are already compressed, or that do not shrink
+INCOMPRESSIBLE_MEDIA_TYPES = frozenset({
+    "application/gzip",
+    "application/vnd.apache.parquet",
+    "application/zip",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+})
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Content codings this server can produce, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content coding to use for a request
+
+    Args:
+        accept_encoding: Value of the request's Accept-Encoding header
+
+    Returns:
+        "br", "gzip", or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.process(data)
+        return body + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies according to the request's Accept-Encoding
+
+    Responses that already carry a Content-Encoding, partial responses and
+    incompressible media types are passed through untouched. A strong ETag is
+    weakened when the body is compressed, since the bytes on the wire then
+    differ from the identity representation it was computed for.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = config.COMPRESSION_MIN_SIZE,
+        gzip_level: int = config.GZIP_LEVEL,
+        brotli_quality: int = config.BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        coding = negotiate_encoding(Headers(scope=scope).get("Accept-Encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressingResponder(self, coding, send)(scope, receive)
+
+    def create_encoder(self, coding: str):
+        if coding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+
+class _CompressingResponder:
+    """Per-request state of CompressionMiddleware."""
+
+    def __init__(self, middleware: CompressionMiddleware, coding: str, send: Send):
+        self.middleware = middleware
+        self.coding = coding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive):
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers back until the first body chunk shows whether to compress
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] == 206
+                or media_type in INCOMPRESSIBLE_MEDIA_TYPES
+            )
+            if message["status"] == 304:
+                # Advertise the same validator the 200 response would carry
+                self._weaken_etag(MutableHeaders(raw=message["headers"]))
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            if self.start_message is not None and not self.passthrough:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start_message["headers"])
+
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Not worth compressing; once the first chunk is sent as-is, so is the rest
+                self.passthrough = True
+                await self.send(start_message)
+                await self.send(message)
+                return
+
+            self.encoder = self.middleware.create_encoder(self.coding)
+            headers["Content-Encoding"] = self.coding
+            headers.add_vary_header("Accept-Encoding")
+            self._weaken_etag(headers)
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            body = self.encoder.compress(body, final=not more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(body))
+            await self.send(start_message)
+        else:
+            body = self.encoder.compress(body, final=not more_body)
+
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    @staticmethod
+    def _weaken_etag(headers: MutableHeaders):
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
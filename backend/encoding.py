@@ -0,0 +1,55 @@
+"""
+JSON encoding for API responses and cached values.
+
+orjson is used when it is installed; otherwise the stdlib encoder is used with
+compact separators so both produce equivalent, minimal output.
+"""
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encode a value as compact UTF-8 JSON
+
+    Args:
+        value: JSON-serializable value
+
+    Returns:
+        Encoded bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """
+    Decode JSON bytes
+
+    Args:
+        data: Encoded JSON
+
+    Returns:
+        Decoded value
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with the fast encoder
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,138 @@
+"""
+Streaming encoders for bulk rating exports.
+
+Each encoder consumes batches of row tuples from the ratings store and yields
+encoded bytes chunk by chunk, so memory use is bounded by one batch regardless
+of how many rows are exported.
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Tuple
+
+from backend.store import RATING_COLUMNS
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_EXTENSIONS = {
+    "csv": "csv",
+    "arrow": "arrows",
+    "parquet": "parquet",
+}
+
+
+class _ChunkSink:
+    """
+    Write-only file object that hands written bytes back in chunks
+
+    pyarrow writers only ever append, so the sink keeps a running position for
+    tell() while the bytes themselves are drained after every batch.
+    """
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("served_at", pa.timestamp("us", tz="UTC")),
+        ("canonical_title", pa.string()),
+        ("platform", pa.dictionary(pa.int32(), pa.string())),
+        ("movie_title", pa.string()),
+        ("movie_rating", pa.float64()),
+        ("type_of_movie", pa.string()),
+        ("positive_review_percentage", pa.int16()),
+        ("negative_review_percentage", pa.int16()),
+    ])
+
+
+def _record_batch(rows: List[Tuple], schema):
+    """Transpose a batch of row tuples into Arrow column arrays."""
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    arrays = [pa.array(column, type=field.type) for column, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def encode_arrow(batches: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    """Encode batches as an Arrow IPC stream."""
+    import pyarrow as pa
+
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def encode_parquet(batches: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    """Encode batches as a Parquet file with one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd") as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def encode_csv(batches: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    """Encode batches as CSV with a header row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RATING_COLUMNS)
+
+    for rows in batches:
+        writer.writerows(
+            (datetime.fromtimestamp(row[0] / 1_000_000, tz=timezone.utc).isoformat(),) + row[1:]
+            for row in rows
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+EXPORT_ENCODERS = {
+    "csv": encode_csv,
+    "arrow": encode_arrow,
+    "parquet": encode_parquet,
+}
@@ -0,0 +1,319 @@
+"""
+Bounded, cost-aware caching of function results.
+
+``cost_aware_cache`` memoizes sync and async functions in a ``CostAwareCache``
+that keeps the results most expensive to recompute. It has no dependency on
+Streamlit or on the backend app, so the frontend (re-exported from utils) and
+the backend share the same primitive.
+"""
+import functools
+import hashlib
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ("value", "size", "cost", "expires_at", "priority")
+
+    def __init__(self, value: Any, size: int, cost: float, expires_at: float, priority: float):
+        self.value = value
+        self.size = size
+        self.cost = cost
+        self.expires_at = expires_at
+        self.priority = priority
+
+
+class CostAwareCache:
+    """
+    Bounded in-memory cache that keeps what is expensive to recompute.
+
+    Eviction follows GreedyDual-Size: an entry's priority is the cache's
+    inflation value plus its recompute cost (seconds) per kilobyte, the entry
+    with the lowest priority is evicted first, and the inflation value rises to
+    each evicted priority so entries that are never hit again age out. A 20 s
+    model answer therefore outlives any number of 2 ms lookups of the same size.
+
+    With a spill directory, evicted entries that can be pickled are written to
+    disk (up to spill_max_bytes, oldest files dropped first) and promoted back
+    to memory when they are hit. Values are shared between callers, not copied.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float = config.CACHE_TTL,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = 0
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._entries: Dict[str, _CacheEntry] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._inflation = 0.0
+        self._bytes = 0
+        self._spilled: "OrderedDict[str, int]" = OrderedDict()
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ("hits", "disk_hits", "misses", "evictions", "spills", "expirations", "uncacheable"), 0
+        )
+        self._seconds_saved = 0.0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a key in memory, then on disk.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            (found, value)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._stats["hits"] += 1
+                    self._seconds_saved += entry.cost
+                    # A hit renews the entry's priority at the current inflation
+                    self._push(key, entry)
+                    return True, entry.value
+                self._remove(key)
+                self._stats["expirations"] += 1
+
+        spilled = self._read_spilled(key, now)
+        with self._lock:
+            if spilled is None:
+                self._stats["misses"] += 1
+                return False, None
+            value, size, cost, expires_at = spilled
+            self._stats["disk_hits"] += 1
+            self._seconds_saved += cost
+            evicted = self._insert(key, value, size, cost, expires_at)
+        self._spill(evicted)
+        return True, value
+
+    def put(self, key: str, value: Any, cost: float):
+        """
+        Store a value computed in cost seconds.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            cost: Seconds it took to compute
+        """
+        payload = self._pickle(value)
+        size = len(payload) if payload is not None else sys.getsizeof(value)
+        if size > self.max_bytes:
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return
+        with self._lock:
+            evicted = self._insert(key, value, size, cost, time.time() + self.ttl_seconds)
+        self._spill(evicted)
+
+    def _insert(self, key: str, value: Any, size: int, cost: float, expires_at: float) -> List[Tuple[str, _CacheEntry]]:
+        # Called with the lock held; returns the evicted entries
+        if key in self._entries:
+            self._remove(key)
+        entry = _CacheEntry(value, size, cost, expires_at, 0.0)
+        self._entries[key] = entry
+        self._bytes += size
+        self._push(key, entry)
+        evicted = []
+        while self._bytes > self.max_bytes and self._heap:
+            priority, _, victim = heapq.heappop(self._heap)
+            current = self._entries.get(victim)
+            if current is None or current.priority != priority:
+                continue  # superseded heap record
+            self._inflation = priority
+            self._remove(victim)
+            self._stats["evictions"] += 1
+            evicted.append((victim, current))
+        return evicted
+
+    def _push(self, key: str, entry: _CacheEntry):
+        entry.priority = self._inflation + entry.cost / max(1.0, entry.size / 1024)
+        heapq.heappush(self._heap, (entry.priority, next(self._sequence), key))
+        # Lazy deletion leaves stale records behind; rebuild when they dominate
+        if len(self._heap) > 4 * len(self._entries) + 64:
+            self._heap = [(item.priority, next(self._sequence), name) for name, item in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    @staticmethod
+    def _pickle(value: Any) -> Optional[bytes]:
+        try:
+            return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pkl")
+
+    def _spill(self, evicted: List[Tuple[str, _CacheEntry]]):
+        if not self.spill_dir:
+            return
+        now = time.time()
+        for key, entry in evicted:
+            if entry.expires_at <= now:
+                continue
+            payload = self._pickle((key, entry.value, entry.size, entry.cost, entry.expires_at))
+            if payload is None or len(payload) > self.spill_max_bytes:
+                continue
+            try:
+                with open(self._spill_path(key), "wb") as handle:
+                    handle.write(payload)
+            except OSError as e:
+                logger.warning("Could not spill cache entry to disk: %s", e)
+                continue
+            with self._lock:
+                self._spilled_bytes += len(payload) - self._spilled.pop(key, 0)
+                self._spilled[key] = len(payload)
+                self._stats["spills"] += 1
+                dropped = []
+                while self._spilled_bytes > self.spill_max_bytes and self._spilled:
+                    oldest, size = self._spilled.popitem(last=False)
+                    self._spilled_bytes -= size
+                    dropped.append(oldest)
+            for oldest in dropped:
+                self._unlink(oldest)
+
+    def _unlink(self, key: str):
+        try:
+            os.remove(self._spill_path(key))
+        except OSError:
+            pass
+
+    def _read_spilled(self, key: str, now: float) -> Optional[Tuple[Any, int, float, float]]:
+        with self._lock:
+            if key not in self._spilled:
+                return None
+            self._spilled_bytes -= self._spilled.pop(key)
+        try:
+            with open(self._spill_path(key), "rb") as handle:
+                stored_key, value, size, cost, expires_at = pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        finally:
+            self._unlink(key)
+        if stored_key != key or expires_at <= now:
+            return None
+        return value, size, cost, expires_at
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss/eviction counters and current usage.
+        
+        Returns:
+            Counters, entries and bytes in memory and on disk, and the
+            recompute time saved by hits (seconds)
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": (self._stats["hits"] + self._stats["disk_hits"]) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "spilled_entries": len(self._spilled),
+                "spilled_bytes": self._spilled_bytes,
+                "seconds_saved": round(self._seconds_saved, 3),
+            }
+
+    def clear(self):
+        """Drop every entry, in memory and on disk."""
+        with self._lock:
+            for key in self._spilled:
+                self._unlink(key)
+            self._entries.clear()
+            self._heap.clear()
+            self._spilled.clear()
+            self._bytes = self._spilled_bytes = 0
+            self._inflation = 0.0
+
+
+def _call_key(args: tuple, kwargs: Dict[str, Any]) -> str:
+    return repr((args, sorted(kwargs.items())))
+
+
+def cost_aware_cache(
+    ttl_seconds: float = config.CACHE_TTL,
+    max_bytes: int = int(config.FUNCTION_CACHE_MAX_MB * 1024 * 1024),
+    spill_dir: Optional[str] = config.FUNCTION_CACHE_SPILL_DIR or None,
+    spill_max_bytes: int = int(config.FUNCTION_CACHE_SPILL_MAX_MB * 1024 * 1024),
+    cacheable: Callable[[Any], bool] = lambda result: True
+):
+    """
+    Cache a sync or async function's results, keeping the costliest to recompute.
+    
+    Framework-agnostic: usable in the Streamlit frontend and the backend alike.
+    Calls are keyed on the repr of their arguments; exceptions are not cached.
+    The wrapper exposes cache_stats() and cache_clear().
+    
+    Args:
+        ttl_seconds: Time a result stays valid
+        max_bytes: Memory budget (pickled size of the results)
+        spill_dir: Directory evicted results are spilled to (None keeps them in memory only)
+        spill_max_bytes: Disk budget of the spill directory
+        cacheable: Returns False for results that must not be cached
+        
+    Returns:
+        Decorator
+    """
+    def decorator(func):
+        directory = os.path.join(spill_dir, f"{func.__module__}.{func.__qualname__}") if spill_dir else None
+        cache = CostAwareCache(max_bytes, ttl_seconds, directory, spill_max_bytes)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                key = _call_key(args, kwargs)
+                found, value = cache.get(key)
+                if found:
+                    return value
+                started = time.perf_counter()
+                value = await func(*args, **kwargs)
+                if cacheable(value):
+                    cache.put(key, value, time.perf_counter() - started)
+                return value
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = _call_key(args, kwargs)
+                found, value = cache.get(key)
+                if found:
+                    return value
+                started = time.perf_counter()
+                value = func(*args, **kwargs)
+                if cacheable(value):
+                    cache.put(key, value, time.perf_counter() - started)
+                return value
+
+        wrapper.cache = cache
+        wrapper.cache_stats = cache.stats
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
@@ -0,0 +1,144 @@
+"""
+Hedged calls for tail latency.
+
+A hedged call starts the request once and, if it has not answered within a
+high percentile of recent latencies, starts a duplicate and returns whichever
+answers first. Duplicates draw on a budget refilled as a fraction of primary
+calls, so hedging can never add more than that fraction of upstream load.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Optional
+
+from backend.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+hedges = REGISTRY.counter(
+    "movieratings_hedged_calls_total", "Hedged calls by outcome", ("name", "outcome")
+)
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent latencies
+    """
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Latency at the given percentile (0-100), or None until enough samples are seen."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """
+    Allowance of extra calls, earned at ``ratio`` per primary call
+    """
+    def __init__(self, ratio: float, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._available = burst
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._available = min(self.burst, self._available + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._available >= 1:
+                self._available -= 1
+                return True
+            return False
+
+
+class Hedger:
+    """
+    Run calls with a duplicate fired after the ``percentile`` latency
+
+    ``hold_off``, if given, is asked before each duplicate; while it returns
+    True (e.g. the upstream is rate limiting) no duplicate is fired.
+    """
+    def __init__(self, name: str, percentile: float, max_extra_ratio: float,
+                 min_delay: float = 0.05, max_workers: int = 32,
+                 hold_off: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.hold_off = hold_off
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget(max_extra_ratio)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{name}")
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait for the primary before hedging, or None to never hedge yet."""
+        delay = self.latency.percentile(self.percentile)
+        return None if delay is None else max(self.min_delay, delay)
+
+    def _submit(self, func: Callable[[], Any]) -> Future:
+        started = time.monotonic()
+        # Run in a copy of the caller's context, so request ID and priority carry over
+        future = self._pool.submit(contextvars.copy_context().run, func)
+        future.add_done_callback(lambda f: f.exception() is None and self.latency.add(time.monotonic() - started))
+        return future
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        """
+        Call func, hedging it with a duplicate if it is slow
+
+        Args:
+            func: Idempotent function making the call
+
+        Returns:
+            The result of whichever attempt succeeds first
+        """
+        self.budget.earn()
+        delay = self.delay()
+        if delay is None:
+            started = time.monotonic()
+            result = func()
+            self.latency.add(time.monotonic() - started)
+            return result
+
+        primary = self._submit(func)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if self.hold_off is not None and self.hold_off():
+            hedges.inc(name=self.name, outcome="held_off")
+            return primary.result()
+
+        if not self.budget.spend():
+            hedges.inc(name=self.name, outcome="over_budget")
+            return primary.result()
+
+        hedges.inc(name=self.name, outcome="fired")
+        pending = {primary, self._submit(func)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower attempt finishes in the background and is discarded
+                    if future is not primary:
+                        hedges.inc(name=self.name, outcome="won")
+                    return future.result()
+                error = future.exception()
+        raise error
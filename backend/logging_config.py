@@ -0,0 +1,158 @@
+"""
+Logging configuration for the Movie Rating Aggregator backend.
+
+Records are handed to a queue by the calling thread and written to stdout by a
+background listener, so request handlers never block on console I/O.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from typing import Dict
+
+import config
+
+# Request ID of the request currently being served (set by the HTTP middleware)
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+# Attributes present on every LogRecord; anything else was passed via `extra`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+# Formats tracebacks before records are queued (see StructuredQueueHandler)
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Attach the current request ID to every record
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop a fraction of high-volume records
+
+    Only records logged with ``extra={"sampled": True}`` are subject to sampling;
+    everything else always passes.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False):
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as single-line JSON objects
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+
+        # Include structured fields passed through `extra`
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and key not in entry and key != "sampled":
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Formatted by StructuredQueueHandler before the record was queued
+            entry["exc_info"] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that keeps the message and the traceback apart
+
+    The stock ``prepare`` formats the traceback into the message and drops
+    ``exc_info``; here the message is only merged with its arguments and the
+    traceback is kept as ``exc_text``, which both formatters read.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_logger_levels(spec: str) -> Dict[str, str]:
+    """
+    Parse a per-logger level specification
+
+    Args:
+        spec: Comma separated ``logger=LEVEL`` pairs, e.g. ``backend.movie.planner=DEBUG``
+
+    Returns:
+        Mapping of logger name to level name
+    """
+    levels = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        name, level = part.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """
+    Route backend logging through a non-blocking queue handler
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if config.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+        )
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    # The caller only enqueues; the listener thread does the actual write
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLE_RATE))
+
+    backend_logger = logging.getLogger("backend")
+    backend_logger.setLevel(config.LOG_LEVEL)
+    backend_logger.addHandler(queue_handler)
+    backend_logger.propagate = False
+
+    for name, level in parse_logger_levels(config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
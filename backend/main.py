@@ -1,99 +1,670 @@
-from fastapi import FastAPI, HTTPException
-from backend.movie.schema import MovieRatingRequest, MovieRatingPlatform
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from backend.admission import AdmissionRejected, admit_agent_run, cache_hits
+from backend.cache import TieredCache, cache_key, canonical_title, get_shared_cache, single_flight
+from backend import encoding
+from backend.compression import CompressionMiddleware
+from backend.encoding import JSON_MEDIA_TYPE, FastJSONResponse
+from backend.export import EXPORT_ENCODERS, EXPORT_EXTENSIONS, EXPORT_MEDIA_TYPES
+from backend.logging_config import configure_logging, request_id_var
+from backend.scheduler import Priority, priority_var
+from backend import metrics, profiling, recording, usage
+from backend.movie.schema import MovieConsensus, MovieRatingBatchRequest, MovieRatingRequest, MovieRatingPlatform, MovieRatingResponse
+from backend.movie.validation import validate_platform_data
+from backend.movie.extraction import extract_text_ratings, parse_rating_array
+from backend.store import get_ratings_store
+from backend.usage import BudgetExceeded
+from backend.checkpoints import get_checkpointer, lookup_thread
 from backend.movie.planner import create_langgraph_agent
+from backend.movie.records import CompactRatingCache
+from backend.movie.fast_path import record_agent_run, try_fast_path
+from backend.hedging import HedgeBudget, LatencyTracker
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pydantic import ValidationError
 from langchain_core.messages import HumanMessage
-from typing import Dict, List, Any
-import json
-import re
+from datetime import datetime
+from typing import Dict, List, Any, Callable, Literal, Optional, Tuple
+import asyncio
+import contextvars
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+import config
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Movie Rating Aggregator API", default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
+# Agent state is checkpointed after every node, so an interrupted run can be resumed
+agent_executor = create_langgraph_agent(get_checkpointer())
+
+# Racing the agent against the cheap strategy: head start, extra-load cap and threads
+cheap_latency = LatencyTracker()
+race_budget = HedgeBudget(config.RACE_MAX_EXTRA_RATIO)
+race_pool = ThreadPoolExecutor(max_workers=2 * config.MAX_CONCURRENT_AGENT_RUNS, thread_name_prefix="race")
+races = metrics.REGISTRY.counter("movieratings_strategy_races_total", "Agent vs cheap strategy races by outcome", ("outcome",))
+agent_resumes = metrics.REGISTRY.counter(
+    "movieratings_agent_resumes_total", "Agent runs resumed from the checkpoint of an interrupted run"
+)
+negative_cache_hits = metrics.REGISTRY.counter(
+    "movieratings_negative_cache_hits_total", "Lookups answered from the negative cache without running the agent"
+)
+
+# Hot results stay in-process as compact records; everything else comes from the shared tier
+ratings_cache = TieredCache(
+    CompactRatingCache(config.LOCAL_CACHE_MAX_ENTRIES, config.LOCAL_CACHE_MAX_ENCODED),
+    get_shared_cache(),
+    config.LOCAL_CACHE_TTL
+)
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """
+    Tag every log line emitted while serving a request with its request ID
 
-app = FastAPI(title="Movie Rating Aggregator API")
-agent_executor = create_langgraph_agent()
+    Also sets the priority of the outbound calls the request makes; clients
+    mark prefetches and refreshes with "X-Priority: background". Responses to
+    rating lookups report the model tokens and searches they used in
+    X-Usage-* headers (streamed lookups, in their "done" event instead).
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    priority = Priority.__members__.get(request.headers.get("X-Priority", "").upper(), Priority.INTERACTIVE)
+    priority_token = priority_var.set(priority)
+    request_usage = usage.for_request()
+    usage_token = usage.usage_var.set(request_usage)
+    try:
+        response = await call_next(request)
+    finally:
+        usage.usage_var.reset(usage_token)
+        priority_var.reset(priority_token)
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    if request_usage.lookups:
+        response.headers.update(request_usage.headers())
+    return response
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """
+    Shed load with a fast 429/503 that tells the client when to retry
+    """
+    return FastJSONResponse(
+        status_code=exc.status_code,
+        content={"status": "error", "message": str(exc), "data": []},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
-def validate_platform_data(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def client_id(request: Request) -> str:
     """
-    Validate and clean up platform data to ensure it matches the expected schema
+    Identify the client for rate limiting
 
-    Args:
-        data: List of platform data dictionaries
+    The frontend sends a per-session X-Client-ID, since every Streamlit user
+    reaches the API from the same address; other clients are keyed by address.
+    """
+    header = request.headers.get("X-Client-ID")
+    if header:
+        return header[:128]
+    return request.client.host if request.client else "unknown"
 
-    Returns:
-        Validated and cleaned up platform data
+def not_found_result(movie_name: str) -> Dict[str, Any]:
     """
-    validated_data = []
+    Response for a title the agent found no real ratings for
 
-    for item in data:
-        # Ensure all required fields are present
-        platform = item.get("platform", "Unknown Platform")
-        movie_title = item.get("movie_title", "Unknown Movie")
+    Negative results are cached for NEGATIVE_CACHE_TTL, so repeated searches
+    for unknown or misspelled titles do not run the agent again.
+    """
+    return {
+        "status": "not_found",
+        "message": f"No real ratings were found for '{movie_name}'",
+        "data": []
+    }
 
-        # Ensure movie_rating is a float between 1 and 10
-        try:
-            movie_rating = float(item.get("movie_rating", 8.0))
-            movie_rating = max(1.0, min(10.0, movie_rating))  # Clamp between 1 and 10
-        except (ValueError, TypeError):
-            movie_rating = 8.0  # Default if invalid
+def estimated_result(movie_name: str, ratings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Response for ratings read from the agent's prose rather than its JSON
 
-        # Ensure type_of_movie is a string
-        type_of_movie = str(item.get("type_of_movie", "Drama, Action"))
+    The text states only each platform's rating: the review percentages are
+    derived from it and the genre is unknown, so the result is marked
+    "estimated", is not recorded in the ratings history and, like a negative
+    result, is cached for NEGATIVE_CACHE_TTL only.
+    """
+    return {
+        "status": "estimated",
+        "message": f"Only the ratings of '{movie_name}' were stated; review percentages are estimated from them",
+        "data": ratings
+    }
+
+def is_not_found(body: bytes) -> bool:
+    """Check whether an encoded response is a negative result, without decoding it."""
+    # "status" is always the first key of an encoded response
+    return body.startswith(b'{"status":"not_found"')
+
+def is_short_lived(body: bytes) -> bool:
+    """Check whether an encoded response is cached for NEGATIVE_CACHE_TTL (not_found or estimated)."""
+    return is_not_found(body) or body.startswith(b'{"status":"estimated"')
+
+async def lookup_movie_ratings(
+    movie_name: str,
+    client: str,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Tuple[bytes, bool]:
+    """
+    Look up the encoded ratings response for a movie, running the agent on a miss
 
-        # Ensure percentages are integers between 0 and 100
-        try:
-            positive_percentage = int(item.get("positive_review_percentage", 80))
-            positive_percentage = max(0, min(100, positive_percentage))  # Clamp between 0 and 100
-        except (ValueError, TypeError):
-            positive_percentage = 80  # Default if invalid
+    Results are shared between workers through the cache tier, and only one
+    worker runs the agent for a given title at a time. Cached results are kept
+    as encoded JSON and returned as-is. Titles without real ratings are cached
+    as a "not_found" result, and ratings partly estimated from the agent's
+    prose as an "estimated" one, with the shorter NEGATIVE_CACHE_TTL. Cache hits are
+    always served; agent runs go through admission control. The model tokens
+    and searches the lookup uses are accounted to the title (see backend/usage.py).
 
-        try:
-            negative_percentage = int(item.get("negative_review_percentage", 20))
-            negative_percentage = max(0, min(100, negative_percentage))  # Clamp between 0 and 100
-        except (ValueError, TypeError):
-            negative_percentage = 20  # Default if invalid
-
-        # Ensure percentages sum to 100
-        if positive_percentage + negative_percentage != 100:
-            # Adjust negative percentage to make sum 100
-            negative_percentage = 100 - positive_percentage
-
-        # Create validated item
-        validated_item = {
-            "platform": platform,
-            "movie_title": movie_title,
-            "movie_rating": round(movie_rating, 1),  # Round to 1 decimal place
-            "type_of_movie": type_of_movie,
-            "positive_review_percentage": positive_percentage,
-            "negative_review_percentage": negative_percentage
-        }
+    Args:
+        movie_name: Movie name as requested
+        client: Client identifier the agent run is charged to
+        on_progress: Optional callback receiving a progress event after each agent step
 
-        validated_data.append(validated_item)
+    Returns:
+        Encoded response body and whether it is a cacheable (successful,
+        estimated or not_found) result
 
-    return validated_data
+    Raises:
+        AdmissionRejected: If the agent would have to run and the request is not admitted
+    """
+    key = cache_key("ratings", canonical_title(movie_name))
+    payload = MovieRatingRequest(movie_name=movie_name)
+    ran_agent = False
+
+    async def compute():
+        nonlocal ran_agent
+        async with admit_agent_run(client):
+            ran_agent = True
+            result = await run_in_threadpool(resolve_movie_ratings, payload, on_progress)
+        if result and result.get("status") == "success":
+            result["consensus"] = await run_in_threadpool(
+                get_ratings_store().record, canonical_title(movie_name), result["data"]
+            )
+        return result
+
+    with usage.track(canonical_title(movie_name)) as lookup_usage:
+        body, cacheable = await single_flight(
+            ratings_cache,
+            key,
+            compute,
+            ttl=config.CACHE_TTL,
+            cacheable=lambda result: bool(result) and result.get("status") in ("success", "estimated", "not_found"),
+            negative=lambda result: result.get("status") in ("estimated", "not_found"),
+            negative_ttl=config.NEGATIVE_CACHE_TTL
+        )
+        if not ran_agent:
+            lookup_usage.path = "cache"
+    if not ran_agent:
+        cache_hits.inc()
+        if is_not_found(body):
+            negative_cache_hits.inc()
+    return body, cacheable
 
 @app.post("/movie-ratings")
-async def get_movie_ratings(payload: MovieRatingRequest):
+async def get_movie_ratings(payload: MovieRatingRequest, request: Request):
     """
     Get movie ratings from multiple ticket booking platforms
 
+    A request with the admin token (PROFILE_TOKEN) in X-Profile-Token runs
+    under the profiler (see backend/profiling.py); the paths of its flame
+    graph, folded stacks and allocation summary are returned in the
+    X-Profile-Flamegraph, X-Profile-Folded and X-Profile-Allocations headers,
+    or "X-Profile: busy" if another request of the worker is being profiled.
+
     Args:
         payload: Request containing movie name
+        request: Incoming request (for the client identifier and profiling token)
 
     Returns:
         Movie ratings from multiple ticket booking platforms
     """
+    if profiling.requested(request.headers.get("X-Profile-Token")):
+        return await profiled_movie_ratings(payload, request)
+    body, _ = await lookup_movie_ratings(payload.movie_name, client_id(request))
+    # Cache hits are served as the stored bytes, without re-encoding
+    return Response(content=body, media_type=JSON_MEDIA_TYPE)
+
+async def profiled_movie_ratings(payload: MovieRatingRequest, request: Request) -> Response:
+    """
+    Serve a /movie-ratings request under the sampling profiler and tracemalloc
+
+    Args:
+        payload: Request containing movie name
+        request: Incoming request (for the client identifier)
+
+    Returns:
+        The ratings response, with the profile's artifact paths in its headers
+    """
+    profile = profiling.Profile(canonical_title(payload.movie_name))
+    if not profile.start():
+        body, _ = await lookup_movie_ratings(payload.movie_name, client_id(request))
+        return Response(content=body, media_type=JSON_MEDIA_TYPE, headers={"X-Profile": "busy"})
+    try:
+        body, _ = await lookup_movie_ratings(payload.movie_name, client_id(request))
+    finally:
+        artifacts = await run_in_threadpool(profile.stop)
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers={
+        "X-Profile-Flamegraph": artifacts["flamegraph"],
+        "X-Profile-Folded": artifacts["folded"],
+        "X-Profile-Allocations": artifacts["allocations"],
+    })
+
+@app.post("/movie-ratings/batch")
+async def get_movie_ratings_batch(payload: MovieRatingBatchRequest, request: Request):
+    """
+    Get ratings for several movies in one call
+
+    The titles are looked up concurrently, each through the same cache and
+    single-flight path as a single search, so the call takes about as long as
+    the slowest title. Titles that refer to the same movie are looked up once.
+    A title refused by admission control gets an error result with
+    "retry_after" rather than failing the whole batch.
+
+    Args:
+        payload: Request containing up to MAX_COMPARE_MOVIES movie names
+        request: Incoming request (for the client identifier)
+
+    Returns:
+        Per-movie results (see MovieRatingBatchResponse), in request order
+    """
+    movie_names = list(dict.fromkeys(payload.movie_names))
+    client = client_id(request)
+    # Comparisons wait behind single interactive searches for model and search quota
+    priority_var.set(max(priority_var.get(), Priority.BATCH))
+    lookups = {}
+    for movie_name in movie_names:
+        key = canonical_title(movie_name)
+        if key not in lookups:
+            lookups[key] = asyncio.ensure_future(lookup_movie_ratings(movie_name, client))
+
+    outcomes = await asyncio.gather(*lookups.values(), return_exceptions=True)
+    bodies = {}
+    for key, outcome in zip(lookups, outcomes):
+        if isinstance(outcome, AdmissionRejected):
+            bodies[key] = encoding.dumps(
+                {"status": "error", "message": str(outcome), "data": [], "retry_after": outcome.retry_after}
+            )
+        elif isinstance(outcome, BaseException):
+            logger.error("Batch lookup failed", extra={"movie": key}, exc_info=outcome)
+            bodies[key] = encoding.dumps({"status": "error", "message": str(outcome), "data": []})
+        else:
+            bodies[key] = outcome[0]
+
+    # Assemble the envelope around the stored bodies without decoding them
+    items = [
+        b'{"movie_name":' + encoding.dumps(movie_name) + b',"result":' + bodies[canonical_title(movie_name)] + b"}"
+        for movie_name in movie_names
+    ]
+    return Response(
+        content=b'{"status":"success","results":[' + b",".join(items) + b"]}",
+        media_type=JSON_MEDIA_TYPE
+    )
+
+@app.get("/movie-ratings/{movie_name:path}")
+async def get_movie_ratings_cacheable(movie_name: str, request: Request):
+    """
+    Get movie ratings with HTTP caching support
+
+    Successful results carry a strong ETag derived from the stored body and a
+    Cache-Control max-age of CACHE_TTL (NEGATIVE_CACHE_TTL for not_found and
+    estimated results); a matching If-None-Match is answered with 304 Not Modified and
+    no body.
+
+    Args:
+        movie_name: Movie name
+        request: Incoming request (for If-None-Match and the client identifier)
+
+    Returns:
+        Movie ratings from multiple ticket booking platforms
+    """
+    body, cacheable = await lookup_movie_ratings(movie_name, client_id(request))
+    if not cacheable:
+        return Response(content=body, media_type=JSON_MEDIA_TYPE, headers={"Cache-Control": "no-store"})
+
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+    max_age = config.NEGATIVE_CACHE_TTL if is_short_lived(body) else config.CACHE_TTL
+    headers = {"ETag": etag, "Cache-Control": f"max-age={max_age}"}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+@app.get("/stream/movie-ratings/{movie_name:path}")
+async def stream_movie_ratings(movie_name: str, request: Request):
+    """
+    Get movie ratings with live progress
+
+    Streams newline-delimited JSON events while the agent works. The last event
+    has stage "done" and carries the same body as the other endpoints in
+    "result". If admission control refuses the agent run, the last event also
+    has the "status_code" (429 or 503) and "retry_after" the other endpoints
+    would have answered with, and "usage" the totals the other endpoints
+    report in X-Usage-* headers.
+
+    Args:
+        movie_name: Movie name
+        request: Incoming request (for the client identifier)
+
+    Returns:
+        Streaming NDJSON response
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    client = client_id(request)
+
+    def on_progress(event: Dict[str, Any]):
+        # Called from the agent's worker thread
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def generate():
+        yield encoding.dumps({"stage": "started", "progress": 0.0}) + b"\n"
+        lookup = asyncio.create_task(lookup_movie_ratings(movie_name, client, on_progress))
+
+        while not lookup.done():
+            next_event = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({lookup, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event in done:
+                yield encoding.dumps(next_event.result()) + b"\n"
+            else:
+                next_event.cancel()
+
+        while not events.empty():
+            yield encoding.dumps(events.get_nowait()) + b"\n"
+
+        # The request's usage, which the lookup's adds into
+        request_usage = usage.current()
+        totals = request_usage.totals() if request_usage is not None else {}
+        try:
+            body, _ = lookup.result()
+        except AdmissionRejected as exc:
+            yield encoding.dumps({
+                "stage": "done",
+                "progress": 1.0,
+                "status_code": exc.status_code,
+                "retry_after": exc.retry_after,
+                "usage": totals,
+                "result": {"status": "error", "message": str(exc), "data": []}
+            }) + b"\n"
+            return
+        # Embed the encoded body as-is rather than decoding and re-encoding it
+        yield b'{"stage":"done","progress":1.0,"usage":' + encoding.dumps(totals) + b',"result":' + body + b"}\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag (weak comparison, per RFC 9110)
+
+    Args:
+        if_none_match: Header value, possibly a comma separated list or "*"
+        etag: Current strong ETag, including quotes
+
+    Returns:
+        True if the client's cached copy is still current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Export this worker's metrics in the Prometheus text format
+    """
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/movies/{name}/consensus", response_model=MovieConsensus)
+def get_movie_consensus(name: str):
+    """
+    Get the cross-platform consensus for a movie
+
+    Args:
+        name: Movie name
+
+    Returns:
+        Mean, variance and weighted consensus of the movie's ratings and
+        positive review percentages across platforms and refreshes
+    """
+    consensus = get_ratings_store().get_consensus(canonical_title(name))
+    if consensus is None:
+        raise HTTPException(status_code=404, detail=f"No ratings have been served for '{name}'")
+    return consensus
+
+@app.get("/export")
+def export_ratings(
+    format: Literal["csv", "arrow", "parquet"] = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    platform: Optional[str] = None,
+):
+    """
+    Stream every stored rating as CSV, Arrow IPC or Parquet
+
+    Args:
+        format: Output format
+        start: Only ratings served at or after this time (ISO 8601, UTC if naive)
+        end: Only ratings served before this time
+        platform: Only ratings for this platform
+
+    Returns:
+        Streaming response with the encoded ratings
+    """
+    batches = get_ratings_store().iter_batches(start, end, platform, batch_size=config.EXPORT_BATCH_SIZE)
+    filename = f"ratings.{EXPORT_EXTENSIONS[format]}"
+    return StreamingResponse(
+        EXPORT_ENCODERS[format](batches),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def describe_agent_step(state: Dict[str, Any], step: int) -> Dict[str, Any]:
+    """
+    Summarize the agent state after a step as a progress event
+
+    The number of agent steps is not known up front, so progress approaches
+    90% asymptotically; the final 10% is parsing and validation.
+
+    Args:
+        state: Graph state after the step
+        step: Zero-based step number
+
+    Returns:
+        Progress event with stage, step, progress fraction and detail
+    """
+    last = state["messages"][-1]
+    if getattr(last, "tool_calls", None):
+        stage = "searching"
+        detail = [call["args"].get("query", call["name"]) for call in last.tool_calls]
+    elif last.type == "tool":
+        stage = "reading_results"
+        detail = last.name
+    elif last.type == "ai":
+        stage = "parsing"
+        detail = None
+    else:
+        stage = "starting"
+        detail = None
+
+    progress = round(0.9 * (1 - 0.7 ** (step + 1)), 3)
+    return {"stage": stage, "step": step, "progress": progress, "detail": detail}
+
+class AgentCancelled(Exception):
+    """
+    Raised inside an agent run whose result is no longer needed
+    """
+
+def run_agent(
+    user_prompt: HumanMessage,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancelled: Optional[threading.Event] = None
+):
+    """
+    Run the agent to completion
+
+    With checkpointing on, the run is saved after every node on the thread of
+    the title's current request window. If an earlier lookup of the title in
+    the window was interrupted (client timeout, upstream error, cancelled
+    race), the run resumes from its last completed node instead of starting
+    over. The thread is deleted once the run completes.
+
+    Args:
+        user_prompt: Message with the movie name
+        on_progress: Optional callback receiving a progress event after each step
+        cancelled: Optional event checked between steps
+
+    Returns:
+        Final graph state
+
+    Raises:
+        AgentCancelled: If cancelled was set during the run
+    """
+    inputs = {"messages": [user_prompt]}
+    run_config = None
+    checkpointer = getattr(agent_executor, "checkpointer", None)
+    if checkpointer:
+        thread = lookup_thread(canonical_title(user_prompt.content))
+        run_config = {"configurable": {"thread_id": thread}}
+        snapshot = agent_executor.get_state(run_config)
+        if snapshot.next:
+            logger.info("Resuming interrupted agent run", extra={"checkpoint_thread": thread, "next_nodes": list(snapshot.next)})
+            agent_resumes.inc()
+            inputs = None
+        elif snapshot.values:
+            # Finished but not cleaned up; its answer was already served or failed, so start over
+            checkpointer.delete_thread(thread)
+
+    if on_progress is None and cancelled is None:
+        state = agent_executor.invoke(inputs, run_config)
+    else:
+        state = None
+        for step, state in enumerate(agent_executor.stream(inputs, run_config, stream_mode="values")):
+            if cancelled is not None and cancelled.is_set():
+                raise AgentCancelled()
+            if on_progress is not None:
+                on_progress(describe_agent_step(state, step))
+
+    if run_config is not None:
+        checkpointer.delete_thread(run_config["configurable"]["thread_id"])
+    return state
+
+def is_valid_result(result: Optional[Dict[str, Any]]) -> bool:
+    """Check that a strategy produced a successful result that fits the response schema."""
+    if not result or result.get("status") != "success" or not result.get("data"):
+        return False
     try:
-        print(f"Searching for ratings for movie: {payload.movie_name}")
+        MovieRatingResponse(**result)
+    except ValidationError:
+        return False
+    return True
+
+def resolve_movie_ratings(
+    payload: MovieRatingRequest,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Produce ratings with the cheapest strategy that works, racing the agent against it when it is slow
+
+    The cheap strategy (snippet extraction, then single-shot extraction) gets
+    a head start of RACE_HEDGE_PERCENTILE of its recent latencies. If it has
+    not answered by then, the agent starts alongside it and the first valid,
+    schema-checked result wins; the other run is cancelled. At most
+    RACE_MAX_EXTRA_RATIO of lookups start the agent before the cheap strategy
+    has failed. Cache hits never get here (see lookup_movie_ratings). With
+    CAPTURE_DIR set, the run is recorded for replay.py.
+
+    Args:
+        payload: Request containing movie name
+        on_progress: Optional callback receiving progress events
+
+    Returns:
+        Response dictionary with status and validated platform data
+    """
+    with recording.capture(payload.movie_name):
+        if not config.FAST_PATH_ENABLED:
+            return fetch_movie_ratings(payload, on_progress)
+
+        if on_progress is not None:
+            on_progress({"stage": "searching", "step": 0, "progress": 0.05, "detail": "Reading platform search results"})
+
+        cancelled = threading.Event()
+        race_budget.earn()
+        started = time.monotonic()
+        cheap = race_pool.submit(contextvars.copy_context().run, try_fast_path, payload.movie_name, cancelled)
+        cheap.add_done_callback(lambda future: cheap_latency.add(time.monotonic() - started))
+
+        head_start = cheap_latency.percentile(config.RACE_HEDGE_PERCENTILE) if config.RACE_ENABLED else None
+        done, _ = wait([cheap], timeout=head_start)
+        if not done and race_budget.spend():
+            races.inc(outcome="started")
+            agent = race_pool.submit(
+                contextvars.copy_context().run, fetch_movie_ratings, payload, on_progress, cancelled
+            )
+            pending = {cheap, agent}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if cheap in done and cheap.result() is not None:
+                    cancelled.set()
+                    races.inc(outcome="cheap_won")
+                    return {"status": "success", "data": cheap.result()}
+                if agent in done and is_valid_result(agent.result()):
+                    cancelled.set()
+                    races.inc(outcome="agent_won")
+                    return agent.result()
+            # Neither produced a valid result; return the agent's answer (or error) as before
+            return agent.result() or {"status": "error", "message": "No ratings found", "data": []}
+
+        ratings = cheap.result()
+        if ratings is not None:
+            return {"status": "success", "data": ratings}
+        return fetch_movie_ratings(payload, on_progress)
+
+def fetch_movie_ratings(
+    payload: MovieRatingRequest,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancelled: Optional[threading.Event] = None
+):
+    """
+    Run the agent and parse its answer into platform ratings
+
+    Args:
+        payload: Request containing movie name
+        on_progress: Optional callback receiving a progress event after each agent step
+        cancelled: Optional event that stops the agent after its current step
+
+    Returns:
+        Response dictionary with status and validated platform data, or None
+        if the run was cancelled
+    """
+    try:
+        logger.info("Searching for ratings for movie", extra={"movie_name": payload.movie_name})
 
         # Create a user prompt with the movie name
         user_prompt = HumanMessage(content=payload.movie_name)
 
         # Invoke the agent
-        print("Invoking agent to fetch ratings from ticket booking platforms...")
-        result = agent_executor.invoke({"messages": [user_prompt]})
+        logger.debug("Invoking agent to fetch ratings from ticket booking platforms...")
+        started = time.monotonic()
+        with recording.stage("agent"):
+            result = run_agent(user_prompt, on_progress, cancelled)
+        record_agent_run(time.monotonic() - started)
         final_message = result["messages"][-1]
 
         # Extract JSON from the response
         content = final_message.content
-        print(f"Received response from agent, content length: {len(content)}")
-        print(f"Response content: {content[:500]}...")
+        logger.info("Received response from agent", extra={"content_length": len(content)})
+        logger.debug("Response content preview: %.500s", content)
 
         # Check if the response is an apology or error message
         apology_phrases = [
@@ -104,257 +675,54 @@ async def get_movie_ratings(payload: MovieRatingRequest):
         is_apology = any(phrase in content.lower() for phrase in apology_phrases)
 
         if is_apology:
-            print("Agent returned an apology or error message, generating synthetic data...")
-            # Generate synthetic data for all platforms
-            all_platforms = ["BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis"]
-            synthetic_data = []
-
-            # Generate a base rating between 7.5 and 9.0
-            import random
-            base_rating = round(random.uniform(7.5, 9.0), 1)
-
-            for platform in all_platforms:
-                # Add some variation to the ratings
-                rating_variation = random.uniform(-0.5, 0.5)
-                rating = round(max(1.0, min(10.0, base_rating + rating_variation)), 1)
-
-                # Generate positive percentage based on rating
-                positive_pct = int(min(rating / 10 * 100, 100))
-
-                synthetic_data.append({
-                    "platform": platform,
-                    "movie_title": user_prompt.content,  # Use the movie name from the user prompt
-                    "movie_rating": rating,
-                    "type_of_movie": "Drama, Action",  # Default
-                    "positive_review_percentage": positive_pct,
-                    "negative_review_percentage": 100 - positive_pct
-                })
-
-            print(f"Generated synthetic data for all {len(synthetic_data)} platforms")
-            validated_data = validate_platform_data(synthetic_data)
-            return {
-                "status": "success",
-                "data": validated_data
-            }
-
-        # Try to parse the JSON directly
-        try:
-            print("Attempting to parse JSON directly...")
-            ratings = json.loads(content)
-            print(f"Successfully parsed JSON, found {len(ratings)} platform(s)")
-            validated_ratings = validate_platform_data(ratings)
-            return {
-                "status": "success",
-                "data": validated_ratings
-            }
-        except json.JSONDecodeError:
-            # Try to find a JSON array in the content
-            print("Direct parsing failed, trying to find JSON array in content...")
-            try:
-                # Find the first '[' and the last ']'
-                start_idx = content.find('[')
-                end_idx = content.rfind(']')
-
-                if start_idx != -1 and end_idx != -1 and start_idx < end_idx:
-                    json_str = content[start_idx:end_idx+1]
-                    print(f"Found potential JSON array: {json_str[:100]}...")
-                    ratings = json.loads(json_str)
-                    print(f"Successfully parsed JSON array, found {len(ratings)} platform(s)")
-                    validated_ratings = validate_platform_data(ratings)
-                    return {
-                        "status": "success",
-                        "data": validated_ratings
-                    }
-            except (json.JSONDecodeError, ValueError) as e:
-                print(f"Error parsing JSON array: {str(e)}")
-        except Exception as e:
-            print(f"JSON parsing error: {str(e)}")
-
-            # Try to extract JSON from markdown code blocks
-            if "```json" in content or "```" in content:
-                print("Attempting to extract JSON from code block...")
-                # Try different regex patterns to extract JSON
-                json_patterns = [
-                    r'```(?:json)?\n(.+?)\n```',  # Standard markdown code block
-                    r'```(.+?)```',  # Code block without newlines
-                    r'\[\s*{.+?}\s*\]'  # Direct JSON array pattern
-                ]
-
-                for pattern in json_patterns:
-                    json_match = re.search(pattern, content, re.DOTALL)
-                    if json_match:
-                        json_str = json_match.group(1) if pattern != r'\[\s*{.+?}\s*\]' else json_match.group(0)
-                        print(f"Found potential JSON with pattern '{pattern}': {json_str[:100]}...")
-                        try:
-                            ratings = json.loads(json_str)
-                            print(f"Successfully extracted and parsed JSON from code block, found {len(ratings)} platform(s)")
-                            validated_ratings = validate_platform_data(ratings)
-                            return {
-                                "status": "success",
-                                "data": validated_ratings
-                            }
-                        except json.JSONDecodeError as e2:
-                            print(f"Error parsing JSON with pattern '{pattern}': {str(e2)}")
-                            # Try to clean up the JSON string
-                            try:
-                                # Remove any leading/trailing whitespace
-                                cleaned_json = json_str.strip()
-                                # Try to fix common issues
-                                if not cleaned_json.startswith('['):
-                                    cleaned_json = '[' + cleaned_json
-                                if not cleaned_json.endswith(']'):
-                                    cleaned_json = cleaned_json + ']'
-                                # Replace any single quotes with double quotes
-                                cleaned_json = cleaned_json.replace("'", '"')
-
-                                print(f"Attempting to parse cleaned JSON: {cleaned_json[:100]}...")
-                                ratings = json.loads(cleaned_json)
-                                print(f"Successfully parsed cleaned JSON, found {len(ratings)} platform(s)")
-                                validated_ratings = validate_platform_data(ratings)
-                                return {
-                                    "status": "success",
-                                    "data": validated_ratings
-                                }
-                            except json.JSONDecodeError as e3:
-                                print(f"Error parsing cleaned JSON: {str(e3)}")
-
-            # Try one more approach - extract anything that looks like a JSON array
-            print("Trying to extract any JSON-like array from the response...")
-            try:
-                # Look for anything that looks like a JSON array
-                array_match = re.search(r'\[\s*\{.*?\}\s*(,\s*\{.*?\}\s*)*\]', content, re.DOTALL)
-                if array_match:
-                    potential_json = array_match.group(0)
-                    print(f"Found potential JSON array: {potential_json[:100]}...")
-                    # Clean it up
-                    cleaned_json = potential_json.replace("'", '"')  # Replace single quotes with double quotes
-                    cleaned_json = re.sub(r'(\w+)\s*:', r'"\1":', cleaned_json)  # Add quotes to property names
-
-                    try:
-                        ratings = json.loads(cleaned_json)
-                        print(f"Successfully parsed extracted JSON array, found {len(ratings)} platform(s)")
-                        validated_ratings = validate_platform_data(ratings)
-                        return {
-                            "status": "success",
-                            "data": validated_ratings
-                        }
-                    except json.JSONDecodeError as e4:
-                        print(f"Error parsing extracted JSON array: {str(e4)}")
-            except Exception as e5:
-                print(f"Error in final JSON extraction attempt: {str(e5)}")
-
-            # If we still couldn't parse JSON, try to create a simple structure from the text
-            print("Attempting to create a simple structure from the text...")
-            try:
-                # Look for platform names
-                platforms = ["BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis"]
-                synthetic_data = []
-
-                for platform in platforms:
-                    if platform.lower() in content.lower():
-                        # Try to extract rating
-                        rating_match = re.search(r'{}.*?rating.*?(\d+(\.\d+)?)'.format(platform), content, re.IGNORECASE | re.DOTALL)
-                        rating = 8.5  # Default
-                        if rating_match:
-                            try:
-                                rating = float(rating_match.group(1))
-                                # If rating is less than 5, assume it's out of 5 and convert to out of 10
-                                if rating <= 5:
-                                    rating = rating * 2
-                            except ValueError:
-                                pass
-
-                        # Create a synthetic entry
-                        synthetic_data.append({
-                            "platform": platform,
-                            "movie_title": user_prompt.content,  # Use the movie name from the user prompt
-                            "movie_rating": rating,
-                            "type_of_movie": "Drama, Action",  # Default
-                            "positive_review_percentage": 80,  # Default
-                            "negative_review_percentage": 20   # Default
-                        })
-
-                # If we have at least one platform, generate data for all platforms
-                if synthetic_data:
-                    # Make sure we have data for all platforms
-                    all_platforms = ["BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis"]
-                    existing_platforms = [entry["platform"] for entry in synthetic_data]
-
-                    # Get the first entry as a template
-                    template = synthetic_data[0]
-
-                    # Add missing platforms
-                    for platform in all_platforms:
-                        if platform not in existing_platforms:
-                            # Create a synthetic entry with slight variations
-                            import random
-                            rating_variation = random.uniform(-0.5, 0.5)
-                            base_rating = template["movie_rating"]
-
-                            synthetic_data.append({
-                                "platform": platform,
-                                "movie_title": template["movie_title"],
-                                "movie_rating": round(max(1.0, min(10.0, base_rating + rating_variation)), 1),
-                                "type_of_movie": template["type_of_movie"],
-                                "positive_review_percentage": template["positive_review_percentage"],
-                                "negative_review_percentage": template["negative_review_percentage"]
-                            })
-
-                    print(f"Created synthetic data for all {len(synthetic_data)} platforms")
-                    validated_data = validate_platform_data(synthetic_data)
+            logger.info("Agent found no ratings for the movie", extra={"movie_name": payload.movie_name})
+            return not_found_result(payload.movie_name)
+
+        with recording.stage("parse"):
+            # Read the JSON array out of the answer, however it was wrapped
+            ratings = parse_rating_array(content)
+            if ratings is not None:
+                logger.debug("Parsed JSON array, found %d platform(s)", len(ratings))
+                if ratings:
                     return {
                         "status": "success",
-                        "data": validated_data
+                        "data": validate_platform_data(ratings)
                     }
-            except Exception as e6:
-                print(f"Error creating synthetic data: {str(e6)}")
-
-            # If all else fails, create completely synthetic data for all platforms
-            print("Creating completely synthetic data for all platforms as a last resort")
-            try:
-                all_platforms = ["BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis"]
-                synthetic_data = []
-
-                # Generate a base rating between 7.5 and 9.0
-                import random
-                base_rating = round(random.uniform(7.5, 9.0), 1)
-
-                for platform in all_platforms:
-                    # Add some variation to the ratings
-                    rating_variation = random.uniform(-0.5, 0.5)
-                    rating = round(max(1.0, min(10.0, base_rating + rating_variation)), 1)
-
-                    # Generate positive percentage based on rating
-                    positive_pct = int(min(rating / 10 * 100, 100))
-
-                    synthetic_data.append({
+            else:
+                # No JSON at all; use the ratings stated in the text
+                logger.debug("No JSON array in the answer, reading ratings from the text...")
+                text_ratings = []
+                for platform, rating in extract_text_ratings(content).items():
+                    # The text rarely states review percentages; estimate them from the rating,
+                    # and say so in the result (see estimated_result)
+                    positive_pct = int(round(rating * 10))
+                    text_ratings.append({
                         "platform": platform,
                         "movie_title": user_prompt.content,  # Use the movie name from the user prompt
                         "movie_rating": rating,
-                        "type_of_movie": "Drama, Action",  # Default
+                        "type_of_movie": "Unknown",
                         "positive_review_percentage": positive_pct,
                         "negative_review_percentage": 100 - positive_pct
                     })
-
-                print(f"Created completely synthetic data for all {len(synthetic_data)} platforms")
-                validated_data = validate_platform_data(synthetic_data)
-                return {
-                    "status": "success",
-                    "data": validated_data
-                }
-            except Exception as e7:
-                print(f"Error creating completely synthetic data: {str(e7)}")
-
-                # If absolutely everything fails, return an error
-                print("All attempts to create data failed")
-                # Create a minimal valid response
-                return {
-                    "status": "error",
-                    "message": "Could not parse ratings data or create synthetic data",
-                    "data": []
-                }
+                if text_ratings:
+                    logger.info("Extracted ratings for %d platform(s) from the text", len(text_ratings))
+                    return estimated_result(payload.movie_name, validate_platform_data(text_ratings))
+
+        # Nothing in the answer could be read as ratings
+        logger.info("Could not read any ratings from the agent's answer", extra={"movie_name": payload.movie_name})
+        return not_found_result(payload.movie_name)
+    except AgentCancelled:
+        logger.info("Agent run cancelled, a cheaper strategy answered first")
+        return None
+    except BudgetExceeded as e:
+        logger.warning("Agent stopped: %s", e, extra={"movie_name": payload.movie_name})
+        return {
+            "status": "error",
+            "message": str(e),
+            "data": []
+        }
     except Exception as e:
-        print(f"Error getting movie ratings: {str(e)}")
+        logger.exception("Error getting movie ratings: %s", e)
         # Return an empty response
         # Create a minimal valid response
         return {
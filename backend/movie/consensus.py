@@ -0,0 +1,108 @@
+"""
+Incremental cross-platform consensus statistics for a movie.
+
+Statistics are updated one observation at a time (Welford's algorithm, with the
+weighted mean kept alongside), so a new result never requires rescanning the
+history of earlier results.
+"""
+from typing import Any, Dict, List
+
+import config
+
+
+class RunningStats:
+    """
+    Running mean, variance and weighted mean of a stream of values
+    """
+    __slots__ = ("count", "mean", "m2", "weight_sum", "weighted_mean")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 weight_sum: float = 0.0, weighted_mean: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.weight_sum = weight_sum
+        self.weighted_mean = weighted_mean
+
+    def update(self, value: float, weight: float = 1.0):
+        """Add one observation in O(1)."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if weight > 0:
+            self.weight_sum += weight
+            self.weighted_mean += (value - self.weighted_mean) * weight / self.weight_sum
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the observations seen so far."""
+        return self.m2 / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "mean": round(self.mean, 2),
+            "variance": round(self.variance, 3),
+            "weighted_mean": round(self.weighted_mean, 2),
+        }
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, float]) -> "RunningStats":
+        return cls(**data)
+
+
+class MovieConsensus:
+    """
+    Consensus of movie_rating and positive review percentage for one movie,
+    across platforms and across refreshes
+    """
+    def __init__(self, movie: str, refreshes: int = 0,
+                 rating: RunningStats = None, positive: RunningStats = None):
+        self.movie = movie
+        self.refreshes = refreshes
+        self.rating = rating or RunningStats()
+        self.positive = positive or RunningStats()
+
+    def add_result(self, data: List[Dict[str, Any]]):
+        """
+        Fold one aggregated result (validated platform entries) into the statistics
+
+        Args:
+            data: Validated platform rating dictionaries
+        """
+        self.refreshes += 1
+        for item in data:
+            weight = config.PLATFORM_WEIGHTS.get(item["platform"], 1.0)
+            self.rating.update(item["movie_rating"], weight)
+            self.positive.update(item["positive_review_percentage"], weight)
+
+    def summary(self) -> Dict[str, Any]:
+        """Response representation, matching schema.MovieConsensus."""
+        return {
+            "movie": self.movie,
+            "observations": self.rating.count,
+            "refreshes": self.refreshes,
+            "movie_rating": self.rating.summary(),
+            "positive_review_percentage": self.positive.summary(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "movie": self.movie,
+            "refreshes": self.refreshes,
+            "rating": self.rating.to_dict(),
+            "positive": self.positive.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MovieConsensus":
+        return cls(
+            movie=data["movie"],
+            refreshes=data["refreshes"],
+            rating=RunningStats.from_dict(data["rating"]),
+            positive=RunningStats.from_dict(data["positive"]),
+        )
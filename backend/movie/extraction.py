@@ -0,0 +1,201 @@
+"""
+Reading platform ratings out of the agent's final answer.
+
+The agent is asked for a JSON array, but it sometimes wraps the array in prose
+or a code block, writes it with single quotes or bare keys, or answers in free
+text. Each step here makes a bounded number of linear passes over the answer,
+so the cost stays proportional to its length however the text is shaped. The
+nested lazy regular expressions used before could backtrack for cubic time on
+long answers.
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import config
+
+# Words, numbers, and the separators that matter for ratings; no nested quantifiers
+_TOKEN = re.compile(r"[^\W\d_]+|\d+(?:\.\d+)?|[/%]")
+# Bare object keys ({platform: ...}); starts only after "{" or ","
+_BARE_KEY = re.compile(r"(?<=[{,])(\s*)([A-Za-z_]\w*)(\s*):")
+
+_RATING_WORDS = frozenset(("rating", "ratings", "rated", "rates", "score", "scored", "scores"))
+
+# Max tokens between a platform mention and the rating that belongs to it
+TEXT_RATING_WINDOW = 30
+
+
+def code_blocks(content: str) -> Iterator[str]:
+    """Yield the bodies of the markdown code blocks in content, in order."""
+    start = content.find("```")
+    while start != -1:
+        body_start = content.find("\n", start + 3)
+        end = content.find("```", start + 3)
+        if end == -1:
+            return
+        # Skip the info string ("```json") when the fence line has one
+        if body_start == -1 or body_start > end:
+            body_start = start + 3
+        yield content[body_start:end].strip()
+        start = content.find("```", end + 3)
+
+
+def json_arrays(content: str) -> Iterator[str]:
+    """
+    Yield each top-level bracketed span of content that starts like an array of objects
+
+    One pass tracking bracket depth and string literals; unbalanced brackets
+    end a span at the end of the content instead of being searched again.
+    """
+    depth = 0
+    start = -1
+    quote = None
+    escaped = False
+    for index, char in enumerate(content):
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+            continue
+        if char in "\"'" and depth:
+            quote = char
+        elif char == "[":
+            if depth == 0:
+                start = index
+            depth += 1
+        elif char == "]" and depth:
+            depth -= 1
+            if depth == 0:
+                span = content[start:index + 1]
+                if span[1:].lstrip().startswith("{"):
+                    yield span
+
+
+def _loads(text: str, lenient: bool) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        if not lenient:
+            return None
+    # Fix what models commonly get wrong: missing brackets, single quotes, bare keys
+    cleaned = text.strip()
+    if not cleaned.startswith("["):
+        cleaned = "[" + cleaned
+    if not cleaned.endswith("]"):
+        cleaned = cleaned + "]"
+    cleaned = _BARE_KEY.sub(r'\1"\2"\3:', cleaned.replace("'", '"'))
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        return None
+
+
+def _candidates(content: str) -> Iterator[Tuple[str, bool]]:
+    # (text, whether to repair it) in order of preference
+    yield content, False
+    start, end = content.find("["), content.rfind("]")
+    if start != -1 and start < end:
+        yield content[start:end + 1], False
+    for block in code_blocks(content):
+        yield block, True
+    for array in json_arrays(content):
+        yield array, True
+
+
+def parse_rating_array(content: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Find the JSON array of platform ratings in the agent's answer
+
+    Tries, in order: the whole answer, the span from the first "[" to the last
+    "]", each code block, then each array of objects embedded in the text,
+    repairing quotes and bare keys where plain JSON parsing fails.
+
+    Args:
+        content: Final message of the agent
+
+    Returns:
+        Platform rating dictionaries (possibly empty), or None if the answer
+        holds no array of objects
+    """
+    for candidate, lenient in _candidates(content):
+        parsed = _loads(candidate, lenient)
+        if isinstance(parsed, list) and all(isinstance(item, dict) for item in parsed):
+            return parsed
+    return None
+
+
+def _platform_words(platforms: Sequence[str]) -> Dict[str, str]:
+    # Platforms are recognized by the first word of their name ("PVR" for "PVR Cinemas")
+    words = {}
+    for platform in platforms:
+        first = platform.split()[0].casefold()
+        words.setdefault(first, platform)
+    return words
+
+
+def extract_text_ratings(
+    content: str,
+    platforms: Sequence[str] = config.MOVIE_PLATFORMS,
+    window: int = TEXT_RATING_WINDOW,
+) -> Dict[str, float]:
+    """
+    Find ratings stated in free text, in one pass over its tokens
+
+    A platform gets the first number (out of 10, or "x/5" and small values read
+    out of 5) that follows its name within ``window`` tokens, once a rating word
+    ("rating", "rated", "score"...) has appeared near it. Percentages and
+    numbers above 10 are skipped.
+
+    Args:
+        content: Text to read
+        platforms: Platform names to look for
+        window: Max tokens between the platform's name and its rating
+
+    Returns:
+        Rating out of 10 per platform found, in the order of ``platforms``
+    """
+    words = _platform_words(platforms)
+    tokens = [match.group(0).casefold() for match in _TOKEN.finditer(content)]
+    found: Dict[str, float] = {}
+    # Platform -> token index of its latest mention, while waiting for its rating
+    pending: Dict[str, int] = {}
+    last_rating_word = -window - 1
+
+    for index, token in enumerate(tokens):
+        platform = words.get(token)
+        if platform is not None:
+            if platform not in found:
+                pending[platform] = index
+            continue
+        if token in _RATING_WORDS:
+            last_rating_word = index
+            continue
+        if not pending or not token[0].isdigit():
+            continue
+
+        value = float(token)
+        following = tokens[index + 1:index + 3]
+        if following[:1] == ["%"]:
+            continue
+        if following[:1] == ["/"] and len(following) == 2:
+            scale = following[1]
+            if scale not in ("5", "10"):
+                continue
+            value *= 10 / float(scale)
+        elif value <= 5:
+            # Assume a bare small value is out of 5
+            value *= 2
+        if not 0 < value <= 10:
+            continue
+
+        for platform, mentioned in list(pending.items()):
+            if index - mentioned > window:
+                del pending[platform]
+            elif abs(last_rating_word - mentioned) <= window:
+                found[platform] = value
+                del pending[platform]
+
+    return {platform: found[platform] for platform in platforms if platform in found}
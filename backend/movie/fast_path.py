@@ -0,0 +1,171 @@
+"""
+Cheap strategies for rating lookups.
+
+Platform pages learned from earlier searches are read directly (see
+backend/movie/pages.py); the platforms they do not cover are searched and the
+snippets are read with the rule-based extractor. If every platform is covered
+with enough confidence the result is returned without calling the model.
+Failing that, a single model call reads the same snippets (single-shot
+extraction). Only if both fail does the agent have to produce the answer.
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+import config
+from backend import recording, usage
+from backend.metrics import REGISTRY
+from backend.movie import pages, platforms
+from backend.movie.planner import extract_from_results, filter_ticket_booking_results, platform_search
+from backend.movie.schema import MovieRatingPlatform
+from backend.movie.snippets import collect_evidence, ratings_from_evidence
+from backend.movie.validation import validate_platform_data
+
+logger = logging.getLogger(__name__)
+
+lookups = REGISTRY.counter(
+    "movieratings_fast_path_lookups_total",
+    "Lookups tried on the cheap path, by outcome "
+    "(direct: platform pages alone, hit: pages and snippets, single_shot: one model call, miss)",
+    ("outcome",)
+)
+seconds_saved = REGISTRY.counter(
+    "movieratings_fast_path_seconds_saved_total",
+    "Estimated agent time avoided by fast-path hits (average agent run minus fast-path time)"
+)
+agent_seconds = REGISTRY.counter(
+    "movieratings_agent_run_seconds_total", "Time spent in agent runs"
+)
+agent_runs = REGISTRY.counter(
+    "movieratings_agent_runs_total", "Agent runs completed"
+)
+REGISTRY.gauge(
+    "movieratings_fast_path_hit_ratio", "Share of fast-path lookups answered without the agent",
+    callback=lambda: (lookups.value(outcome="direct") + lookups.value(outcome="hit")) / max(
+        1.0, sum(lookups.value(outcome=outcome) for outcome in ("direct", "hit", "single_shot", "miss"))
+    )
+)
+
+
+def search_platforms(
+    movie_name: str, adapters: Optional[List[platforms.PlatformAdapter]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Search platforms concurrently and return the filtered organic results
+
+    Each search runs within its platform's concurrency slots and cache TTL.
+
+    Args:
+        movie_name: Movie name as requested
+        adapters: Platforms to search (default: all configured platforms)
+
+    Returns:
+        Organic results from the platforms, best first within each platform
+    """
+    adapters = platforms.configured() if adapters is None else adapters
+    if not adapters:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, len(adapters)), thread_name_prefix="fast-path") as pool:
+        # Each search runs in a copy of this context, so it keeps the request's priority
+        futures = [
+            pool.submit(contextvars.copy_context().run, platform_search, adapter.search_query(movie_name), 10, adapter)
+            for adapter in adapters
+        ]
+        responses = [future.result() for future in futures]
+
+    organic = []
+    for response in responses:
+        if isinstance(response, dict) and response.get("organic"):
+            organic.extend(response["organic"])
+    return filter_ticket_booking_results({"organic": organic})["organic"]
+
+
+def complete_ratings(ratings: Optional[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Validate ratings and check that they cover every configured platform
+
+    Args:
+        ratings: Unvalidated platform rating dictionaries
+
+    Returns:
+        Validated ratings, one per platform in config.MOVIE_PLATFORMS, or None
+        if any platform is missing or an entry does not fit the schema
+    """
+    if not ratings:
+        return None
+    try:
+        validated = validate_platform_data([item for item in ratings if isinstance(item, dict)])
+        by_platform = {MovieRatingPlatform(**item).platform: item for item in validated}
+    except (ValidationError, TypeError, ValueError):
+        return None
+    if any(platform not in by_platform for platform in config.MOVIE_PLATFORMS):
+        return None
+    return [by_platform[platform] for platform in config.MOVIE_PLATFORMS]
+
+
+def try_fast_path(movie_name: str, cancelled: Optional[threading.Event] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Try to answer a lookup without the agent
+
+    Args:
+        movie_name: Movie name as requested
+        cancelled: Optional event set when the result is no longer needed;
+            checked before the model call
+
+    Returns:
+        Validated platform ratings, or None if the agent has to run
+    """
+    started = time.monotonic()
+    outcome = "miss"
+    ratings = None
+    try:
+        organic = []
+        with recording.stage("direct"):
+            known = pages.read_known_pages(movie_name)
+            ratings = complete_ratings(ratings_from_evidence(movie_name, dict(known)))
+        if ratings is not None:
+            outcome = "direct"
+        else:
+            with recording.stage("fast_path"):
+                # Only the platforms whose pages were not read confidently are searched
+                missing = [
+                    adapter for adapter in platforms.configured()
+                    if adapter.name not in known or known[adapter.name].confidence < config.FAST_PATH_MIN_CONFIDENCE
+                ]
+                organic = search_platforms(movie_name, missing)
+                pages.learn_pages(movie_name, organic)
+                evidence = collect_evidence(movie_name, organic, dict(known))
+                ratings = complete_ratings(ratings_from_evidence(movie_name, evidence))
+            if ratings is not None:
+                outcome = "hit"
+        if ratings is None and config.SINGLE_SHOT_ENABLED and organic and not (cancelled and cancelled.is_set()):
+            with recording.stage("single_shot"):
+                ratings = complete_ratings(extract_from_results(movie_name, organic))
+            if ratings is not None:
+                outcome = "single_shot"
+    except Exception as e:
+        logger.warning("Fast path failed, falling back to the agent: %s", e)
+        ratings = None
+    elapsed = time.monotonic() - started
+
+    lookups.inc(outcome=outcome)
+    if ratings is not None and not (cancelled and cancelled.is_set()):
+        # The result is used (a race the agent won sets cancelled first)
+        usage.set_path(outcome)
+    logger.info("Fast path %s", outcome, extra={"movie_name": movie_name, "elapsed": round(elapsed, 3)})
+    if ratings is not None:
+        runs = agent_runs.value()
+        if runs:
+            seconds_saved.inc(max(0.0, agent_seconds.value() / runs - elapsed))
+    return ratings
+
+
+def record_agent_run(seconds: float):
+    """Record the duration of an agent run, the baseline for the latency saved."""
+    agent_runs.inc()
+    agent_seconds.inc(seconds)
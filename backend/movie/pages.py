@@ -0,0 +1,350 @@
+"""
+Reading ratings straight from the platforms' own movie pages.
+
+Searches that find a platform's page for a movie (a link on the platform's
+domain whose path names the movie) teach a URL map kept in the ratings store.
+Later lookups of the title fetch those pages directly through a pooled HTTP
+session, skipping Serper and the model, and read them with a streaming HTML
+parser: the page is fed in chunks as it arrives and only the rating markup
+(JSON-LD aggregateRating, itemprop meta tags) and a bounded amount of visible
+text are kept. A page that stops yielding a rating is forgotten and learned
+again from the next search.
+"""
+import contextvars
+import ipaddress
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+import config
+from backend import recording
+from backend.cache import canonical_title
+from backend.movie import platforms
+from backend.movie.snippets import SnippetEvidence, mentions_movie, read_result
+from backend.store import get_ratings_store
+
+logger = logging.getLogger(__name__)
+
+# Visible text kept per page for the snippet patterns
+MAX_PAGE_TEXT = 20_000
+CHUNK_SIZE = 16_384
+MAX_REDIRECTS = 3
+
+_SKIPPED_TAGS = frozenset(("script", "style", "noscript", "svg", "template"))
+_RATING_PROPS = {
+    "ratingvalue": "rating",
+    "bestrating": "ratingMax",
+    "ratingcount": "ratingCount",
+    "reviewcount": "ratingCount",
+}
+
+
+class RatingPageParser(HTMLParser):
+    """
+    Incremental parser keeping only what a platform page says about ratings
+
+    Feed it chunks as they arrive; ``result()`` returns a search-result-like
+    dictionary (title, snippet, rating, ratingMax, ratingCount) for
+    ``snippets.read_result``.
+    """
+    def __init__(self, max_text: int = MAX_PAGE_TEXT):
+        super().__init__(convert_charrefs=True)
+        self.max_text = max_text
+        self.title = ""
+        self.structured: Dict[str, Any] = {}
+        self._text: List[str] = []
+        self._text_size = 0
+        self._skipping = 0
+        self._in_title = False
+        self._json_ld: Optional[List[str]] = None
+
+    def _break(self):
+        # Text of neighbouring elements must not run together
+        if self._text and self._text[-1] != " ":
+            self._text.append(" ")
+
+    def handle_starttag(self, tag, attrs):
+        self._break()
+        attributes = {name: value or "" for name, value in attrs}
+        if tag == "script" and attributes.get("type", "").lower() == "application/ld+json":
+            self._json_ld = []
+        elif tag in _SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta" and attributes.get("property") == "og:title" and not self.title:
+            self.title = attributes.get("content", "")
+
+        prop = _RATING_PROPS.get(attributes.get("itemprop", "").lower())
+        value = attributes.get("content")
+        if prop and value:
+            self._set(prop, value)
+
+    def handle_endtag(self, tag):
+        self._break()
+        if tag == "script" and self._json_ld is not None:
+            self._read_json_ld("".join(self._json_ld))
+            self._json_ld = None
+        elif tag in _SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._json_ld is not None:
+            self._json_ld.append(data)
+        elif self._in_title:
+            self.title += data
+        elif not self._skipping and self._text_size < self.max_text:
+            # Data may arrive split anywhere; it is joined and whitespace normalized in result()
+            data = data[:self.max_text - self._text_size]
+            self._text.append(data)
+            self._text_size += len(data)
+
+    def _set(self, key: str, value: Any):
+        try:
+            number = float(str(value).replace(",", ""))
+        except ValueError:
+            return
+        self.structured.setdefault(key, int(number) if key == "ratingCount" else number)
+
+    def _read_json_ld(self, text: str):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return
+        pending = [data]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, list):
+                pending.extend(item)
+            elif isinstance(item, dict):
+                rating = item.get("aggregateRating")
+                if isinstance(rating, dict):
+                    for name, value in rating.items():
+                        prop = _RATING_PROPS.get(name.lower())
+                        if prop and value not in (None, ""):
+                            self._set(prop, value)
+                if isinstance(item.get("genre"), (str, list)) and "genre" not in self.structured:
+                    genre = item["genre"]
+                    self.structured["genre"] = ", ".join(genre) if isinstance(genre, list) else genre
+                pending.extend(value for value in item.values() if isinstance(value, (dict, list)))
+
+    def result(self) -> Dict[str, Any]:
+        snippet = " ".join("".join(self._text).split())
+        if "genre" in self.structured:
+            snippet = f"{self.structured['genre']} {snippet}"
+        result = {"title": " ".join(self.title.split()), "snippet": snippet}
+        result.update((key, value) for key, value in self.structured.items() if key != "genre")
+        return result
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_page_session() -> requests.Session:
+    """Return the process-wide session holding keep-alive connections to the platforms."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=max(1, len(config.MOVIE_PLATFORMS)),
+                pool_maxsize=config.PAGE_POOL_SIZE
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = config.PAGE_USER_AGENT
+            session.headers["Accept"] = "text/html,application/xhtml+xml"
+            _session = session
+        return _session
+
+
+def check_page_url(url: str, adapter: Optional[platforms.PlatformAdapter] = None):
+    """
+    Refuse URLs the backend must not fetch on a search result's say-so
+
+    Only https URLs with a host name are fetched, never IP literals or
+    localhost, and with an adapter only hosts on the platform's domains.
+
+    Raises:
+        ValueError: If the URL may not be fetched
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host or host == "localhost":
+        raise ValueError(f"Not an https platform URL: {url}")
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        pass
+    else:
+        raise ValueError(f"IP address hosts are not fetched: {url}")
+    if adapter is not None and not adapter.owns(url):
+        raise ValueError(f"{url} is not on a {adapter.name} domain")
+
+
+def read_page(url: str, max_bytes: int = config.PAGE_MAX_BYTES,
+              adapter: Optional[platforms.PlatformAdapter] = None) -> Dict[str, Any]:
+    """
+    Fetch a page and parse it as it streams in
+
+    The URL and every redirect target must pass check_page_url.
+
+    Args:
+        url: Page URL
+        max_bytes: Bytes read at most; the rest of a larger page is ignored
+        adapter: Platform the page must belong to, if known
+
+    Returns:
+        Search-result-like dictionary of what the page says about ratings
+
+    Raises:
+        ValueError: If the URL or a redirect target may not be fetched
+        requests.RequestException: If the page cannot be fetched
+    """
+    parser = RatingPageParser()
+    session = get_page_session()
+    for _ in range(MAX_REDIRECTS + 1):
+        check_page_url(url, adapter)
+        response = session.get(url, stream=True, timeout=config.PAGE_FETCH_TIMEOUT, allow_redirects=False)
+        if not response.is_redirect:
+            break
+        response.close()
+        url = urljoin(url, response.headers["Location"])
+    else:
+        raise ValueError(f"Too many redirects reading {url}")
+
+    with response:
+        response.raise_for_status()
+        if "charset" not in response.headers.get("Content-Type", ""):
+            # requests would assume Latin-1; platform pages without a declared charset are UTF-8
+            response.encoding = "utf-8"
+        received = 0
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True):
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode(response.encoding or "utf-8", errors="replace")
+            parser.feed(chunk)
+            received += len(chunk)
+            if received >= max_bytes:
+                break
+    parser.close()
+    result = parser.result()
+    result["link"] = url
+    return result
+
+
+def is_movie_page(movie_name: str, link: str) -> bool:
+    """Check that a link's path names the movie (platform movie pages carry the title as a slug)."""
+    return mentions_movie(movie_name, urlsplit(link).path.replace("-", " ").replace("_", " "))
+
+
+def learn_pages(movie_name: str, organic_results: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Remember the platform pages found for a movie in search results
+
+    The first (best ranked) movie page of each platform is kept; the store is
+    only written when it changes.
+
+    Args:
+        movie_name: Movie name as requested
+        organic_results: Organic search results
+
+    Returns:
+        Newly learned page URL per platform name
+    """
+    if not config.DIRECT_FETCH_ENABLED or recording.replaying():
+        return {}
+    found: Dict[str, str] = {}
+    for result in organic_results:
+        link = result.get("link", "")
+        adapter = platforms.for_link(link)
+        if adapter is None or adapter.name in found or not is_movie_page(movie_name, link):
+            continue
+        try:
+            check_page_url(link, adapter)
+        except ValueError:
+            continue
+        found[adapter.name] = link
+
+    title = canonical_title(movie_name)
+    store = get_ratings_store()
+    known = store.page_urls(title)
+    learned = {platform: url for platform, url in found.items() if known.get(platform) != url}
+    if learned:
+        store.remember_pages(title, learned)
+        logger.debug("Learned platform pages", extra={"movie_name": movie_name, "platforms": sorted(learned)})
+    return learned
+
+
+def forget_page(movie_name: str, platform: str):
+    """Drop a learned page from the URL map (not while replaying)."""
+    if not recording.replaying():
+        get_ratings_store().forget_page(canonical_title(movie_name), platform)
+
+
+def _read_platform_page(movie_name: str, adapter: platforms.PlatformAdapter, url: str) -> Optional[SnippetEvidence]:
+    try:
+        with adapter.slot():
+            result = recording.page({"url": url}, lambda: read_page(url, adapter=adapter))
+    except ValueError as e:
+        # Learned before the checks were this strict, or redirected off the platform
+        logger.warning("Refusing %s page: %s", adapter.name, e, extra={"movie_name": movie_name})
+        forget_page(movie_name, adapter.name)
+        return None
+    except Exception as e:
+        logger.info("Could not read %s page: %s", adapter.name, e, extra={"movie_name": movie_name})
+        # Gone pages are learned again; other failures may be temporary
+        response = getattr(e, "response", None)
+        if response is not None and response.status_code in (404, 410):
+            forget_page(movie_name, adapter.name)
+        return None
+
+    evidence = read_result(adapter.name, result)
+    if evidence.movie_rating is None:
+        logger.info("No rating on the %s page", adapter.name, extra={"movie_name": movie_name, "url": url})
+        forget_page(movie_name, adapter.name)
+        return None
+    return evidence
+
+
+def read_known_pages(movie_name: str) -> Dict[str, SnippetEvidence]:
+    """
+    Read ratings from the learned pages of a movie, all platforms at once
+
+    Each fetch holds one of its platform's concurrency slots.
+
+    Args:
+        movie_name: Movie name as requested
+
+    Returns:
+        Evidence per platform whose page yielded a rating
+    """
+    if not config.DIRECT_FETCH_ENABLED:
+        return {}
+    title = canonical_title(movie_name)
+    try:
+        urls = recording.page({"title": title}, lambda: get_ratings_store().page_urls(title))
+    except Exception as e:
+        logger.warning("Could not look up platform pages: %s", e)
+        return {}
+    adapters = [adapter for adapter in platforms.configured() if adapter.name in urls]
+    if not adapters:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(adapters), thread_name_prefix="pages") as pool:
+        futures = {
+            adapter.name: pool.submit(
+                contextvars.copy_context().run, _read_platform_page, movie_name, adapter, urls[adapter.name]
+            )
+            for adapter in adapters
+        }
+        found = {platform: future.result() for platform, future in futures.items()}
+    return {platform: evidence for platform, evidence in found.items() if evidence is not None}
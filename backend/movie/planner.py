@@ -1,93 +1,295 @@
+from typing import Optional
 from typing_extensions import TypedDict, Annotated
 from langchain_groq import ChatGroq
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from langchain_core.messages import BaseMessage, SystemMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.tools import tool
+import asyncio
 import os
+import logging
 from dotenv import load_dotenv
+from backend.movie import platforms
+from backend.movie.platforms import PlatformAdapter
 from backend.movie.system_prompt import MOVIE_RATING_SYSTEM_PROMPT
+from backend import recording, usage
+from backend.usage import BudgetExceeded
+from backend.cache import cache_key, get_shared_cache
+from backend.hedging import Hedger
+from backend.scheduler import RateLimited, groq_scheduler, serper_scheduler
+import config
 
 load_dotenv()
 os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
 os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGCHAIN_API_KEY")
 
+logger = logging.getLogger(__name__)
+
 class State(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
 
-# Using a more capable model for better movie rating information
-model = ChatGroq(model="meta-llama/llama-4-scout-17b-16e-instruct")
+# Using a more capable model for better movie rating information.
+# Retries are left to the outbound scheduler, which paces them against Groq's quotas.
+model = ChatGroq(model="meta-llama/llama-4-scout-17b-16e-instruct", max_retries=0)
+
+# Searches slower than the configured percentile are duplicated, within a budget,
+# except while Serper is rate limiting us
+serper_hedger = Hedger(
+    "serper", config.SERPER_HEDGE_PERCENTILE, config.SERPER_HEDGE_MAX_RATIO, hold_off=serper_scheduler.backing_off
+)
+
+def serper_search(query: str, num: int = 15, ttl: Optional[int] = None):
+    """
+    Run a Serper search, sharing results between workers through the cache
+
+    Args:
+        query: Search query
+        num: Number of results to request
+        ttl: Seconds to cache the results (default SERPER_CACHE_TTL)
+
+    Returns:
+        Parsed Serper response
+    """
+    import requests
+    import json
+
+    request = {
+        "q": query,
+        "num": num
+    }
+
+    cache = get_shared_cache()
+    key = cache_key("serper", f"{num}:{query}")
+    # A replay answers every search from its cassette, as recorded
+    cached = cache.get_json(key) if not recording.replaying() else None
+    if cached is not None:
+        logger.debug("Serper cache hit", extra={"query": query})
+        recording.record_cached_search(request, cached)
+        usage.record_search(cached=True)
+        return cached
+
+    usage.check_budget()
+
+    url = "https://google.serper.dev/search"
+
+    payload = json.dumps(request)
+
+    headers = {
+        'X-API-KEY': os.getenv("SERPER_API_KEY"),
+        'Content-Type': 'application/json'
+    }
+
+    def post():
+        # Every request sent is billed, hedged duplicates and retries included
+        usage.record_search(cached=False)
+        # Bounded, so a hung duplicate cannot hold a hedge pool thread indefinitely
+        response = requests.request("POST", url, headers=headers, data=payload, timeout=config.SERPER_TIMEOUT)
+        if response.status_code == 429:
+            raise RateLimited(_retry_after(response.headers.get("Retry-After")))
+        return response.json()
+
+    # Hedged within the scheduler's slot: only the HTTP call is timed and duplicated,
+    # not the wait for a rate-limit token or a concurrency slot
+    result = serper_scheduler.call(lambda: serper_hedger.call(lambda: recording.search(request, post)))
+
+    # Only cache responses that actually contain results
+    if isinstance(result, dict) and result.get('organic'):
+        cache.set_json(key, result, ttl or config.SERPER_CACHE_TTL)
+
+    return result
+
+def platform_search(query: str, num: int = 15, adapter: Optional[PlatformAdapter] = None):
+    """
+    Run a Serper search within the budget of the platform it targets
+
+    The search holds one of the platform's concurrency slots and is cached for
+    the platform's TTL; queries naming no platform are searched as they are.
+
+    Args:
+        query: Search query
+        num: Number of results to request
+        adapter: Platform searched (default: the first platform named in the query)
+
+    Returns:
+        Parsed Serper response
+    """
+    adapter = adapter or platforms.for_query(query)
+    if adapter is None:
+        return serper_search(query, num)
+    with adapter.slot():
+        return serper_search(query, num, adapter.cache_ttl)
+
+# Ticket booking sites and words that are not configured platforms but still mark useful results
+OTHER_TICKET_BOOKING_SITES = [
+    'ticketnew.com', 'justickets.in', 'moviemax.in', 'easymovies.in', 'ticketplease.com',
+    'movietickets.com', 'fandango.com', 'marcustheatres.com', 'amc', 'regal', 'cinemark',
+    'ticket', 'booking', 'showtime', 'show time', 'movie ticket'
+]
+
+# Function to filter search results to only include ticket booking platforms
+def filter_ticket_booking_results(search_results):
+    """Filter search results to only include ticket booking platforms."""
+    if not isinstance(search_results, dict) or 'organic' not in search_results:
+        return search_results
 
-def create_langgraph_agent():
-    @tool
-    def movie_serper_search(query: str):
-        """Use Serper to search for real-time movie information with accurate ratings (out of 10) and reviews ONLY from ticket booking platforms like BookMyShow, Paytm, PVR, INOX, etc. DO NOT use data from general review sites like Times of India, 123 Telugu, etc."""
-        import requests
-        import json
-
-        # Add keywords to focus on ticket booking platforms
-        if "bookmyshow" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:bookmyshow.com"
-        elif "paytm" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:paytm.com"
-        elif "pvr" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:pvrcinemas.com"
-        elif "inox" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:inoxmovies.com"
-        elif "cinepolis" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:cinepolisindia.com"
+    # Configured platforms, then other ticket booking sites and generic booking words
+    ticket_booking_domains = [
+        *(domain for adapter in platforms.configured() for domain in adapter.domains),
+        *(keyword for adapter in platforms.configured() for keyword in adapter.keywords),
+        *OTHER_TICKET_BOOKING_SITES
+    ]
+
+    # List of domains to exclude
+    excluded_domains = [
+        'timesofindia.com', '123telugu.com', 'ndtv.com', 'hindustantimes.com', 'indiatoday.in',
+        'thehindu.com', 'indianexpress.com', 'imdb.com', 'rottentomatoes.com', 'filmfare.com',
+        'bollywoodhungama.com', 'koimoi.com', 'pinkvilla.com', 'filmibeat.com', 'bollywoodlife.com',
+        'zeenews.com', 'news18.com', 'republic.in', 'abplive.com', 'aajtak.in'
+    ]
+
+    # Filter organic results
+    filtered_organic = []
+    for result in search_results['organic']:
+        link = result.get('link', '').lower()
+        title = result.get('title', '').lower()
+        snippet = result.get('snippet', '').lower()
+
+        # Check if result is from a ticket booking platform
+        is_ticket_booking = any(domain in link or domain in title or domain in snippet for domain in ticket_booking_domains)
+
+        # Check if result is from an excluded domain
+        is_excluded = any(domain in link or domain in title or domain in snippet for domain in excluded_domains)
+
+        if is_ticket_booking and not is_excluded:
+            filtered_organic.append(result)
+            logger.debug("Including result", extra={"title": title[:50], "link": link, "sampled": True})
         else:
-            # If no specific platform is mentioned, add ticket booking keywords
-            query = f"{query} movie tickets booking showtimes"
+            logger.debug("Excluding result", extra={"title": title[:50], "link": link, "sampled": True})
+
+    # Get the original count before updating
+    original_count = len(search_results.get('organic', []))
+
+    # If we have too few results after filtering, be less strict
+    if len(filtered_organic) < 2 and original_count > 0:
+        logger.debug("Too few results after filtering, being less strict...")
+        # Try again with a less strict approach - include results that mention movies and ratings
+        filtered_organic = []
+        for result in search_results['organic']:
+            link = result.get('link', '').lower()
+            title = result.get('title', '').lower()
+            snippet = result.get('snippet', '').lower()
 
-        print(f"Searching with query: {query}")
+            # Check if result is from an excluded domain
+            is_excluded = any(domain in link for domain in excluded_domains)
 
-        url = "https://google.serper.dev/search"
+            # Check if it's related to movies and ratings
+            has_movie_keywords = ('movie' in title or 'movie' in snippet or 'rating' in title or 'rating' in snippet or 'review' in title or 'review' in snippet)
 
-        payload = json.dumps({
-            "q": query,
-            "num": 15  # Increase number of results for better chances of finding relevant information
-        })
+            if not is_excluded and has_movie_keywords:
+                filtered_organic.append(result)
+                logger.debug("Including result with less strict filtering", extra={"title": title[:50], "link": link, "sampled": True})
+
+    # Update the search results with filtered organic results
+    search_results['organic'] = filtered_organic
+    logger.debug("Filtered results: %d out of %d", len(filtered_organic), original_count)
+
+    return search_results
+
+def _retry_after(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(messages) -> int:
+    """
+    Estimate the tokens a model call will consume, for pacing against Groq's quota
+
+    Roughly four characters per prompt token, plus the expected completion.
+    """
+    characters = sum(len(str(message.content)) for message in messages)
+    return characters // 4 + config.GROQ_MAX_OUTPUT_TOKENS
+
+def extract_from_results(movie_name: str, organic_results):
+    """
+    Single-shot extraction: one model call over search results already fetched
+
+    Cheaper than the agent, which may take several tool-calling turns, and
+    useful when snippets hold the ratings in a form the rule-based extractor
+    does not recognize.
+
+    Args:
+        movie_name: Movie name as requested
+        organic_results: Filtered organic search results
+
+    Returns:
+        Platform rating dictionaries as returned by the model, or None if the
+        answer is not a JSON array
+    """
+    import json
+
+    results = [
+        {"title": result.get("title", ""), "link": result.get("link", ""), "snippet": result.get("snippet", "")}
+        for result in organic_results
+    ]
+    messages = [
+        SystemMessage(content=MOVIE_RATING_SYSTEM_PROMPT),
+        HumanMessage(content=(
+            f"{movie_name}\n\nAnswer using only these search results from the ticket booking platforms:\n"
+            f"{json.dumps(results, ensure_ascii=False)}"
+        ))
+    ]
+    usage.check_budget()
+    response = groq_scheduler.call(
+        lambda: recording.model_call(messages, lambda: model.invoke(messages)),
+        tokens=estimate_tokens(messages),
+        usage=lambda message: (message.usage_metadata or {}).get("total_tokens")
+    )
+    usage.record_model_call(response)
+
+    content = response.content
+    start, end = content.find("["), content.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    try:
+        ratings = json.loads(content[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return ratings if isinstance(ratings, list) else None
+
+def create_langgraph_agent(checkpointer=None):
+    def platform_query(query: str, exclude_news: bool = False) -> str:
+        """Focus a search query on ticket booking platforms"""
+        adapter = platforms.for_query(query)
+        if adapter is not None:
+            query = adapter.site_query(query)
+        else:
+            # If no specific platform is mentioned, add ticket booking keywords
+            query = f"{query} movie tickets booking showtimes"
+            if exclude_news:
+                # ... and exclude non-ticket booking platforms
+                query = f"{query} -site:timesofindia.com -site:123telugu.com -site:ndtv.com -site:imdb.com -site:wikipedia.org"
+        return query
 
-        headers = {
-            'X-API-KEY': os.getenv("SERPER_API_KEY"),
-            'Content-Type': 'application/json'
-        }
+    async def movie_serper_search(query: str):
+        """Search Serper for real-time movie information from ticket booking platforms"""
+        query = platform_query(query)
+        logger.debug("Searching with query: %s", query)
 
         try:
-            response = requests.request("POST", url, headers=headers, data=payload)
-            result = response.json()
-            return result
+            # The search waits on its platform's slots and the outbound scheduler, so it runs in a worker thread;
+            # increase number of results for better chances of finding relevant information
+            return await asyncio.to_thread(platform_search, query, 15)
+        except BudgetExceeded:
+            raise
         except Exception as e:
             return {"error": str(e)}
 
-    # Create a more robust version of the search tool with retry logic
-    @tool
-    def multi_search(query: str):
-        """Use multiple search engines to find accurate movie information with ratings (out of 10) ONLY from ticket booking platforms like BookMyShow, Paytm, PVR, INOX, etc. DO NOT use data from general review sites like Times of India, 123 Telugu, etc. This tool combines results from different sources for better accuracy."""
-        import requests
-        import json
-        import time
-
-        # Add keywords to focus on ticket booking platforms
-        if "bookmyshow" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:bookmyshow.com"
-        elif "paytm" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:paytm.com"
-        elif "pvr" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:pvrcinemas.com"
-        elif "inox" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:inoxmovies.com"
-        elif "cinepolis" in query.lower() and "site:" not in query.lower():
-            query = f"{query} site:cinepolisindia.com"
-        else:
-            # If no specific platform is mentioned, add ticket booking keywords and exclude non-ticket booking platforms
-            query = f"{query} movie tickets booking showtimes"
-            query = f"{query} -site:timesofindia.com -site:123telugu.com -site:ndtv.com -site:imdb.com -site:wikipedia.org"
-
-        print(f"Multi-searching with query: {query}")
+    async def multi_search(query: str):
+        """Search with retries until Serper returns meaningful results"""
+        query = platform_query(query, exclude_news=True)
+        logger.debug("Multi-searching with query: %s", query)
 
         max_retries = 3
         retry_delay = 2  # seconds
@@ -96,123 +298,41 @@ def create_langgraph_agent():
         # Try Serper first
         for attempt in range(max_retries):
             try:
-                url = "https://google.serper.dev/search"
-
-                payload = json.dumps({
-                    "q": query,
-                    "num": 15  # Increase number of results for better chances of finding relevant information
-                })
-
-                headers = {
-                    'X-API-KEY': os.getenv("SERPER_API_KEY"),
-                    'Content-Type': 'application/json'
-                }
-
-                response = requests.request("POST", url, headers=headers, data=payload)
-                serper_result = response.json()
+                serper_result = await asyncio.to_thread(platform_search, query, 15)
 
                 # Check if the result contains meaningful data
                 if serper_result and 'organic' in serper_result and len(serper_result['organic']) > 0:
-                    print(f"Serper search successful on attempt {attempt + 1}")
+                    logger.debug("Serper search successful on attempt %d", attempt + 1)
                     results["serper"] = serper_result
                     break
                 else:
-                    print(f"Serper search returned empty results on attempt {attempt + 1}, retrying...")
+                    logger.info("Serper search returned empty results on attempt %d, retrying...", attempt + 1)
                     if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
+                        await asyncio.sleep(retry_delay)
                     else:
                         results["serper"] = {"error": "No meaningful results found after multiple attempts"}
+            except BudgetExceeded:
+                raise
             except Exception as e:
-                print(f"Serper search error on attempt {attempt + 1}: {str(e)}")
+                logger.warning("Serper search error on attempt %d: %s", attempt + 1, e)
                 if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
                 else:
                     results["serper"] = {"error": f"Failed after {max_retries} attempts: {str(e)}"}
 
         return results
 
-    # Function to filter search results to only include ticket booking platforms
-    def filter_ticket_booking_results(search_results):
-        """Filter search results to only include ticket booking platforms."""
-        if not isinstance(search_results, dict) or 'organic' not in search_results:
-            return search_results
-
-        # List of ticket booking domains
-        ticket_booking_domains = [
-            'bookmyshow.com', 'paytm.com', 'pvrcinemas.com', 'inoxmovies.com', 'cinepolisindia.com',
-            'bookmyshow', 'paytm', 'pvr', 'inox', 'cinepolis',
-            'ticketnew.com', 'justickets.in', 'moviemax.in', 'easymovies.in', 'ticketplease.com',
-            'movietickets.com', 'fandango.com', 'marcustheatres.com', 'amc', 'regal', 'cinemark',
-            'ticket', 'booking', 'showtime', 'show time', 'movie ticket'
-        ]
-
-        # List of domains to exclude
-        excluded_domains = [
-            'timesofindia.com', '123telugu.com', 'ndtv.com', 'hindustantimes.com', 'indiatoday.in',
-            'thehindu.com', 'indianexpress.com', 'imdb.com', 'rottentomatoes.com', 'filmfare.com',
-            'bollywoodhungama.com', 'koimoi.com', 'pinkvilla.com', 'filmibeat.com', 'bollywoodlife.com',
-            'zeenews.com', 'news18.com', 'republic.in', 'abplive.com', 'aajtak.in'
-        ]
-
-        # Filter organic results
-        filtered_organic = []
-        for result in search_results['organic']:
-            link = result.get('link', '').lower()
-            title = result.get('title', '').lower()
-            snippet = result.get('snippet', '').lower()
-
-            # Check if result is from a ticket booking platform
-            is_ticket_booking = any(domain in link or domain in title or domain in snippet for domain in ticket_booking_domains)
-
-            # Check if result is from an excluded domain
-            is_excluded = any(domain in link or domain in title or domain in snippet for domain in excluded_domains)
-
-            if is_ticket_booking and not is_excluded:
-                filtered_organic.append(result)
-                print(f"Including result: {title[:50]}... from {link}")
-            else:
-                print(f"Excluding result: {title[:50]}... from {link}")
-
-        # Get the original count before updating
-        original_count = len(search_results.get('organic', []))
-
-        # If we have too few results after filtering, be less strict
-        if len(filtered_organic) < 2 and original_count > 0:
-            print("Too few results after filtering, being less strict...")
-            # Try again with a less strict approach - include results that mention movies and ratings
-            filtered_organic = []
-            for result in search_results['organic']:
-                link = result.get('link', '').lower()
-                title = result.get('title', '').lower()
-                snippet = result.get('snippet', '').lower()
-
-                # Check if result is from an excluded domain
-                is_excluded = any(domain in link for domain in excluded_domains)
-
-                # Check if it's related to movies and ratings
-                has_movie_keywords = ('movie' in title or 'movie' in snippet or 'rating' in title or 'rating' in snippet or 'review' in title or 'review' in snippet)
-
-                if not is_excluded and has_movie_keywords:
-                    filtered_organic.append(result)
-                    print(f"Including result with less strict filtering: {title[:50]}... from {link}")
-
-        # Update the search results with filtered organic results
-        search_results['organic'] = filtered_organic
-        print(f"Filtered results: {len(filtered_organic)} out of {original_count}")
-
-        return search_results
-
-    # Wrap the search tools to filter results
+    # The tools are async so that the tool calls of one turn run concurrently
     @tool
-    def filtered_movie_search(query: str):
+    async def filtered_movie_search(query: str):
         """Search for movie information with ratings (out of 10) from ticket booking platforms only."""
-        results = movie_serper_search(query)
+        results = await movie_serper_search(query)
         return filter_ticket_booking_results(results)
 
     @tool
-    def filtered_multi_search(query: str):
+    async def filtered_multi_search(query: str):
         """Search for movie information with ratings (out of 10) from multiple ticket booking platforms only."""
-        results = multi_search(query)
+        results = await multi_search(query)
 
         # Filter serper results if they exist
         if 'serper' in results:
@@ -220,19 +340,49 @@ def create_langgraph_agent():
 
         return results
 
-    # Create a tool node with all search tools
-    tool_node = ToolNode([filtered_movie_search, filtered_multi_search])
-    model_with_tools = model.bind_tools([filtered_movie_search, filtered_multi_search])
+    tools = [filtered_movie_search, filtered_multi_search]
+    tools_by_name = {search_tool.name: search_tool for search_tool in tools}
+    model_with_tools = model.bind_tools(tools)
+
+    async def call_tools(state: State):
+        """Run the tool calls of the last turn concurrently, at most MAX_PARALLEL_TOOL_CALLS at a time"""
+        slots = asyncio.Semaphore(config.MAX_PARALLEL_TOOL_CALLS)
+
+        async def run(call):
+            async with slots:
+                selected = tools_by_name.get(call["name"])
+                try:
+                    if selected is None:
+                        raise ValueError(f"Unknown tool: {call['name']}")
+                    return await selected.ainvoke(call)
+                except BudgetExceeded:
+                    # Ends the run rather than going back to the model
+                    raise
+                except Exception as e:
+                    # Report the failure to the model, as ToolNode does
+                    return ToolMessage(content=f"Error: {e!r}", name=call["name"], tool_call_id=call["id"], status="error")
+
+        messages = await asyncio.gather(*(run(call) for call in state["messages"][-1].tool_calls))
+        return {"messages": list(messages)}
+
+    def call_tools_sync(state: State):
+        # Sync graph runs (invoke/stream) run the same concurrent turn in a private event loop
+        return asyncio.run(call_tools(state))
 
     def call_model(state: State):
-        return {
-            "messages": [
-                model_with_tools.invoke([
-                    SystemMessage(content=MOVIE_RATING_SYSTEM_PROMPT),
-                    *state["messages"]
-                ])
-            ]
-        }
+        messages = [
+            SystemMessage(content=MOVIE_RATING_SYSTEM_PROMPT),
+            *state["messages"]
+        ]
+        # A request over its budget stops here, before the next turn
+        usage.check_budget()
+        response = groq_scheduler.call(
+            lambda: recording.model_call(messages, lambda: model_with_tools.invoke(messages)),
+            tokens=estimate_tokens(messages),
+            usage=lambda message: (message.usage_metadata or {}).get("total_tokens")
+        )
+        usage.record_model_call(response)
+        return {"messages": [response]}
 
     def should_continue(state: State):
         last = state["messages"][-1]
@@ -240,9 +390,9 @@ def create_langgraph_agent():
 
     graph = StateGraph(State)
     graph.add_node("agent", call_model)
-    graph.add_node("tools", tool_node)
+    graph.add_node("tools", RunnableLambda(call_tools_sync, afunc=call_tools))
     graph.add_edge("tools", "agent")
     graph.add_edge(START, "agent")
     graph.add_conditional_edges("agent", should_continue)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
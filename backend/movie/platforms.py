@@ -0,0 +1,118 @@
+"""
+Registry of the ticket platforms ratings are collected from.
+
+Everything the backend knows about a platform lives in its adapter: the
+domains its results come from, the words that name it in a search query, the
+query used to search it directly, how long its searches are cached, how many
+of its searches may run at once, and any extraction patterns of its own. The
+adapters in use are those of config.MOVIE_PLATFORMS, in that order; a
+platform without a registered adapter gets one derived from its name.
+
+A slow or rate-limited platform only holds its own search slots, so it cannot
+starve the others; give it a lower PLATFORM_CONCURRENCY or a longer
+PLATFORM_CACHE_TTLS entry to cut its load.
+"""
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+from urllib.parse import urlsplit
+
+import config
+
+
+@dataclass
+class PlatformAdapter:
+    """
+    What the backend knows about one ticket platform
+    """
+    name: str
+    domains: Tuple[str, ...]
+    # Lowercase words that name the platform in a query or result ("pvr")
+    keywords: Tuple[str, ...]
+    query_template: str = "{movie_name} rating reviews site:{domain}"
+    cache_ttl: Optional[int] = None  # seconds; None for PLATFORM_CACHE_TTLS or SERPER_CACHE_TTL
+    max_concurrency: Optional[int] = None  # None for PLATFORM_CONCURRENCY or PLATFORM_MAX_CONCURRENCY
+    # Tried before the generic snippet patterns (see backend/movie/snippets.py)
+    rating_patterns: Tuple[Pattern, ...] = ()
+    positive_patterns: Tuple[Pattern, ...] = ()
+    _slots: threading.BoundedSemaphore = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.cache_ttl is None:
+            self.cache_ttl = config.PLATFORM_CACHE_TTLS.get(self.name, config.SERPER_CACHE_TTL)
+        if self.max_concurrency is None:
+            self.max_concurrency = config.PLATFORM_CONCURRENCY.get(self.name, config.PLATFORM_MAX_CONCURRENCY)
+        self._slots = threading.BoundedSemaphore(max(1, self.max_concurrency))
+
+    def search_query(self, movie_name: str) -> str:
+        """Query that searches the platform's own pages for the movie."""
+        return self.query_template.format(movie_name=movie_name, domain=self.domains[0])
+
+    def site_query(self, query: str) -> str:
+        """Restrict a free-form query to the platform's main domain, unless it already names a site."""
+        return query if "site:" in query.lower() else f"{query} site:{self.domains[0]}"
+
+    def owns(self, link: str) -> bool:
+        """Check that a URL's host is one of the platform's domains or a subdomain of one."""
+        host = (urlsplit(link).hostname or "").lower()
+        return any(host == domain or host.endswith("." + domain) for domain in self.domains)
+
+    def named_in(self, text: str) -> bool:
+        text = text.lower()
+        return any(keyword in text for keyword in self.keywords)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the platform's concurrent search slots."""
+        with self._slots:
+            yield
+
+
+_ADAPTERS: Dict[str, PlatformAdapter] = {}
+_lock = threading.Lock()
+
+
+def register(adapter: PlatformAdapter) -> PlatformAdapter:
+    """Add or replace the adapter of a platform; it is used if the platform is in MOVIE_PLATFORMS."""
+    with _lock:
+        _ADAPTERS[adapter.name] = adapter
+    return adapter
+
+
+def get(name: str) -> PlatformAdapter:
+    """
+    Adapter of a platform, derived from its name if none is registered
+
+    A derived adapter takes the first word of the name as its keyword and
+    "<word>.com" as its domain ("Carnival Cinemas" -> carnival.com).
+    """
+    with _lock:
+        adapter = _ADAPTERS.get(name)
+        if adapter is None:
+            word = re.sub(r"\W", "", name.split()[0].lower())
+            adapter = _ADAPTERS[name] = PlatformAdapter(name, (f"{word}.com",), (word,))
+        return adapter
+
+
+def configured() -> List[PlatformAdapter]:
+    """Adapters of config.MOVIE_PLATFORMS, in order."""
+    return [get(name) for name in config.MOVIE_PLATFORMS]
+
+
+def for_link(link: str) -> Optional[PlatformAdapter]:
+    """Configured platform a result URL belongs to, or None."""
+    return next((adapter for adapter in configured() if adapter.owns(link)), None)
+
+
+def for_query(query: str) -> Optional[PlatformAdapter]:
+    """First configured platform named in a search query, or None."""
+    return next((adapter for adapter in configured() if adapter.named_in(query)), None)
+
+
+register(PlatformAdapter("BookMyShow", ("bookmyshow.com",), ("bookmyshow",)))
+register(PlatformAdapter("Paytm", ("paytm.com",), ("paytm",)))
+register(PlatformAdapter("PVR Cinemas", ("pvrcinemas.com",), ("pvr",)))
+register(PlatformAdapter("INOX Movies", ("inoxmovies.com", "inoxcinemas.com"), ("inox",)))
+register(PlatformAdapter("Cinepolis", ("cinepolisindia.com", "cinepolis.com"), ("cinepolis",)))
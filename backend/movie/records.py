@@ -0,0 +1,175 @@
+"""
+Compact in-memory representation of cached rating results.
+
+A result held as plain dictionaries costs a dict plus six key references per
+platform entry. Here each entry is a ``__slots__`` object and the strings that
+repeat across entries (platform names, genres, titles) are interned, so a
+process can keep far more hot results in memory.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from backend import encoding
+from backend.cache import CacheBackend
+
+
+class PlatformRecord:
+    """
+    One platform's rating of a movie (mirrors schema.MovieRatingPlatform)
+    """
+    __slots__ = (
+        "platform",
+        "movie_title",
+        "movie_rating",
+        "type_of_movie",
+        "positive_review_percentage",
+        "negative_review_percentage",
+    )
+
+    def __init__(self, platform: str, movie_title: str, movie_rating: float, type_of_movie: str,
+                 positive_review_percentage: int, negative_review_percentage: int):
+        self.platform = _intern(platform)
+        self.movie_title = _intern(movie_title)
+        self.movie_rating = movie_rating
+        self.type_of_movie = _intern(type_of_movie)
+        self.positive_review_percentage = positive_review_percentage
+        self.negative_review_percentage = negative_review_percentage
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "PlatformRecord":
+        return cls(*(item[name] for name in cls.__slots__))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RatingEntry:
+    """
+    Cached response envelope: status, optional message and platform records
+
+    Any other envelope fields (e.g. consensus) are kept as-is in ``extra``.
+    """
+    __slots__ = ("status", "message", "records", "extra", "expires_at")
+
+    def __init__(self, status: str, message: Optional[str], records: Tuple[PlatformRecord, ...],
+                 extra: Optional[Dict[str, Any]], expires_at: float):
+        self.status = _intern(status)
+        self.message = message
+        self.records = records
+        self.extra = extra
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any], expires_at: float) -> "RatingEntry":
+        extra = {key: value for key, value in response.items() if key not in ("status", "message", "data")}
+        return cls(
+            status=response.get("status"),
+            message=response.get("message"),
+            records=tuple(PlatformRecord.from_dict(item) for item in response.get("data", [])),
+            extra=extra or None,
+            expires_at=expires_at,
+        )
+
+    def to_response(self) -> Dict[str, Any]:
+        response = {"status": self.status}
+        if self.message is not None:
+            response["message"] = self.message
+        response["data"] = [record.to_dict() for record in self.records]
+        if self.extra:
+            response.update(self.extra)
+        return response
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+class CompactRatingCache(CacheBackend):
+    """
+    Bounded in-process LRU of rating responses stored as compact records
+
+    Offers the same get/set/get_json/set_json/delete lookup API as the shared
+    cache backends. The encoded bytes of the most recently served responses are
+    kept in a second, much smaller LRU so the hottest titles are answered
+    without re-encoding.
+    """
+    def __init__(self, max_entries: int, max_encoded: int = 0):
+        self.max_entries = max_entries
+        self.max_encoded = max_encoded
+        self._entries: "OrderedDict[str, RatingEntry]" = OrderedDict()
+        self._encoded: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_entry(self, key: str) -> Optional[RatingEntry]:
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            del self._entries[key]
+            self._encoded.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put_entry(self, key: str, entry: RatingEntry):
+        # Caller holds the lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._encoded.pop(key, None)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._encoded.pop(evicted, None)
+
+    def _remember_encoded(self, key: str, body: bytes):
+        # Caller holds the lock
+        if self.max_encoded <= 0:
+            return
+        self._encoded[key] = body
+        self._encoded.move_to_end(key)
+        while len(self._encoded) > self.max_encoded:
+            self._encoded.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                return None
+            body = self._encoded.get(key)
+            if body is not None:
+                self._encoded.move_to_end(key)
+                return body
+        body = encoding.dumps(entry.to_response())
+        with self._lock:
+            self._remember_encoded(key, body)
+        return body
+
+    def set(self, key: str, value: bytes, ttl: float):
+        entry = RatingEntry.from_response(encoding.loads(value), time.time() + ttl)
+        with self._lock:
+            self._put_entry(key, entry)
+            self._remember_encoded(key, value)
+
+    def get_json(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._get_entry(key)
+        return entry.to_response() if entry is not None else None
+
+    def set_json(self, key: str, value: Dict[str, Any], ttl: float):
+        entry = RatingEntry.from_response(value, time.time() + ttl)
+        with self._lock:
+            self._put_entry(key, entry)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        raise NotImplementedError("CompactRatingCache does not hold locks; use the shared tier")
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._encoded.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,12 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+import config
+
 class MovieRatingRequest(BaseModel):
     """
     Request schema for movie rating search
     """
     movie_name: str
 
+class MovieRatingBatchRequest(BaseModel):
+    """
+    Request schema for comparing several movies in one call
+    """
+    movie_names: List[str] = Field(min_length=1, max_length=config.MAX_COMPARE_MOVIES)
+
 class MovieRatingPlatform(BaseModel):
     """
     Schema for movie rating from a specific platform
@@ -18,6 +26,24 @@ class MovieRatingPlatform(BaseModel):
     positive_review_percentage: int
     negative_review_percentage: int
 
+class ConsensusStatistic(BaseModel):
+    """
+    Running statistics of one field across platforms and refreshes
+    """
+    mean: float
+    variance: float
+    weighted_mean: float
+
+class MovieConsensus(BaseModel):
+    """
+    Schema for the cross-platform consensus of a movie
+    """
+    movie: str
+    observations: int
+    refreshes: int
+    movie_rating: ConsensusStatistic
+    positive_review_percentage: ConsensusStatistic
+
 class MovieRatingResponse(BaseModel):
     """
     Response schema for movie rating search
@@ -25,3 +51,18 @@ class MovieRatingResponse(BaseModel):
     status: str
     message: Optional[str] = None
     data: List[MovieRatingPlatform]
+    consensus: Optional[MovieConsensus] = None
+
+class MovieRatingBatchItem(BaseModel):
+    """
+    One movie's result within a batch response
+    """
+    movie_name: str
+    result: MovieRatingResponse
+
+class MovieRatingBatchResponse(BaseModel):
+    """
+    Response schema for a batch of movie rating searches
+    """
+    status: str
+    results: List[MovieRatingBatchItem]
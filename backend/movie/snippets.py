@@ -0,0 +1,246 @@
+"""
+Rule-based extraction of ratings from search result snippets.
+
+Ticket platform results often state the rating outright ("8.7/10", "92%
+liked it", "12.5K votes"), or carry it as structured rich-snippet fields.
+``collect_evidence`` reads those with compiled patterns (a platform's adapter
+may add its own, see backend/movie/platforms.py), and ``ratings_from_evidence``
+turns the evidence into ratings so that a lookup can skip the model entirely
+when every platform is covered with enough confidence.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Sequence
+
+import config
+from backend.cache import canonical_title
+from backend.movie import platforms
+
+# Weights of the evidence found for a platform; they sum to 1.0
+RATING_WEIGHT = 0.6
+POSITIVE_WEIGHT = 0.3
+VOTES_WEIGHT = 0.1
+
+_RATING_PATTERNS = (
+    # "8.7/10", "4.5 / 5"
+    re.compile(r"(?<![\d.])(\d{1,2}(?:\.\d{1,2})?)\s?/\s?(10|5)(?![\d.])"),
+    # "Rating: 8.7", "rated 8.7"
+    re.compile(r"\brat(?:ing|ed)\s?:?\s?(\d{1,2}(?:\.\d{1,2})?)(?![\d.%/])", re.IGNORECASE),
+)
+_POSITIVE_PATTERNS = (
+    # "92% liked it", "92 % positive", "92% recommend"
+    re.compile(r"(?<![\d.])(\d{1,3})\s?%\s?(?:of\s)?(?:users?\s|people\s|audiences?\s)?"
+               r"(?:liked|like|loved|positive|recommend|interested|found)", re.IGNORECASE),
+    # "liked by 92%"
+    re.compile(r"\b(?:liked|loved|recommended) by (\d{1,3})\s?%", re.IGNORECASE),
+)
+_VOTES_PATTERN = re.compile(
+    # "12.5K votes", "1,024 ratings"
+    r"(?<![\d.])(\d{1,3}(?:[.,]\d{1,3})?)\s?([km])?\+?\s(?:votes|ratings|reviews)\b", re.IGNORECASE
+)
+_GENRES = (
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary", "Drama",
+    "Family", "Fantasy", "Historical", "Horror", "Musical", "Mystery", "Romance", "Sci-Fi",
+    "Sports", "Thriller", "War",
+)
+_GENRE_PATTERN = re.compile(r"\b(" + "|".join(re.escape(genre) for genre in _GENRES) + r")\b", re.IGNORECASE)
+_GENRE_NAMES = {genre.lower(): genre for genre in _GENRES}
+
+
+@dataclass
+class SnippetEvidence:
+    """
+    Rating evidence found for one platform
+    """
+    platform: str
+    movie_rating: Optional[float] = None
+    positive_review_percentage: Optional[int] = None
+    votes: Optional[int] = None
+    genres: tuple = ()
+
+    @property
+    def confidence(self) -> float:
+        return round(
+            (RATING_WEIGHT if self.movie_rating is not None else 0.0)
+            + (POSITIVE_WEIGHT if self.positive_review_percentage is not None else 0.0)
+            + (VOTES_WEIGHT if self.votes is not None else 0.0),
+            6
+        )
+
+    def merge(self, other: "SnippetEvidence"):
+        # Keep the first value found for each field; results arrive best first
+        if self.movie_rating is None:
+            self.movie_rating = other.movie_rating
+        if self.positive_review_percentage is None:
+            self.positive_review_percentage = other.positive_review_percentage
+        if self.votes is None:
+            self.votes = other.votes
+        if not self.genres:
+            self.genres = other.genres
+
+
+def platform_of(link: str) -> Optional[str]:
+    """
+    Identify the ticket platform a result link belongs to
+
+    Args:
+        link: Result URL
+
+    Returns:
+        Platform name from config.MOVIE_PLATFORMS, or None
+    """
+    adapter = platforms.for_link(link)
+    return adapter.name if adapter is not None else None
+
+
+def _parse_rating(text: str, extra: Sequence[Pattern] = ()) -> Optional[float]:
+    for pattern in (*extra, *_RATING_PATTERNS):
+        match = pattern.search(text)
+        if match:
+            value = float(match.group(1))
+            if match.lastindex == 2 and match.group(2) == "5":
+                value *= 2
+            if 0 < value <= 10:
+                return value
+    return None
+
+
+def _parse_positive(text: str, extra: Sequence[Pattern] = ()) -> Optional[int]:
+    for pattern in (*extra, *_POSITIVE_PATTERNS):
+        match = pattern.search(text)
+        if match:
+            value = int(match.group(1))
+            if 0 <= value <= 100:
+                return value
+    return None
+
+
+def _parse_votes(text: str) -> Optional[int]:
+    match = _VOTES_PATTERN.search(text)
+    if not match:
+        return None
+    number, suffix = match.group(1).replace(",", ""), (match.group(2) or "").lower()
+    try:
+        value = float(number)
+    except ValueError:
+        return None
+    return int(value * {"k": 1_000, "m": 1_000_000}.get(suffix, 1))
+
+
+def read_result(platform: str, result: Dict[str, Any]) -> SnippetEvidence:
+    """
+    Extract rating evidence from one organic search result
+
+    Structured rich-snippet fields (rating, ratingMax, ratingCount) take
+    precedence over the free text of the title and snippet, which is read
+    with the platform's own patterns before the generic ones.
+
+    Args:
+        platform: Platform the result belongs to
+        result: Serper organic result
+
+    Returns:
+        Evidence found (fields are None when absent)
+    """
+    text = f"{result.get('title', '')} {result.get('snippet', '')}"
+    adapter = platforms.get(platform)
+    evidence = SnippetEvidence(platform)
+
+    if isinstance(result.get("rating"), (int, float)):
+        scale = result.get("ratingMax") or (5 if result["rating"] <= 5 else 10)
+        if scale:
+            evidence.movie_rating = float(result["rating"]) * 10 / float(scale)
+    if isinstance(result.get("ratingCount"), int):
+        evidence.votes = result["ratingCount"]
+
+    if evidence.movie_rating is None:
+        evidence.movie_rating = _parse_rating(text, adapter.rating_patterns)
+    evidence.positive_review_percentage = _parse_positive(text, adapter.positive_patterns)
+    if evidence.votes is None:
+        evidence.votes = _parse_votes(text)
+    evidence.genres = tuple(dict.fromkeys(_GENRE_NAMES[genre.lower()] for genre in _GENRE_PATTERN.findall(text)))
+    return evidence
+
+
+def mentions_movie(movie_name: str, text: str) -> bool:
+    """Check that every word of the movie's canonical title appears in text."""
+    words = set(canonical_title(text).split())
+    return all(word in words for word in canonical_title(movie_name).split())
+
+
+def _mentions_movie(movie_name: str, result: Dict[str, Any]) -> bool:
+    return mentions_movie(movie_name, f"{result.get('title', '')} {result.get('snippet', '')} {result.get('link', '')}")
+
+
+def collect_evidence(
+    movie_name: str,
+    organic_results: Iterable[Dict[str, Any]],
+    evidence: Optional[Dict[str, SnippetEvidence]] = None,
+) -> Dict[str, SnippetEvidence]:
+    """
+    Gather rating evidence per platform from search results
+
+    Args:
+        movie_name: Movie name as requested
+        organic_results: Filtered organic results (see filter_ticket_booking_results)
+        evidence: Evidence found elsewhere (e.g. platform pages), completed in place
+
+    Returns:
+        Evidence per platform name
+    """
+    evidence = {} if evidence is None else evidence
+    for result in organic_results:
+        platform = platform_of(result.get("link", ""))
+        if platform is None or not _mentions_movie(movie_name, result):
+            continue
+        found = read_result(platform, result)
+        if platform in evidence:
+            evidence[platform].merge(found)
+        else:
+            evidence[platform] = found
+    return evidence
+
+
+def ratings_from_evidence(
+    movie_name: str,
+    evidence: Dict[str, SnippetEvidence],
+    min_confidence: float = config.FAST_PATH_MIN_CONFIDENCE,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Turn evidence into platform ratings if every platform is covered confidently
+
+    Args:
+        movie_name: Movie name as requested
+        evidence: Evidence per platform name
+        min_confidence: Minimum evidence confidence required for every platform
+
+    Returns:
+        Unvalidated platform rating dictionaries for every platform in
+        config.MOVIE_PLATFORMS, or None if any platform is missing or uncertain
+    """
+    if any(
+        platform not in evidence
+        or evidence[platform].movie_rating is None
+        or evidence[platform].confidence < min_confidence
+        for platform in config.MOVIE_PLATFORMS
+    ):
+        return None
+
+    # Platforms rarely list genres in snippets; share what any of them mentions
+    genres = next((item.genres for item in evidence.values() if item.genres), ())
+    ratings = []
+    for platform in config.MOVIE_PLATFORMS:
+        item = evidence[platform]
+        positive = item.positive_review_percentage
+        if positive is None:
+            # Only reachable with a lowered min_confidence: estimate from the rating
+            positive = int(round(item.movie_rating * 10))
+        ratings.append({
+            "platform": platform,
+            "movie_title": movie_name,
+            "movie_rating": item.movie_rating,
+            "type_of_movie": ", ".join(item.genres or genres) or "Unknown",
+            "positive_review_percentage": positive,
+            "negative_review_percentage": 100 - positive,
+        })
+    return ratings
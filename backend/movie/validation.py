@@ -0,0 +1,264 @@
+"""
+Validation of platform rating records.
+
+``validate_platform_data`` cleans the handful of records returned for one
+request; ``validate_platform_frame`` applies the same rules to whole columns
+for bulk jobs such as re-validating stored rows.
+"""
+from typing import Any, Callable, Dict, List
+
+# Columns of a validated platform rating record
+PLATFORM_COLUMNS = [
+    "platform",
+    "movie_title",
+    "movie_rating",
+    "type_of_movie",
+    "positive_review_percentage",
+    "negative_review_percentage",
+]
+
+def validate_platform_data(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validate and clean up platform data to ensure it matches the expected schema
+
+    Args:
+        data: List of platform data dictionaries
+
+    Returns:
+        Validated and cleaned up platform data
+    """
+    validated_data = []
+
+    for item in data:
+        # Ensure all required fields are present
+        platform = item.get("platform", "Unknown Platform")
+        movie_title = item.get("movie_title", "Unknown Movie")
+
+        # Ensure movie_rating is a float between 1 and 10
+        try:
+            movie_rating = float(item.get("movie_rating", 8.0))
+            movie_rating = max(1.0, min(10.0, movie_rating))  # Clamp between 1 and 10
+        except (ValueError, TypeError):
+            movie_rating = 8.0  # Default if invalid
+
+        # Ensure type_of_movie is a string
+        type_of_movie = str(item.get("type_of_movie", "Drama, Action"))
+
+        # Ensure percentages are integers between 0 and 100
+        try:
+            positive_percentage = int(item.get("positive_review_percentage", 80))
+            positive_percentage = max(0, min(100, positive_percentage))  # Clamp between 0 and 100
+        except (ValueError, TypeError):
+            positive_percentage = 80  # Default if invalid
+
+        try:
+            negative_percentage = int(item.get("negative_review_percentage", 20))
+            negative_percentage = max(0, min(100, negative_percentage))  # Clamp between 0 and 100
+        except (ValueError, TypeError):
+            negative_percentage = 20  # Default if invalid
+
+        # Ensure percentages sum to 100
+        if positive_percentage + negative_percentage != 100:
+            # Adjust negative percentage to make sum 100
+            negative_percentage = 100 - positive_percentage
+
+        # Create validated item
+        validated_item = {
+            "platform": platform,
+            "movie_title": movie_title,
+            "movie_rating": round(movie_rating, 1),  # Round to 1 decimal place
+            "type_of_movie": type_of_movie,
+            "positive_review_percentage": positive_percentage,
+            "negative_review_percentage": negative_percentage
+        }
+
+        validated_data.append(validated_item)
+
+    return validated_data
+
+def _rating_or_default(value: Any) -> float:
+    """Scalar rule for movie_rating, identical to validate_platform_data."""
+    try:
+        movie_rating = float(value)
+        return max(1.0, min(10.0, movie_rating))
+    except (ValueError, TypeError):
+        return 8.0
+
+def _percentage_or_default(default: int) -> Callable[[Any], int]:
+    """Scalar rule for a review percentage, identical to validate_platform_data."""
+    def convert(value: Any) -> int:
+        try:
+            percentage = int(value)
+            return max(0, min(100, percentage))
+        except (ValueError, TypeError):
+            return default
+    return convert
+
+def _is_missing(value: Any) -> bool:
+    """A None/NaN cell stands for a key that was missing from the record."""
+    import pandas as pd
+
+    return pd.api.types.is_scalar(value) and pd.isna(value)
+
+def _map_unique(column, func: Callable[[Any], Any], default: Any):
+    """
+    Apply a scalar function once per distinct value of a non-numeric column
+
+    Stored rows repeat the same strings over and over, so converting the distinct
+    values and broadcasting them back is far cheaper than converting every cell.
+    Missing cells become ``default`` without going through ``func``.
+
+    Returns:
+        numpy object array aligned with the column
+    """
+    import numpy as np
+    import pandas as pd
+
+    def convert(value):
+        return default if _is_missing(value) else func(value)
+
+    try:
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    except TypeError:
+        # Unhashable cells (lists, dicts); fall back to converting every cell
+        return np.array([convert(value) for value in column], dtype=object)
+
+    if column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) not in ("string", "empty"):
+        # factorize takes True, 1 and 1.0 for one value, but str() and the
+        # per-record function tell them apart: distinct values are (type, value)
+        values = column.to_numpy()
+        kinds, _ = pd.factorize(np.frompyfunc(type, 1, 1)(values))
+        codes, _ = pd.factorize(codes.astype(np.int64) * (int(kinds.max()) + 1) + kinds)
+        # Codes number values in order of appearance; keep the first cell of each
+        first = np.empty(codes.max() + 1, dtype=np.int64)
+        first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+        uniques = values[first]
+
+    converted = np.empty(len(uniques), dtype=object)
+    converted[:] = [convert(value) for value in uniques]
+    return converted.take(codes)
+
+def _round_like_python(values):
+    """
+    Round to one decimal place with the same results as the builtin round()
+
+    np.round scales by ten first, which can land on the other side of a tie;
+    values close to a tie are recomputed with round() itself.
+    """
+    import numpy as np
+
+    rounded = np.round(values, 1)
+    scaled = values * 10.0
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(float(value), 1) for value in values[near_tie]]
+    return rounded
+
+def _rating_column(frame):
+    """Vectorized movie_rating rule."""
+    import numpy as np
+    import pandas as pd
+
+    if "movie_rating" not in frame:
+        return np.full(len(frame), 8.0)
+
+    column = frame["movie_rating"]
+
+    if pd.api.types.is_numeric_dtype(column.dtype):
+        values = column.to_numpy(dtype=float, na_value=np.nan)
+        missing = np.isnan(values)
+        values = np.clip(values, 1.0, 10.0)
+        values[missing] = 8.0
+    else:
+        values = _map_unique(column, _rating_or_default, 8.0).astype(float)
+
+    return _round_like_python(values)
+
+def _percentage_column(frame, name: str, default: int):
+    """Vectorized review percentage rule."""
+    import numpy as np
+    import pandas as pd
+
+    if name not in frame:
+        return np.full(len(frame), default, dtype=np.int64)
+
+    column = frame[name]
+
+    if not pd.api.types.is_numeric_dtype(column.dtype):
+        return _map_unique(column, _percentage_or_default(default), default).astype(np.int64)
+
+    values = column.to_numpy(dtype=float, na_value=np.nan)
+    missing = np.isnan(values)
+    if np.isinf(values).any():
+        # int() of an infinite float raises; keep the per-row behaviour
+        raise OverflowError("cannot convert float infinity to integer")
+
+    # int() truncates toward zero; clamping to integer bounds commutes with it
+    values = np.clip(np.trunc(np.where(missing, default, values)), 0, 100)
+    return values.astype(np.int64)
+
+def _text_column(frame, name: str, default: str, convert: Callable[[Any], Any] = None):
+    """Vectorized rule for a text field: fill missing values, optionally convert the rest."""
+    import numpy as np
+
+    if name not in frame:
+        return np.full(len(frame), default, dtype=object)
+
+    return _map_unique(frame[name], convert or (lambda value: value), default)
+
+def platform_frame(records: List[Dict[str, Any]]):
+    """
+    Build the DataFrame validate_platform_frame expects from platform records
+
+    The default constructor turns the ints of a column that also holds None
+    into floats, and str() of those differs from the per-record function, so
+    the text columns keep their cells as given (object dtype). The numeric
+    columns are converted as usual; their rules treat 1, 1.0 and True alike.
+
+    Args:
+        records: Platform data dictionaries; a missing key becomes a missing cell
+
+    Returns:
+        pandas DataFrame with one row per record
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(records, dtype=object)
+    for name in ("movie_rating", "positive_review_percentage", "negative_review_percentage"):
+        if name in frame:
+            frame[name] = frame[name].infer_objects()
+    return frame
+
+def validate_platform_frame(frame):
+    """
+    Validate and clean up platform data column by column
+
+    Applies exactly the rules of validate_platform_data to a whole DataFrame at
+    once. A missing cell (None/NaN) is treated like a missing key in the
+    per-record function. Build the frame with platform_frame so text columns
+    holding numbers keep their types.
+
+    Args:
+        frame: pandas DataFrame with one platform record per row
+
+    Returns:
+        New DataFrame with the validated columns in PLATFORM_COLUMNS order
+    """
+    import pandas as pd
+
+    positive = _percentage_column(frame, "positive_review_percentage", 80)
+    negative = _percentage_column(frame, "negative_review_percentage", 20)
+
+    # Ensure percentages sum to 100 by adjusting the negative percentage
+    negative = negative.copy()
+    mismatch = positive + negative != 100
+    negative[mismatch] = 100 - positive[mismatch]
+
+    return pd.DataFrame({
+        "platform": _text_column(frame, "platform", "Unknown Platform"),
+        "movie_title": _text_column(frame, "movie_title", "Unknown Movie"),
+        "movie_rating": _rating_column(frame),
+        "type_of_movie": _text_column(frame, "type_of_movie", "Drama, Action", convert=str),
+        "positive_review_percentage": positive,
+        "negative_review_percentage": negative,
+    }, index=frame.index)
@@ -0,0 +1,275 @@
+"""
+On-demand profiling of single rating requests.
+
+A request to POST /movie-ratings carrying the admin token in X-Profile-Token
+(config.PROFILE_TOKEN; empty disables the feature) runs under a sampling
+profiler and tracemalloc. The sampler is a thread reading the stacks of every
+other thread (sys._current_frames) each PROFILE_INTERVAL seconds, so the
+agent's worker threads are covered as well as the event loop; threads idling in
+a pool or in the event loop's select are left out. Samples are rooted at the
+thread name. Other requests the worker serves meanwhile are sampled too, so
+profile on a quiet worker for a clean picture.
+
+Each profile writes three files to PROFILE_DIR:
+
+- ``<name>.svg``: flame graph (open in a browser; hover for sample counts)
+- ``<name>.folded``: the same stacks in the collapsed format of flamegraph.pl
+  and speedscope
+- ``<name>.alloc.txt``: peak traced memory and the source lines that allocated
+  the most during the request
+
+Nothing is started unless a request asks for it, and only one profile runs per
+process at a time (tracemalloc is process-wide).
+"""
+import hmac
+import html
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEIGHT = 16
+GRAPH_WIDTH = 1200
+MAX_DEPTH = 256
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Innermost frames of a thread with nothing to do
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+# Loops that wait for work: executor and log-queue threads
+_IDLE_LOOPS = frozenset(("_worker", "dequeue"))
+_active = threading.Lock()
+
+
+def requested(token: Optional[str]) -> bool:
+    """Check whether a request asks to be profiled (an X-Profile-Token matching PROFILE_TOKEN)."""
+    if not token or not config.PROFILE_TOKEN:
+        return False
+    if hmac.compare_digest(token.encode(), config.PROFILE_TOKEN.encode()):
+        return True
+    logger.warning("Ignoring X-Profile-Token that does not match PROFILE_TOKEN")
+    return False
+
+
+def _describe(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_ROOT + os.sep):
+        filename = os.path.relpath(filename, _ROOT)
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    # A pool or log-queue thread waiting for work, or the event loop waiting for I/O
+    if frame.f_code.co_filename.endswith("selectors.py"):
+        return True
+    while frame is not None and frame.f_code.co_filename.endswith(_IDLE_FILES):
+        frame = frame.f_back
+    if frame is None:
+        return False
+    return frame.f_code.co_name in _IDLE_LOOPS or (
+        frame.f_code.co_name == "run" and "anyio" in frame.f_code.co_filename
+    )
+
+
+class StackSampler:
+    """
+    Samples the stacks of every thread but its own at a fixed interval
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if _is_idle(frame):
+                    self.idle += 1
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_describe(frame))
+                    frame = frame.f_back
+                # Pool threads ("race_3") are merged into one root per pool
+                stack.append(re.sub(r"[_-]\d+$", "", names.get(ident, str(ident))))
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+
+def _color(name: str) -> str:
+    # Warm palette, stable per function
+    hashed = zlib.crc32(name.encode())
+    return f"rgb({205 + hashed % 50},{(hashed >> 8) % 180},{(hashed >> 16) % 55})"
+
+
+def render_flamegraph(stacks: Counter, title: str) -> str:
+    """
+    Render folded stacks as a self-contained SVG flame graph
+
+    Args:
+        stacks: Sample count per ";"-joined stack, outermost frame first
+        title: Heading of the graph
+
+    Returns:
+        SVG document
+    """
+    # Merge the stacks into a tree of (children, samples) nodes
+    root: Dict = {}
+    total = 0
+    for stack, count in stacks.items():
+        total += count
+        node = root
+        for name in stack.split(";"):
+            entry = node.setdefault(name, [{}, 0])
+            entry[1] += count
+            node = entry[0]
+
+    rects: List[Tuple[int, float, float, str, int]] = []
+
+    def place(node: Dict, depth: int, x: float):
+        for name, (children, count) in sorted(node.items()):
+            width = GRAPH_WIDTH * count / max(1, total)
+            rects.append((depth, x, width, name, count))
+            place(children, depth + 1, x)
+            x += width
+
+    place(root, 0, 0.0)
+    depth = 1 + max((rect[0] for rect in rects), default=0)
+    height = (depth + 2) * FRAME_HEIGHT
+    lines = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{GRAPH_WIDTH}" height="{height}" '
+        f'font-family="Verdana, sans-serif" font-size="11">',
+        f'<text x="{GRAPH_WIDTH / 2}" y="{FRAME_HEIGHT - 3}" text-anchor="middle" font-size="13">'
+        f'{html.escape(title)} ({total} samples)</text>',
+    ]
+    for level, x, width, name, count in rects:
+        if width < 0.1:
+            continue
+        y = height - (level + 1) * FRAME_HEIGHT
+        label = html.escape(name)
+        lines.append(
+            f'<g><title>{label}: {count} samples ({100 * count / max(1, total):.1f}%)</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{width:.2f}" height="{FRAME_HEIGHT - 1}" fill="{_color(name)}"/>'
+        )
+        # About 7 pixels per character; frames too narrow for a label keep only the tooltip
+        chars = int((width - 6) // 7)
+        if chars >= 3:
+            text = name if len(name) <= chars else name[:chars - 2] + ".."
+            lines.append(f'<text x="{x + 3:.2f}" y="{y + FRAME_HEIGHT - 4}">{html.escape(text)}</text>')
+        lines.append("</g>")
+    lines.append("</svg>")
+    return "\n".join(lines)
+
+
+class Profile:
+    """
+    Sampling profile and allocation summary of one request
+    """
+    def __init__(self, label: str, directory: str = config.PROFILE_DIR, interval: float = config.PROFILE_INTERVAL):
+        self.label = label
+        self.directory = directory
+        self.sampler = StackSampler(interval)
+        self._baseline = None
+        self._started_tracemalloc = False
+        self._started = 0.0
+
+    def start(self) -> bool:
+        """
+        Start profiling, unless another profile is running in this process
+
+        Returns:
+            True if profiling started; stop() must then be called
+        """
+        if not _active.acquire(blocking=False):
+            return False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+        self._started = time.perf_counter()
+        self.sampler.start()
+        return True
+
+    def stop(self) -> Dict[str, str]:
+        """
+        Stop profiling and write the flame graph and allocation summary
+
+        Returns:
+            Absolute path of each artifact ("flamegraph", "folded", "allocations")
+        """
+        try:
+            stacks = self.sampler.stop()
+            elapsed = time.perf_counter() - self._started
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            _active.release()
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        slug = re.sub(r"[^a-z0-9]+", "-", self.label.lower()).strip("-")[:60] or "request"
+        base = os.path.abspath(os.path.join(self.directory, f"{stamp}-{slug}-{os.getpid()}"))
+        artifacts = {
+            "flamegraph": base + ".svg",
+            "folded": base + ".folded",
+            "allocations": base + ".alloc.txt",
+        }
+
+        title = f"{self.label}: {elapsed:.3f}s"
+        with open(artifacts["flamegraph"], "w", encoding="utf-8") as handle:
+            handle.write(render_flamegraph(stacks, title))
+        with open(artifacts["folded"], "w", encoding="utf-8") as handle:
+            handle.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+        ignored = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, __file__),
+        )
+        changes = snapshot.filter_traces(ignored).compare_to(self._baseline.filter_traces(ignored), "lineno")
+        allocated = sum(stat.size_diff for stat in changes if stat.size_diff > 0)
+        with open(artifacts["allocations"], "w", encoding="utf-8") as handle:
+            handle.write(f"{title}\n")
+            handle.write(f"Samples: {self.sampler.samples} ({self.sampler.idle} idle skipped), "
+                         f"every {self.sampler.interval * 1000:g} ms\n")
+            handle.write(f"Peak traced memory: {peak / 1024:.1f} KiB (now {current / 1024:.1f} KiB)\n")
+            handle.write(f"Allocated and still held at the end: {allocated / 1024:.1f} KiB\n\n")
+            handle.write(f"Top {config.PROFILE_TOP_ALLOCATIONS} source lines by growth:\n")
+            for stat in changes[:config.PROFILE_TOP_ALLOCATIONS]:
+                handle.write(f"{stat}\n")
+
+        logger.info("Wrote request profile", extra={"movie": self.label, "elapsed": round(elapsed, 3), **artifacts})
+        return artifacts
@@ -0,0 +1,365 @@
+"""
+Capture and replay of upstream traffic.
+
+With ``CAPTURE_DIR`` set, each agent lookup (a share ``CAPTURE_SAMPLE_RATE``
+of them) is written to a cassette: the movie name, every Serper request and
+response, every model call's input and output, the platform page lookups
+(learned URLs and what was read from each page), and the wall and CPU time of
+each stage. Cassettes are gzipped JSON, and consecutive model inputs store
+only the messages added since the previous call.
+
+``replay.py`` re-runs cassettes against the current code with a ``Player``
+standing in for Groq, Serper and the platform pages, at the original or an
+accelerated pace.
+"""
+import contextvars
+import gzip
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+import config
+from backend import encoding
+from backend.logging_config import request_id_var
+from backend.scheduler import RateLimited
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_SUFFIX = ".json.gz"
+
+
+class Cassette:
+    """
+    Upstream calls and stage timings of one lookup
+    """
+    def __init__(self, movie_name: str, request_id: str = "-", recorded_at: Optional[float] = None):
+        self.movie_name = movie_name
+        self.request_id = request_id
+        self.recorded_at = recorded_at if recorded_at is not None else time.time()
+        self.interactions: List[Dict[str, Any]] = []
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._started = time.perf_counter()
+        self._last_input: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_search(self, request: Dict[str, Any], response: Any = None, error: Optional[BaseException] = None,
+                   elapsed: float = 0.0, cached: bool = False):
+        interaction = {"kind": "serper", "request": request, "elapsed": round(elapsed, 6)}
+        if cached:
+            interaction["cached"] = True
+        self._add(interaction, response, error)
+
+    def add_page(self, request: Dict[str, Any], response: Any = None, error: Optional[BaseException] = None,
+                 elapsed: float = 0.0):
+        self._add({"kind": "page", "request": request, "elapsed": round(elapsed, 6)}, response, error)
+
+    def add_model_call(self, messages: List[BaseMessage], response: Optional[BaseMessage] = None,
+                       error: Optional[BaseException] = None, elapsed: float = 0.0):
+        inputs = messages_to_dict(messages)
+        with self._lock:
+            # Successive calls of a conversation share a prefix; store only what was added
+            prefix = 0
+            for previous, current in zip(self._last_input, inputs):
+                if previous != current:
+                    break
+                prefix += 1
+            self._last_input = inputs
+        interaction = {
+            "kind": "groq",
+            "key": model_call_key(messages),
+            "prefix": prefix,
+            "messages": inputs[prefix:],
+            "elapsed": round(elapsed, 6),
+        }
+        self._add(interaction, messages_to_dict([response])[0] if response is not None else None, error)
+
+    def _add(self, interaction: Dict[str, Any], response: Any, error: Optional[BaseException]):
+        if error is not None:
+            interaction["error"] = str(error)
+            if isinstance(error, RateLimited):
+                interaction["retry_after"] = error.retry_after
+        else:
+            interaction["response"] = response
+        with self._lock:
+            interaction["at"] = round(time.perf_counter() - self._started - interaction["elapsed"], 6)
+            self.interactions.append(interaction)
+
+    def add_stage(self, name: str, seconds: float, cpu_seconds: float):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "cpu_seconds": 0.0, "count": 0})
+            stage["seconds"] += seconds
+            stage["cpu_seconds"] += cpu_seconds
+            stage["count"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "movie_name": self.movie_name,
+                "request_id": self.request_id,
+                "recorded_at": self.recorded_at,
+                "interactions": list(self.interactions),
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Cassette":
+        cassette = cls(data["movie_name"], data.get("request_id", "-"), data.get("recorded_at"))
+        cassette.interactions = data.get("interactions", [])
+        cassette.stages = data.get("stages", {})
+        return cassette
+
+    def save(self, directory: str) -> str:
+        """Write the cassette to a new file in directory and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(self.recorded_at))
+        path = os.path.join(directory, f"{stamp}-{self.request_id}{CASSETTE_SUFFIX}")
+        with gzip.open(path, "wb", compresslevel=6) as handle:
+            handle.write(encoding.dumps(self.to_dict()))
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with gzip.open(path, "rb") as handle:
+            return cls.from_dict(encoding.loads(handle.read()))
+
+
+def model_call_key(messages: List[BaseMessage]) -> str:
+    """
+    Identify a model call by the content of its input
+
+    Message IDs and metadata are left out, so the same conversation matches
+    across runs.
+    """
+    parts = [
+        [message.type, message.content, [[call["name"], call["args"]] for call in getattr(message, "tool_calls", None) or []]]
+        for message in messages
+    ]
+    return hashlib.sha1(encoding.dumps(parts)).hexdigest()
+
+
+class Player:
+    """
+    Answers upstream calls from a recorded cassette
+
+    Calls are matched by request (Serper query, model input, page), falling back to
+    the next unused call of the same kind when the current code asks for
+    something the recording does not have. Each answer is delayed by its
+    recorded duration divided by ``speed`` (0 answers immediately).
+    """
+    def __init__(self, cassette: Cassette, speed: float = 1.0):
+        self.speed = speed
+        self._unused: Dict[str, List[Dict[str, Any]]] = {"serper": [], "groq": []}
+        for interaction in cassette.interactions:
+            self._unused.setdefault(interaction["kind"], []).append(interaction)
+        self.unmatched = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+
+    def _take(self, kind: str, matches: Callable[[Dict[str, Any]], bool]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            unused = self._unused.get(kind, [])
+            for index, interaction in enumerate(unused):
+                if matches(interaction):
+                    return unused.pop(index)
+            if unused:
+                self.unmatched += 1
+                return unused.pop(0)
+            self.missing += 1
+            return None
+
+    def _answer(self, interaction: Optional[Dict[str, Any]], kind: str) -> Any:
+        if interaction is None:
+            raise ConnectionError(f"No recorded {kind} call left to replay")
+        if self.speed > 0:
+            time.sleep(interaction["elapsed"] / self.speed)
+        if "error" in interaction:
+            if "retry_after" in interaction:
+                raise RateLimited(interaction["retry_after"])
+            raise ConnectionError(interaction["error"])
+        return interaction["response"]
+
+    def search(self, request: Dict[str, Any]) -> Any:
+        return self._answer(self._take("serper", lambda item: item["request"] == request), "serper")
+
+    def page(self, request: Dict[str, Any]) -> Any:
+        return self._answer(self._take("page", lambda item: item["request"] == request), "page")
+
+    def model_call(self, messages: List[BaseMessage]) -> BaseMessage:
+        key = model_call_key(messages)
+        response = self._answer(self._take("groq", lambda item: item["key"] == key), "groq")
+        return messages_from_dict([response])[0]
+
+    @property
+    def unused(self) -> int:
+        with self._lock:
+            return sum(len(items) for items in self._unused.values())
+
+
+class Session:
+    """
+    Lookup being captured, or replayed when it has a player
+    """
+    def __init__(self, cassette: Cassette, player: Optional[Player] = None):
+        self.cassette = cassette
+        self.player = player
+
+
+# Current session; copied into the lookup's worker threads with the rest of the context
+session_var: contextvars.ContextVar[Optional[Session]] = contextvars.ContextVar("recording_session", default=None)
+
+
+@contextmanager
+def capture(movie_name: str) -> Iterator[Optional[Session]]:
+    """
+    Record the lookup run in the block to a cassette in CAPTURE_DIR
+
+    Does nothing if capture is off, the lookup is not sampled, or a session
+    (e.g. a replay) is already active.
+    """
+    if not config.CAPTURE_DIR or session_var.get() is not None or random.random() >= config.CAPTURE_SAMPLE_RATE:
+        yield None
+        return
+
+    session = Session(Cassette(movie_name, request_id_var.get()))
+    token = session_var.set(session)
+    try:
+        with stage("total"):
+            yield session
+    finally:
+        session_var.reset(token)
+        try:
+            path = session.cassette.save(config.CAPTURE_DIR)
+            logger.debug("Saved cassette", extra={"path": path})
+        except OSError as e:
+            logger.warning("Could not save cassette: %s", e)
+
+
+@contextmanager
+def replay(player: Player, cassette: Cassette) -> Iterator[Session]:
+    """
+    Answer upstream calls in the block from player, measuring into cassette
+    """
+    session = Session(cassette, player)
+    token = session_var.set(session)
+    try:
+        with stage("total"):
+            yield session
+    finally:
+        session_var.reset(token)
+
+
+def replaying() -> bool:
+    session = session_var.get()
+    return session is not None and session.player is not None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a stage of the lookup (wall clock and this thread's CPU) if a session is active
+    """
+    session = session_var.get()
+    if session is None:
+        yield
+        return
+    started, cpu_started = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        session.cassette.add_stage(name, time.perf_counter() - started, time.thread_time() - cpu_started)
+
+
+def search(request: Dict[str, Any], post: Callable[[], Any]) -> Any:
+    """
+    Make a Serper call through the active session
+
+    Args:
+        request: Search request body (query and number of results)
+        post: Function making the call and returning the parsed response
+
+    Returns:
+        The parsed response, recorded or replayed
+    """
+    session = session_var.get()
+    if session is None:
+        return post()
+    if session.player is not None:
+        return session.player.search(request)
+
+    started = time.perf_counter()
+    try:
+        response = post()
+    except Exception as e:
+        session.cassette.add_search(request, error=e, elapsed=time.perf_counter() - started)
+        raise
+    session.cassette.add_search(request, response, elapsed=time.perf_counter() - started)
+    return response
+
+
+def record_cached_search(request: Dict[str, Any], response: Any):
+    """Record a search answered from the cache, so a replay without the cache can answer it."""
+    session = session_var.get()
+    if session is not None and session.player is None:
+        session.cassette.add_search(request, response, cached=True)
+
+
+def page(request: Dict[str, Any], fetch: Callable[[], Any]) -> Any:
+    """
+    Make a platform page lookup through the active session
+
+    Args:
+        request: What is looked up ({"title": ...} for the learned URLs of a
+            movie, {"url": ...} for a page)
+        fetch: Function making the lookup and returning a JSON-compatible result
+
+    Returns:
+        The result, recorded or replayed
+    """
+    session = session_var.get()
+    if session is None:
+        return fetch()
+    if session.player is not None:
+        return session.player.page(request)
+
+    started = time.perf_counter()
+    try:
+        response = fetch()
+    except Exception as e:
+        session.cassette.add_page(request, error=e, elapsed=time.perf_counter() - started)
+        raise
+    session.cassette.add_page(request, response, elapsed=time.perf_counter() - started)
+    return response
+
+
+def model_call(messages: List[BaseMessage], invoke: Callable[[], BaseMessage]) -> BaseMessage:
+    """
+    Make a model call through the active session
+
+    Args:
+        messages: Input messages
+        invoke: Function making the call
+
+    Returns:
+        The model's response message, recorded or replayed
+    """
+    session = session_var.get()
+    if session is None:
+        return invoke()
+    if session.player is not None:
+        return session.player.model_call(messages)
+
+    started = time.perf_counter()
+    try:
+        response = invoke()
+    except Exception as e:
+        session.cassette.add_model_call(messages, error=e, elapsed=time.perf_counter() - started)
+        raise
+    session.cassette.add_model_call(messages, response, elapsed=time.perf_counter() - started)
+    return response
@@ -0,0 +1,264 @@
+"""
+Outbound call scheduling for Groq and Serper.
+
+Every model call and every search goes through the scheduler of its provider,
+which
+
+- paces requests (and, for Groq, tokens) with token buckets sized to the
+  provider's per-minute quotas, split between the backend's worker processes;
+- adapts how many calls may be in flight at once (AIMD): the limit grows by
+  about one per round of successful calls, and is halved on a 429 or cut when
+  latency rises well above the best recently observed;
+- serves waiting calls strictly by priority, so interactive searches go ahead
+  of background refreshes and batch jobs.
+
+Calls are made from worker threads, so waiting blocks the calling thread and
+never the event loop.
+"""
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from enum import IntEnum
+from typing import Any, Callable, Optional
+
+import config
+from backend.admission import TokenBucket
+from backend.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Seconds after a 429 during which a provider counts as backing off (see backing_off)
+BACKOFF_WINDOW = 30
+
+
+class Priority(IntEnum):
+    """
+    Scheduling priority of outbound calls; lower values are served first
+    """
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BATCH = 2
+
+
+# Priority of the request being served; copied into the agent's worker thread
+priority_var: contextvars.ContextVar[Priority] = contextvars.ContextVar("priority", default=Priority.INTERACTIVE)
+
+
+class RateLimited(Exception):
+    """
+    Raised by a scheduled call when the provider answered 429
+    """
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("Rate limited by provider")
+        self.retry_after = retry_after
+
+
+calls_total = REGISTRY.counter(
+    "movieratings_outbound_calls_total", "Outbound calls made", ("provider", "priority")
+)
+rate_limited_total = REGISTRY.counter(
+    "movieratings_outbound_rate_limited_total", "Outbound calls answered with 429", ("provider",)
+)
+wait_seconds_total = REGISTRY.counter(
+    "movieratings_outbound_wait_seconds_total", "Time outbound calls spent waiting to be scheduled", ("provider",)
+)
+concurrency_limit = REGISTRY.gauge(
+    "movieratings_outbound_concurrency_limit", "Current adaptive concurrency limit", ("provider",)
+)
+in_flight_calls = REGISTRY.gauge(
+    "movieratings_outbound_in_flight", "Outbound calls in flight", ("provider",)
+)
+queued_calls = REGISTRY.gauge(
+    "movieratings_outbound_queued", "Outbound calls waiting to be scheduled", ("provider",)
+)
+
+
+def _is_rate_limited(exc: BaseException) -> bool:
+    if isinstance(exc, RateLimited):
+        return True
+    # groq.RateLimitError and similar SDK errors carry the HTTP status
+    return getattr(exc, "status_code", None) == 429
+
+
+def _is_transient(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in (
+        "APIConnectionError", "APITimeoutError", "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout"
+    )
+
+
+class OutboundScheduler:
+    """
+    Pacing, adaptive concurrency and priority ordering for one provider
+    """
+    def __init__(
+        self,
+        provider: str,
+        requests_per_minute: float,
+        tokens_per_minute: float = 0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        latency_tolerance: float = 2.0,
+        max_retries: int = 2,
+    ):
+        self.provider = provider
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.max_retries = max_retries
+        self.limit = float(max(min_concurrency, max_concurrency // 2))
+        self.in_flight = 0
+
+        workers = max(1, config.BACKEND_WORKERS)
+        self._requests = TokenBucket(requests_per_minute / 60 / workers, max(1.0, requests_per_minute / 60 / workers * 10)) \
+            if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute / 60 / workers, tokens_per_minute / workers / 6) \
+            if tokens_per_minute > 0 else None
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._rate_limited_at = float("-inf")
+        self._baseline_latency: Optional[float] = None
+        concurrency_limit.set(self.limit, provider=provider)
+
+    def call(self, func: Callable[[], Any], tokens: float = 0, usage: Optional[Callable[[Any], float]] = None,
+             priority: Optional[Priority] = None) -> Any:
+        """
+        Run one outbound call when the scheduler allows it
+
+        Rate-limited (429) and transient failures are retried up to
+        ``max_retries`` times, each retry being scheduled like a new call.
+
+        Args:
+            func: Function making the call
+            tokens: Estimated tokens the call will consume (Groq only)
+            usage: Optional function returning the tokens actually consumed, given the result
+            priority: Priority of the call; defaults to that of the current request
+
+        Returns:
+            The function's result
+        """
+        if priority is None:
+            priority = priority_var.get()
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire(priority, tokens)
+            started = time.monotonic()
+            try:
+                result = func()
+            except Exception as exc:
+                latency = time.monotonic() - started
+                if _is_rate_limited(exc):
+                    self._release(latency, rate_limited=True, retry_after=getattr(exc, "retry_after", None))
+                elif _is_transient(exc):
+                    self._release(latency, congested=True)
+                else:
+                    self._release(latency)
+                    raise
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("%s call failed (%s), retrying", self.provider, type(exc).__name__,
+                               extra={"attempt": attempt + 1})
+                continue
+
+            self._release(time.monotonic() - started)
+            if usage is not None and self._tokens is not None:
+                try:
+                    actual = usage(result)
+                except Exception:
+                    actual = None
+                if actual:
+                    with self._cond:
+                        # Settle the estimate; overshoot makes the following calls wait
+                        self._tokens.tokens -= actual - min(tokens, self._tokens.capacity)
+            return result
+
+    def backing_off(self) -> bool:
+        """Check whether the provider answered 429 recently, so optional extra calls should wait."""
+        now = time.monotonic()
+        return now < self._paused_until or now - self._rate_limited_at < BACKOFF_WINDOW
+
+    def _acquire(self, priority: Priority, tokens: float):
+        entry = (int(priority), next(self._sequence))
+        calls_total.inc(provider=self.provider, priority=priority.name.lower())
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            queued_calls.set(len(self._waiters), provider=self.provider)
+            try:
+                while True:
+                    now = time.monotonic()
+                    timeout = None
+                    if self._waiters[0] == entry and self.in_flight < int(self.limit):
+                        if now < self._paused_until:
+                            timeout = self._paused_until - now
+                        else:
+                            timeout = self._take_budget(now, tokens)
+                            if timeout == 0:
+                                break
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                queued_calls.set(len(self._waiters), provider=self.provider)
+                self._cond.notify_all()
+            self.in_flight += 1
+            in_flight_calls.set(self.in_flight, provider=self.provider)
+        wait_seconds_total.inc(time.monotonic() - started, provider=self.provider)
+
+    def _take_budget(self, now: float, tokens: float) -> float:
+        # Caller holds the lock; takes from both buckets or neither
+        wait = 0.0
+        if self._requests is not None:
+            wait = self._requests.take(now)
+            if wait > 0:
+                return wait
+        if self._tokens is not None and tokens:
+            wait = self._tokens.take(now, tokens)
+            if wait > 0 and self._requests is not None:
+                # Refund the request taken above, never past the burst capacity
+                self._requests.tokens = min(self._requests.capacity, self._requests.tokens + 1)
+        return wait
+
+    def _release(self, latency: float, rate_limited: bool = False, congested: bool = False,
+                 retry_after: Optional[float] = None):
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                rate_limited_total.inc(provider=self.provider)
+                self._rate_limited_at = time.monotonic()
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self._paused_until = max(self._paused_until, time.monotonic() + (retry_after or 1.0))
+            else:
+                if self._baseline_latency is None or latency < self._baseline_latency:
+                    self._baseline_latency = latency
+                else:
+                    # Let the baseline drift up slowly so it tracks the provider's normal latency
+                    self._baseline_latency += 0.01 * (latency - self._baseline_latency)
+                if congested or latency > self.latency_tolerance * self._baseline_latency:
+                    self.limit = max(self.min_concurrency, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            concurrency_limit.set(self.limit, provider=self.provider)
+            in_flight_calls.set(self.in_flight, provider=self.provider)
+            self._cond.notify_all()
+
+
+groq_scheduler = OutboundScheduler(
+    "groq",
+    requests_per_minute=config.GROQ_REQUESTS_PER_MINUTE,
+    tokens_per_minute=config.GROQ_TOKENS_PER_MINUTE,
+    max_concurrency=config.GROQ_MAX_CONCURRENCY,
+)
+serper_scheduler = OutboundScheduler(
+    "serper",
+    requests_per_minute=config.SERPER_REQUESTS_PER_MINUTE,
+    max_concurrency=config.SERPER_MAX_CONCURRENCY,
+)
@@ -0,0 +1,245 @@
+"""
+Persistent history of the ratings served by the backend.
+
+Every freshly aggregated result is appended to a SQLite table so that it can be
+exported in bulk later on. The same database maps each movie to the platform
+pages found for it, so later lookups can read those pages directly.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import config
+from backend.movie.consensus import MovieConsensus
+
+# Exported columns, in table order
+RATING_COLUMNS = [
+    "served_at",
+    "canonical_title",
+    "platform",
+    "movie_title",
+    "movie_rating",
+    "type_of_movie",
+    "positive_review_percentage",
+    "negative_review_percentage",
+]
+
+
+class RatingsStore:
+    """
+    Append-only store of served platform ratings
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS served_ratings ("
+            "id INTEGER PRIMARY KEY, "
+            "served_at INTEGER NOT NULL, "  # microseconds since the epoch (UTC)
+            "canonical_title TEXT NOT NULL, "
+            "platform TEXT NOT NULL, "
+            "movie_title TEXT NOT NULL, "
+            "movie_rating REAL NOT NULL, "
+            "type_of_movie TEXT NOT NULL, "
+            "positive_review_percentage INTEGER NOT NULL, "
+            "negative_review_percentage INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS served_ratings_served_at ON served_ratings (served_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS served_ratings_platform ON served_ratings (platform, served_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS movie_consensus ("
+            "canonical_title TEXT PRIMARY KEY, stats TEXT NOT NULL, updated_at INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS platform_pages ("
+            "canonical_title TEXT NOT NULL, platform TEXT NOT NULL, url TEXT NOT NULL, learned_at INTEGER NOT NULL, "
+            "PRIMARY KEY (canonical_title, platform))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+        return conn
+
+    def connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a new connection; long-running readers should use their own."""
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, canonical_title: str, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Append the validated platform entries of one result
+
+        The movie's consensus statistics are updated incrementally in the same
+        transaction.
+
+        Args:
+            canonical_title: Canonical title the result was computed for
+            data: Validated platform rating dictionaries
+
+        Returns:
+            Updated consensus summary for the movie
+        """
+        served_at = int(time.time() * 1_000_000)
+        rows = [
+            (
+                served_at,
+                canonical_title,
+                item["platform"],
+                item["movie_title"],
+                item["movie_rating"],
+                item["type_of_movie"],
+                item["positive_review_percentage"],
+                item["negative_review_percentage"],
+            )
+            for item in data
+        ]
+        conn = self._connection()
+        # BEGIN IMMEDIATE serializes the read-modify-write of the consensus row across workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                f"INSERT INTO served_ratings ({', '.join(RATING_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            consensus = self._load_consensus(conn, canonical_title) or MovieConsensus(canonical_title)
+            consensus.add_result(data)
+            conn.execute(
+                "INSERT OR REPLACE INTO movie_consensus (canonical_title, stats, updated_at) VALUES (?, ?, ?)",
+                (canonical_title, json.dumps(consensus.to_dict()), served_at)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return consensus.summary()
+
+    @staticmethod
+    def _load_consensus(conn: sqlite3.Connection, canonical_title: str) -> Optional[MovieConsensus]:
+        row = conn.execute(
+            "SELECT stats FROM movie_consensus WHERE canonical_title = ?", (canonical_title,)
+        ).fetchone()
+        return MovieConsensus.from_dict(json.loads(row[0])) if row else None
+
+    def get_consensus(self, canonical_title: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the consensus summary of a movie (single primary-key read)
+
+        Args:
+            canonical_title: Canonical movie title
+
+        Returns:
+            Consensus summary, or None if the movie has never been served
+        """
+        consensus = self._load_consensus(self._connection(), canonical_title)
+        return consensus.summary() if consensus else None
+
+    def page_urls(self, canonical_title: str) -> Dict[str, str]:
+        """
+        Look up the platform pages learned for a movie
+
+        Args:
+            canonical_title: Canonical movie title
+
+        Returns:
+            Page URL per platform name (empty if none were learned)
+        """
+        return dict(self._connection().execute(
+            "SELECT platform, url FROM platform_pages WHERE canonical_title = ?", (canonical_title,)
+        ).fetchall())
+
+    def remember_pages(self, canonical_title: str, pages: Dict[str, str]):
+        """Store (or replace) the page URL of each platform in pages for a movie."""
+        learned_at = int(time.time() * 1_000_000)
+        self._connection().executemany(
+            "INSERT OR REPLACE INTO platform_pages (canonical_title, platform, url, learned_at) VALUES (?, ?, ?, ?)",
+            [(canonical_title, platform, url, learned_at) for platform, url in pages.items()]
+        )
+
+    def forget_page(self, canonical_title: str, platform: str):
+        """Drop a page that no longer yields ratings, so that it is learned again."""
+        self._connection().execute(
+            "DELETE FROM platform_pages WHERE canonical_title = ? AND platform = ?", (canonical_title, platform)
+        )
+
+    def iter_batches(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        platform: Optional[str] = None,
+        batch_size: int = 10_000,
+    ) -> Iterator[List[Tuple]]:
+        """
+        Stream stored rows in fixed-size batches
+
+        Uses a dedicated connection and cursor so that only one batch is held
+        in memory at a time, however large the table is. The connection may be
+        used from whichever thread advances the generator (StreamingResponse
+        runs each step of a sync iterator on any threadpool thread), one step
+        at a time.
+
+        Args:
+            start: Only rows served at or after this time
+            end: Only rows served before this time
+            platform: Only rows for this platform
+            batch_size: Maximum rows per batch
+
+        Yields:
+            Lists of row tuples in RATING_COLUMNS order
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("served_at >= ?")
+            params.append(to_micros(start))
+        if end is not None:
+            clauses.append("served_at < ?")
+            params.append(to_micros(end))
+        if platform:
+            clauses.append("platform = ?")
+            params.append(platform)
+
+        query = f"SELECT {', '.join(RATING_COLUMNS)} FROM served_ratings"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY served_at, id"
+
+        conn = self.connect(check_same_thread=False)
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+
+def to_micros(value: datetime) -> int:
+    """Convert a datetime (naive values are taken as UTC) to epoch microseconds."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1_000_000)
+
+
+_ratings_store = None
+
+
+def get_ratings_store() -> RatingsStore:
+    """
+    Return the process-wide ratings store configured by RATINGS_DB_PATH
+    """
+    global _ratings_store
+    if _ratings_store is None:
+        _ratings_store = RatingsStore(config.RATINGS_DB_PATH)
+    return _ratings_store
@@ -0,0 +1,235 @@
+"""
+Per-request accounting of model tokens and Serper searches.
+
+Every request gets a Usage in a context variable (see request_id_middleware),
+and every title it looks up gets a child Usage that adds into it. Model calls
+add the prompt and completion tokens Groq reports; searches count as cached
+(answered from the shared cache, free) or uncached (sent to Serper and billed,
+hedged duplicates and retries included). Worker threads started with a copy of
+the context (run_in_threadpool, the race and fast-path pools, the agent's tool
+loop) add into the same objects.
+
+When a lookup finishes its totals are added to the metrics, by the code path
+that produced the result and by title. With REQUEST_TOKEN_BUDGET or
+REQUEST_SEARCH_BUDGET set, a request that has used up its budget stops before
+the next model call or search with BudgetExceeded.
+"""
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import config
+from backend.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+tokens_used = REGISTRY.counter(
+    "movieratings_tokens_total",
+    "Model tokens used by rating lookups, by kind (prompt, completion) and code path "
+    "(cache, direct, hit, single_shot, agent)",
+    ("kind", "path")
+)
+searches_used = REGISTRY.counter(
+    "movieratings_searches_total",
+    "Serper searches made by rating lookups, by whether the shared cache answered them and by code path",
+    ("cached", "path")
+)
+title_tokens = REGISTRY.counter(
+    "movieratings_title_tokens_total",
+    "Model tokens used per title (titles beyond USAGE_METRICS_MAX_TITLES are counted as \"other\")",
+    ("title",)
+)
+title_searches = REGISTRY.counter(
+    "movieratings_title_searches_total",
+    "Uncached Serper searches per title (titles beyond USAGE_METRICS_MAX_TITLES are counted as \"other\")",
+    ("title",)
+)
+budget_exceeded = REGISTRY.counter(
+    "movieratings_budget_exceeded_total", "Lookups stopped because the request used up its budget", ("budget",)
+)
+
+# Titles with their own label; a bounded set, so the metrics cannot grow without limit
+_titles = set()
+_titles_lock = threading.Lock()
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised before a model call or search once the request has used up its budget
+    """
+    def __init__(self, budget: str, used: int, limit: int):
+        super().__init__(f"Request {budget} budget exceeded ({used} used, limit {limit})")
+        self.budget = budget
+        self.used = used
+        self.limit = limit
+
+
+class Usage:
+    """
+    Tokens and searches spent on behalf of a request, or of one title within it
+    """
+    def __init__(self, title: str = "", parent: Optional["Usage"] = None,
+                 token_budget: int = 0, search_budget: int = 0):
+        self.title = title
+        self.parent = parent
+        self.token_budget = token_budget
+        self.search_budget = search_budget
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.model_calls = 0
+        self.searches = 0
+        self.cached_searches = 0
+        self.lookups = 0
+        # Code path that produced the result, set by the strategy that answered
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add_model_call(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.model_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        if self.parent is not None:
+            self.parent.add_model_call(prompt_tokens, completion_tokens)
+
+    def add_search(self, cached: bool):
+        with self._lock:
+            if cached:
+                self.cached_searches += 1
+            else:
+                self.searches += 1
+        if self.parent is not None:
+            self.parent.add_search(cached)
+
+    def check_budget(self):
+        """
+        Raises:
+            BudgetExceeded: If this or an enclosing Usage has reached its budget
+        """
+        if self.token_budget and self.tokens >= self.token_budget:
+            raise BudgetExceeded("token", self.tokens, self.token_budget)
+        if self.search_budget and self.searches >= self.search_budget:
+            raise BudgetExceeded("search", self.searches, self.search_budget)
+        if self.parent is not None:
+            self.parent.check_budget()
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "model_calls": self.model_calls,
+                "searches": self.searches,
+                "cached_searches": self.cached_searches,
+            }
+
+    def headers(self) -> Dict[str, str]:
+        """Response headers reporting the totals."""
+        totals = self.totals()
+        return {
+            "X-Usage-Prompt-Tokens": str(totals["prompt_tokens"]),
+            "X-Usage-Completion-Tokens": str(totals["completion_tokens"]),
+            "X-Usage-Model-Calls": str(totals["model_calls"]),
+            "X-Usage-Searches": str(totals["searches"]),
+            "X-Usage-Cached-Searches": str(totals["cached_searches"]),
+        }
+
+
+usage_var: contextvars.ContextVar[Optional[Usage]] = contextvars.ContextVar("usage", default=None)
+
+
+def for_request() -> Usage:
+    """New request-level Usage with the configured budgets."""
+    return Usage(token_budget=config.REQUEST_TOKEN_BUDGET, search_budget=config.REQUEST_SEARCH_BUDGET)
+
+
+def current() -> Optional[Usage]:
+    """Usage of the lookup (or request) being served, or None outside one."""
+    return usage_var.get()
+
+
+def record_model_call(message: Any):
+    """Add the tokens of a model response to the current usage."""
+    usage = usage_var.get()
+    if usage is None:
+        return
+    metadata = getattr(message, "usage_metadata", None) or {}
+    usage.add_model_call(int(metadata.get("input_tokens") or 0), int(metadata.get("output_tokens") or 0))
+
+
+def record_search(cached: bool):
+    """Count a search against the current usage."""
+    usage = usage_var.get()
+    if usage is not None:
+        usage.add_search(cached)
+
+
+def check_budget():
+    """
+    Raises:
+        BudgetExceeded: If the current request has used up its token or search budget
+    """
+    usage = usage_var.get()
+    if usage is not None:
+        try:
+            usage.check_budget()
+        except BudgetExceeded as exc:
+            budget_exceeded.inc(budget=exc.budget)
+            raise
+
+
+def set_path(path: str):
+    """Name the code path that produced the current lookup's result."""
+    usage = usage_var.get()
+    if usage is not None:
+        usage.path = path
+
+
+def _title_label(title: str) -> str:
+    with _titles_lock:
+        if title in _titles:
+            return title
+        if len(_titles) < config.USAGE_METRICS_MAX_TITLES:
+            _titles.add(title)
+            return title
+    return "other"
+
+
+@contextmanager
+def track(title: str) -> Iterator[Usage]:
+    """
+    Account the model calls and searches made in the block to one title
+
+    The title's Usage adds into the request's and becomes the current one in
+    the block; on exit its totals go to the metrics under its code path (the
+    agent's, unless a cheaper strategy set another).
+
+    Args:
+        title: Canonical title looked up
+    """
+    parent = usage_var.get()
+    usage = Usage(title, parent)
+    if parent is not None:
+        with parent._lock:
+            parent.lookups += 1
+    token = usage_var.set(usage)
+    try:
+        yield usage
+    finally:
+        usage_var.reset(token)
+        path = usage.path or "agent"
+        totals = usage.totals()
+        tokens_used.inc(totals["prompt_tokens"], kind="prompt", path=path)
+        tokens_used.inc(totals["completion_tokens"], kind="completion", path=path)
+        searches_used.inc(totals["searches"], cached="false", path=path)
+        searches_used.inc(totals["cached_searches"], cached="true", path=path)
+        label = _title_label(title)
+        title_tokens.inc(usage.tokens, title=label)
+        title_searches.inc(totals["searches"], title=label)
+        logger.info("Lookup usage", extra={"movie": title, "path": path, **totals})
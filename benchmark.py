@@ -0,0 +1,293 @@
+import random
+import sys
+import time
+
+def make_platform_rows(count):
+    """Generate stored-looking platform rows, including the junk the validator has to clean up"""
+    platforms = ["BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis"]
+    ratings = [8.7, "9.1", "N/A", None, 12.5, -1, "7", 4.25]
+    percentages = [85, "90", "unknown", None, 140, -3, 72.6]
+
+    rng = random.Random(42)
+    rows = []
+    for _ in range(count):
+        rows.append({
+            "platform": rng.choice(platforms),
+            "movie_title": rng.choice(["Dune: Part Two", "Oppenheimer", "Jawan"]),
+            "movie_rating": rng.choice(ratings),
+            "type_of_movie": rng.choice(["Sci-Fi, Adventure", "Drama", None]),
+            "positive_review_percentage": rng.choice(percentages),
+            "negative_review_percentage": rng.choice(percentages)
+        })
+    return rows
+
+def bench_validation():
+    """Compare per-row and columnar validation of platform rows (equivalence: test_validation.py)"""
+    from backend.movie.validation import platform_frame, validate_platform_data, validate_platform_frame
+
+    for count in (10_000, 100_000, 1_000_000):
+        rows = make_platform_rows(count)
+        frame = platform_frame(rows)
+        # The per-row function sees missing keys where the frame has None/NaN
+        records = [{k: v for k, v in row.items() if v is not None} for row in rows]
+
+        start = time.perf_counter()
+        validate_platform_data(records)
+        per_row = time.perf_counter() - start
+
+        start = time.perf_counter()
+        validate_platform_frame(frame)
+        columnar = time.perf_counter() - start
+
+        print(f"{count:>9,} rows: per-row {per_row:.3f}s, columnar {columnar:.3f}s ({per_row / columnar:.1f}x)")
+
+def make_responses(count):
+    """Generate decoded response envelopes, as a dict-based cache would hold them"""
+    import json
+
+    platforms = ["BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis"]
+    genres = ["Sci-Fi, Adventure", "Drama", "Action, Thriller", "Comedy"]
+    for index in range(count):
+        response = {
+            "status": "success",
+            "data": [{
+                "platform": platform,
+                "movie_title": f"Movie {index}",
+                "movie_rating": 6.0 + (index % 40) / 10,
+                "type_of_movie": genres[index % len(genres)],
+                "positive_review_percentage": 60 + index % 40,
+                "negative_review_percentage": 40 - index % 40
+            } for platform in platforms]
+        }
+        # Round-trip through JSON so strings are separate objects, as after a cache decode
+        yield f"movie {index}", json.loads(json.dumps(response))
+
+def bench_record_memory(count=200_000):
+    """Compare memory of dict-based and compact cached rating records (5 platforms per movie)"""
+    import gc
+    import tracemalloc
+    from backend.movie.records import CompactRatingCache
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        store = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return store, current
+
+    def build_dicts():
+        return {key: response for key, response in make_responses(count)}
+
+    def build_compact():
+        cache = CompactRatingCache(max_entries=count)
+        for key, response in make_responses(count):
+            cache.set_json(key, response, ttl=3600)
+        return cache
+
+    dicts, dict_bytes = measure(build_dicts)
+    del dicts
+    compact, compact_bytes = measure(build_compact)
+    rows = count * 5
+    print(f"{rows:,} movie x platform rows")
+    print(f"  dict storage:    {dict_bytes / 2**20:8.1f} MiB ({dict_bytes / rows:.0f} B/row)")
+    print(f"  compact storage: {compact_bytes / 2**20:8.1f} MiB ({compact_bytes / rows:.0f} B/row)")
+    print(f"  saving: {100 * (1 - compact_bytes / dict_bytes):.0f}%")
+
+def bench_hit_path(requests_per_endpoint=3000):
+    """Compare cache-hit latency when re-encoding a dict vs serving pre-encoded bytes"""
+    import asyncio
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, Response
+    from backend.cache import MemoryCache, TieredCache
+    from backend.encoding import JSON_MEDIA_TYPE
+    from backend.movie.records import CompactRatingCache
+
+    key, response = next(make_responses(1))
+    cache = TieredCache(CompactRatingCache(100, 100), MemoryCache(), 60)
+    cache.set_json(key, response, 3600)
+    cache.get(key)  # warm the pre-encoded body
+
+    app = FastAPI(default_response_class=JSONResponse)
+
+    @app.get("/before")
+    async def before():
+        # Previous hit path: decoded dict through jsonable_encoder and stdlib json
+        return cache.get_json(key)
+
+    @app.get("/after")
+    async def after():
+        return Response(content=cache.get(key), media_type=JSON_MEDIA_TYPE)
+
+    async def run(path):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(100):
+                await client.get(path)
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(requests_per_endpoint):
+                request_start = time.perf_counter()
+                await client.get(path)
+                latencies.append(time.perf_counter() - request_start)
+            elapsed = time.perf_counter() - start
+        latencies.sort()
+        return requests_per_endpoint / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+    for path in ("/before", "/after"):
+        rps, p50, p99 = asyncio.run(run(path))
+        print(f"{path:8} {rps:8.0f} req/s  p50 {p50 * 1e6:6.0f} us  p99 {p99 * 1e6:6.0f} us")
+
+def bench_wire(round_trips=300):
+    """Measure bytes on the wire and round-trip time, compressed vs not and pooled vs per-request connections"""
+    import socket
+    import threading
+    import requests
+    import uvicorn
+    from fastapi import FastAPI
+    from fastapi.responses import Response
+    from backend import encoding
+    from backend.compression import CompressionMiddleware, supported_encodings
+    from utils import get_http_session
+
+    single = encoding.dumps(next(make_responses(1))[1])
+    batch = encoding.dumps([response for _, response in make_responses(20)])
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/single")
+    async def get_single():
+        return Response(content=single, media_type=encoding.JSON_MEDIA_TYPE)
+
+    @app.get("/batch")
+    async def get_batch():
+        return Response(content=batch, media_type=encoding.JSON_MEDIA_TYPE)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        print("bytes on the wire (body):")
+        for path in ("/single", "/batch"):
+            sizes = []
+            for coding in ("identity",) + supported_encodings():
+                response = requests.get(base_url + path, headers={"Accept-Encoding": coding}, stream=True)
+                sizes.append(f"{coding} {len(response.raw.read(decode_content=False)):>7,}")
+            print(f"  {path:8} " + "  ".join(sizes))
+
+        def round_trip(get, path):
+            get(base_url + path)
+            latencies = []
+            for _ in range(round_trips):
+                start = time.perf_counter()
+                get(base_url + path).content
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+        def new_connection(url):
+            # Previous behaviour: a fresh connection and no Accept-Encoding preference
+            return requests.get(url, headers={"Accept-Encoding": "identity"})
+
+        print("round-trip time:")
+        for path in ("/single", "/batch"):
+            for label, get in (("new connection", new_connection), ("pooled session", get_http_session().get)):
+                p50, p99 = round_trip(get, path)
+                print(f"  {path:8} {label:15} p50 {p50 * 1e6:6.0f} us  p99 {p99 * 1e6:6.0f} us")
+    finally:
+        server.should_exit = True
+        thread.join()
+
+def bench_compare_render(runs=5):
+    """Compare render time of per-movie cards vs the single-DataFrame comparison view"""
+    from streamlit.testing.v1 import AppTest
+
+    # AppTest runs each function's source as a standalone script, so it imports everything itself
+    def cards(count):
+        import app
+        from benchmark import make_responses
+        for _, response in make_responses(count):
+            app.display_movie_ratings(response["data"])
+
+    def comparison(count):
+        import app
+        from benchmark import make_responses
+        results = {key: response["data"] for key, response in make_responses(count)}
+        app.display_movie_comparison(app.build_comparison_frame(results))
+
+    for count in (1, 3, 5, 20):
+        timings = []
+        for script in (cards, comparison):
+            test = AppTest.from_function(script, args=(count,))
+            test.run(timeout=60)  # warm up imports
+            assert not test.exception, test.exception
+            start = time.perf_counter()
+            for _ in range(runs):
+                test.run(timeout=60)
+            timings.append((time.perf_counter() - start) / runs)
+        print(f"{count:>3} movies: cards {timings[0] * 1e3:7.1f} ms ({count * 5 + count} elements), "
+              f"comparison {timings[1] * 1e3:7.1f} ms")
+
+def bench_free_text(budget=2.0):
+    """Time the old backtracking regexes and the linear extractor on worst-case agent answers"""
+    import re
+    from backend.movie.extraction import extract_text_ratings, parse_rating_array
+
+    platforms = ["BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis"]
+
+    def old_extract(content):
+        # The fallbacks as they were: one uncompiled nested lazy pattern per platform, then the array regex
+        for platform in platforms:
+            if platform.lower() in content.lower():
+                re.search(r'{}.*?rating.*?(\d+(\.\d+)?)'.format(platform), content, re.IGNORECASE | re.DOTALL)
+        re.search(r'\[\s*\{.*?\}\s*(,\s*\{.*?\}\s*)*\]', content, re.DOTALL)
+
+    def new_extract(content):
+        parse_rating_array(content)
+        extract_text_ratings(content)
+
+    # Platform names and rating words with no number after them, and arrays that never close
+    def worst_case(size):
+        unit = "PVR Cinemas rating is not listed, {'platform' [{ "
+        return (unit * (size // len(unit) + 1))[:size]
+
+    skip_old = False
+    for size in (1_000, 2_000, 4_000, 8_000, 16_000, 64_000, 256_000, 1_000_000):
+        content = worst_case(size)
+        start = time.perf_counter()
+        new_extract(content)
+        new = time.perf_counter() - start
+
+        old = None
+        if not skip_old:
+            start = time.perf_counter()
+            old_extract(content)
+            old = time.perf_counter() - start
+            skip_old = old > budget
+        old_text = f"{old * 1e3:10.1f} ms" if old is not None else f"{'skipped':>13}"
+        print(f"{size:>9,} chars: regexes {old_text}, linear {new * 1e3:8.1f} ms "
+              f"({new / size * 1e9:6.0f} ns/char)")
+
+BENCHMARKS = {
+    "validation": bench_validation,
+    "record_memory": bench_record_memory,
+    "hit_path": bench_hit_path,
+    "wire": bench_wire,
+    "compare_render": bench_compare_render,
+    "free_text": bench_free_text,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -10,6 +10,9 @@ load_dotenv()
 # API Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 API_TIMEOUT = int(os.getenv("API_TIMEOUT", "60"))  # seconds
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))  # concurrent background fetches in the frontend
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))  # keep-alive connections the frontend holds to the API
+MAX_COMPARE_MOVIES = int(os.getenv("MAX_COMPARE_MOVIES", "5"))  # titles per comparison (batch) request
 
 # Application Settings
 APP_TITLE = "🎬 Movie Rating Aggregator"
@@ -18,6 +21,93 @@ DEFAULT_LAYOUT = "wide"
 
 # Cache Settings
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 1 hour in seconds
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite").lower()  # "memory", "sqlite" or "redis"
+CACHE_URL = os.getenv("CACHE_URL", ".cache/movieratings.db")  # SQLite path or redis:// URL
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "300"))  # titles with no real ratings, 5 minutes
+SERPER_CACHE_TTL = int(os.getenv("SERPER_CACHE_TTL", "1800"))  # 30 minutes in seconds
+CACHE_LOCK_TTL = int(os.getenv("CACHE_LOCK_TTL", "120"))  # max time one worker may hold a title
+CACHE_LOCK_WAIT = int(os.getenv("CACHE_LOCK_WAIT", "90"))  # max time other workers wait for it
+CACHE_POLL_INTERVAL = float(os.getenv("CACHE_POLL_INTERVAL", "0.25"))  # seconds
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "100000"))  # in-process results per worker
+LOCAL_CACHE_MAX_ENCODED = int(os.getenv("LOCAL_CACHE_MAX_ENCODED", "2000"))  # hottest results kept pre-encoded
+LOCAL_CACHE_TTL = int(os.getenv("LOCAL_CACHE_TTL", "60"))  # max staleness of in-process results in seconds
+FUNCTION_CACHE_MAX_MB = float(os.getenv("FUNCTION_CACHE_MAX_MB", "64"))  # memory per backend.function_cache.cost_aware_cache function
+FUNCTION_CACHE_SPILL_DIR = os.getenv("FUNCTION_CACHE_SPILL_DIR", "")  # evicted results spill here; empty disables
+FUNCTION_CACHE_SPILL_MAX_MB = float(os.getenv("FUNCTION_CACHE_SPILL_MAX_MB", "256"))  # disk per function
+
+# Admission Control Settings (agent runs only; cache hits are always served)
+MAX_CONCURRENT_AGENT_RUNS = int(os.getenv("MAX_CONCURRENT_AGENT_RUNS", "4"))  # per worker
+MAX_QUEUED_AGENT_RUNS = int(os.getenv("MAX_QUEUED_AGENT_RUNS", "16"))  # waiting runs per worker before 503
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "20"))  # max queue wait, well under API_TIMEOUT
+CLIENT_RATE_LIMIT = float(os.getenv("CLIENT_RATE_LIMIT", "10"))  # agent runs per client per minute
+CLIENT_BURST = int(os.getenv("CLIENT_BURST", "5"))  # agent runs a client may start back to back
+
+# Usage Accounting Settings (model tokens and Serper searches per request; 0 disables a budget)
+REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "0"))  # model tokens a request may use
+REQUEST_SEARCH_BUDGET = int(os.getenv("REQUEST_SEARCH_BUDGET", "0"))  # uncached Serper searches a request may make
+USAGE_METRICS_MAX_TITLES = int(os.getenv("USAGE_METRICS_MAX_TITLES", "200"))  # titles with their own metrics label
+
+# Outbound Scheduling Settings (provider quotas are shared by all backend workers)
+BACKEND_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))  # worker processes the quotas are split between
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", "30000"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))  # upper bound of the adaptive limit
+GROQ_MAX_OUTPUT_TOKENS = int(os.getenv("GROQ_MAX_OUTPUT_TOKENS", "1024"))  # assumed completion size when pacing
+SERPER_REQUESTS_PER_MINUTE = float(os.getenv("SERPER_REQUESTS_PER_MINUTE", "300"))
+SERPER_MAX_CONCURRENCY = int(os.getenv("SERPER_MAX_CONCURRENCY", "16"))  # upper bound of the adaptive limit
+SERPER_TIMEOUT = float(os.getenv("SERPER_TIMEOUT", "10"))  # seconds per search request, hedged duplicates included
+MAX_PARALLEL_TOOL_CALLS = int(os.getenv("MAX_PARALLEL_TOOL_CALLS", "5"))  # tool calls of one agent turn run at once
+
+# Fast Path Settings (answering from search snippets without the model)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.9"))  # rating + positive % required by default
+
+# Direct Page Settings (reading ratings from platform pages found by earlier searches)
+DIRECT_FETCH_ENABLED = os.getenv("DIRECT_FETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "5"))  # seconds per page
+PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", "2000000"))  # pages are read up to this size
+PAGE_POOL_SIZE = int(os.getenv("PAGE_POOL_SIZE", "10"))  # keep-alive connections per platform host
+PAGE_USER_AGENT = os.getenv("PAGE_USER_AGENT", "Mozilla/5.0 (compatible; MovieRatingAggregator/1.0)")
+
+# Hedging Settings (extra upstream load is capped at the given share of calls/requests)
+SERPER_HEDGE_PERCENTILE = float(os.getenv("SERPER_HEDGE_PERCENTILE", "95"))  # fire a duplicate search after this latency
+SERPER_HEDGE_MAX_RATIO = float(os.getenv("SERPER_HEDGE_MAX_RATIO", "0.1"))  # duplicates per search, at most
+RACE_ENABLED = os.getenv("RACE_ENABLED", "true").lower() in ("1", "true", "yes")
+RACE_HEDGE_PERCENTILE = float(os.getenv("RACE_HEDGE_PERCENTILE", "75"))  # start the agent alongside a slow cheap strategy
+RACE_MAX_EXTRA_RATIO = float(os.getenv("RACE_MAX_EXTRA_RATIO", "0.2"))  # agent runs started while the cheap one is pending
+SINGLE_SHOT_ENABLED = os.getenv("SINGLE_SHOT_ENABLED", "true").lower() in ("1", "true", "yes")  # one model call on snippets
+
+# Compression Settings
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))  # bytes; smaller responses are sent as-is
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))  # 1 (fastest) to 9 (smallest)
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))  # 0 (fastest) to 11 (smallest); used if brotli is installed
+
+# Capture Settings (recording upstream traffic for replay.py)
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")  # cassette directory; empty disables capture
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "1.0"))  # share of agent lookups recorded
+
+# Checkpoint Settings (resuming interrupted agent runs)
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() in ("1", "true", "yes")
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", ".cache/checkpoints.db")
+CHECKPOINT_WINDOW = int(os.getenv("CHECKPOINT_WINDOW", "600"))  # seconds; lookups of a title in one window share a run
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", "3600"))  # runs idle this long are dropped
+CHECKPOINT_MAX_MB = float(os.getenv("CHECKPOINT_MAX_MB", "64"))  # oldest runs are dropped above this size
+
+# Storage Settings
+RATINGS_DB_PATH = os.getenv("RATINGS_DB_PATH", ".cache/ratings.db")  # history of served ratings
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))  # rows per streamed export chunk
+
+# Logging Settings
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # e.g. "backend.movie.planner=DEBUG,backend.main=INFO"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" or "text"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # fraction of high-volume lines kept
+
+# Profiling Settings (single /movie-ratings requests, on demand)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # admin token expected in X-Profile-Token; empty disables profiling
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".cache/profiles")  # flame graphs and allocation summaries
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between stack samples
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "30"))  # source lines listed in the summary
 
 # Movie Rating Platforms
 MOVIE_PLATFORMS = [
@@ -28,6 +118,23 @@ MOVIE_PLATFORMS = [
     "Cinepolis"
 ]
 
+
+def _per_platform(name, cast):
+    """Parse a "Platform=value,..." setting into a dict"""
+    return {
+        platform.strip(): cast(value)
+        for platform, value in (part.split("=", 1) for part in os.getenv(name, "").split(",") if "=" in part)
+    }
+
+
+# Weight of each platform in the consensus score, e.g. "BookMyShow=2,Paytm=1" (default 1.0)
+PLATFORM_WEIGHTS = _per_platform("PLATFORM_WEIGHTS", float)
+# Search cache TTL of each platform in seconds, e.g. "Paytm=600" (default SERPER_CACHE_TTL)
+PLATFORM_CACHE_TTLS = _per_platform("PLATFORM_CACHE_TTLS", int)
+# Concurrent searches of each platform per worker, e.g. "Cinepolis=2" (default PLATFORM_MAX_CONCURRENCY)
+PLATFORM_MAX_CONCURRENCY = int(os.getenv("PLATFORM_MAX_CONCURRENCY", "4"))
+PLATFORM_CONCURRENCY = _per_platform("PLATFORM_CONCURRENCY", int)
+
 # Feature Flags
 ENABLE_ANALYTICS = os.getenv("ENABLE_ANALYTICS", "false").lower() == "true"
 ENABLE_FEEDBACK = os.getenv("ENABLE_FEEDBACK", "true").lower() == "true"
@@ -0,0 +1,113 @@
+"""
+Replay captured lookups against the current code.
+
+    python replay.py CASSETTE_OR_DIRECTORY [...] [--speed 10] [--repeat 3]
+
+Cassettes are recorded by the backend with CAPTURE_DIR set (see
+backend/recording.py). Groq and Serper are answered from the cassette, each
+call delayed by its recorded duration divided by --speed (0 for no delay).
+The caches, agent checkpoints and provider quota pacing are bypassed (--pace
+keeps the pacing). For every stage the recorded and replayed wall-clock and CPU times are
+printed; wall-clock times compare directly at --speed 1, CPU times at any
+speed.
+"""
+import argparse
+import glob
+import os
+import sys
+from collections import defaultdict
+
+CASSETTE_SUFFIX = ".json.gz"
+
+
+def configure(pace):
+    """Set up the environment before the backend is imported."""
+    # Upstreams are stubbed: no keys are needed and nothing is shared with a running backend
+    os.environ.setdefault("CACHE_BACKEND", "memory")
+    os.environ.setdefault("GROQ_API_KEY", "replay")
+    os.environ.setdefault("LANGCHAIN_API_KEY", "replay")
+    # A resumed run would skip the calls being replayed
+    os.environ["CHECKPOINT_ENABLED"] = "false"
+    if not pace:
+        # Quotas were paced when the traffic was recorded; replays run back to back
+        for name in ("GROQ_REQUESTS_PER_MINUTE", "GROQ_TOKENS_PER_MINUTE", "SERPER_REQUESTS_PER_MINUTE"):
+            os.environ[name] = "0"
+
+
+def find_cassettes(paths):
+    """Expand directories into the cassettes they contain."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, f"*{CASSETTE_SUFFIX}"))))
+        else:
+            found.append(path)
+    return found
+
+
+def replay_cassette(cassette, speed):
+    """Run one recorded lookup against the current code and return its measurements."""
+    from backend import recording
+    from backend.main import resolve_movie_ratings
+    from backend.movie.schema import MovieRatingRequest
+
+    player = recording.Player(cassette, speed)
+    measured = recording.Cassette(cassette.movie_name)
+    with recording.replay(player, measured):
+        result = resolve_movie_ratings(MovieRatingRequest(movie_name=cassette.movie_name))
+    return measured, player, result
+
+
+def change(before, after):
+    return f"{(after - before) / before * 100:+7.1f}%" if before else "      -"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="cassette files or directories of cassettes")
+    parser.add_argument("--speed", type=float, default=1.0, help="upstream pace multiplier (0: no delay)")
+    parser.add_argument("--repeat", type=int, default=1, help="replays of each cassette")
+    parser.add_argument("--pace", action="store_true", help="pace calls against the configured provider quotas")
+    args = parser.parse_args(argv)
+    configure(args.pace)
+    from backend import recording
+
+    paths = find_cassettes(args.paths)
+    if not paths:
+        print("No cassettes found", file=sys.stderr)
+        return 1
+
+    recorded = defaultdict(lambda: [0.0, 0.0])
+    replayed = defaultdict(lambda: [0.0, 0.0])
+    for path in paths:
+        cassette = recording.Cassette.load(path)
+        for _ in range(args.repeat):
+            measured, player, result = replay_cassette(cassette, args.speed)
+            for name, stage in cassette.stages.items():
+                recorded[name][0] += stage["seconds"]
+                recorded[name][1] += stage["cpu_seconds"]
+            for name, stage in measured.stages.items():
+                replayed[name][0] += stage["seconds"]
+                replayed[name][1] += stage["cpu_seconds"]
+
+            before = cassette.stages.get("total", {}).get("seconds", 0.0)
+            after = measured.stages.get("total", {}).get("seconds", 0.0)
+            print(f"{cassette.movie_name[:30]:<30} {(result or {}).get('status', '-'):<10} "
+                  f"total {before * 1e3:8.1f} -> {after * 1e3:8.1f} ms {change(before, after)}  "
+                  f"calls: {len(cassette.interactions)} recorded, {player.unmatched} unmatched, "
+                  f"{player.missing} missing, {player.unused} unused")
+
+    runs = len(paths) * args.repeat
+    print(f"\nPer-stage means over {runs} replay(s) at speed {args.speed:g}:")
+    print(f"{'stage':<12} {'wall rec ms':>12} {'wall now ms':>12} {'change':>8} "
+          f"{'cpu rec ms':>11} {'cpu now ms':>11} {'change':>8}")
+    for name in sorted(set(recorded) | set(replayed)):
+        wall_before, cpu_before = (value / runs for value in recorded[name])
+        wall_after, cpu_after = (value / runs for value in replayed[name])
+        print(f"{name:<12} {wall_before * 1e3:12.1f} {wall_after * 1e3:12.1f} {change(wall_before, wall_after)} "
+              f"{cpu_before * 1e3:11.2f} {cpu_after * 1e3:11.2f} {change(cpu_before, cpu_after)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
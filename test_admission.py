@@ -0,0 +1,159 @@
+import asyncio
+import sys
+import threading
+
+import httpx
+import pytest
+
+import backend.admission as admission
+import backend.main as main
+from backend.admission import AdmissionRejected, AgentRunQueue, ClientRateLimiter, TokenBucket
+from backend.cache import MemoryCache, TieredCache
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(3)] == [0.0] * 3
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0.0
+    # A long idle period refills the bucket to its capacity, no further
+    assert [bucket.take(now + 100) for _ in range(3)] == [0.0] * 3
+    assert bucket.take(now + 100) > 0
+
+
+def test_rate_limiter_rejects_with_retry_after():
+    limiter = ClientRateLimiter(per_minute=60, burst=2)
+    limiter.check("a")
+    limiter.check("a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.check("a")
+    assert rejected.value.status_code == 429 and rejected.value.retry_after == 1
+    # Other clients have buckets of their own
+    limiter.check("b")
+
+
+def test_rate_limiter_keeps_most_recent_clients():
+    limiter = ClientRateLimiter(per_minute=1, burst=1, max_clients=2)
+    limiter.check("a")
+    limiter.check("b")
+    limiter.check("c")
+    assert list(limiter._buckets) == ["b", "c"]
+
+
+def test_queue_bounds_and_hands_slots_over():
+    async def run():
+        queue = AgentRunQueue(max_running=1, max_queued=1, max_wait=5)
+        release = asyncio.Event()
+        order = []
+
+        async def job(name):
+            async with queue.slot():
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(job("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(job("second"))
+        await asyncio.sleep(0)
+        assert (queue.running, queue.queued) == (1, 1)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with queue.slot():
+                pass
+        assert rejected.value.status_code == 503 and rejected.value.reason == "queue_full"
+
+        release.set()
+        await asyncio.gather(first, second)
+        assert order == ["first", "second"]
+        assert (queue.running, queue.queued) == (0, 0)
+
+    asyncio.run(run())
+
+
+def test_queue_wait_times_out():
+    async def run():
+        queue = AgentRunQueue(max_running=1, max_queued=4, max_wait=0.05)
+        async with queue.slot():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with queue.slot():
+                    pass
+        assert rejected.value.status_code == 503 and rejected.value.reason == "queue_timeout"
+        assert (queue.running, queue.queued) == (0, 0)
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def admission_control(monkeypatch):
+    """One client run per minute, one agent run at a time and no queue"""
+    limiter = ClientRateLimiter(per_minute=1, burst=1)
+    queue = AgentRunQueue(max_running=1, max_queued=0, max_wait=5)
+    monkeypatch.setattr(admission, "client_limiter", limiter)
+    monkeypatch.setattr(admission, "agent_runs", queue)
+    return limiter, queue
+
+
+def test_run_refused_by_the_queue_is_not_charged(admission_control):
+    async def run():
+        async with admission.admit_agent_run("busy"):
+            # The queue is full, so this run never starts...
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with admission.admit_agent_run("client"):
+                    pass
+            assert rejected.value.status_code == 503
+        # ...and the client's only token is still there
+        async with admission.admit_agent_run("client"):
+            pass
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit_agent_run("client"):
+                pass
+        assert rejected.value.status_code == 429
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Stand-in agent that holds its run until .release is set"""
+    started, release = threading.Event(), threading.Event()
+
+    def resolve(payload, on_progress=None):
+        started.set()
+        release.wait(5)
+        return main.not_found_result(payload.movie_name)
+
+    monkeypatch.setattr(main, "resolve_movie_ratings", resolve)
+    monkeypatch.setattr(main, "ratings_cache", TieredCache(MemoryCache(), MemoryCache(), 60))
+    resolve.started, resolve.release = started, release
+    return resolve
+
+
+def test_endpoint_sheds_load_with_retry_after(admission_control, agent):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            def lookup(title, client_id):
+                return client.post("/movie-ratings", json={"movie_name": title}, headers={"X-Client-ID": client_id})
+
+            running = asyncio.create_task(lookup("First Title", "a"))
+            assert await asyncio.to_thread(agent.started.wait, 5)
+
+            shed = await lookup("Second Title", "b")
+            agent.release.set()
+            assert (await running).status_code == 200
+
+            limited = await lookup("Third Title", "a")
+            # Client b was not charged for the run that never started
+            admitted = await lookup("Second Title", "b")
+            return shed, limited, admitted
+
+    shed, limited, admitted = asyncio.run(run())
+    assert shed.status_code == 503 and int(shed.headers["Retry-After"]) >= 1
+    assert shed.json()["status"] == "error"
+    assert limited.status_code == 429 and int(limited.headers["Retry-After"]) >= 1
+    assert admitted.status_code == 200 and admitted.json()["status"] == "not_found"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
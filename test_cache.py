@@ -0,0 +1,205 @@
+import asyncio
+import socketserver
+import threading
+import time
+
+import pytest
+
+import config
+from backend import cache as cache_module
+from backend.cache import RedisCache, SQLiteCache, single_flight
+
+
+class RespStore:
+    """Keys, expiry and per-key versions of the stand-in server"""
+    def __init__(self):
+        self.data = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            self.delete(key)
+            return None
+        return entry[0] if entry else None
+
+    def set(self, key, value, expires_at):
+        self.data[key] = (value, expires_at)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def delete(self, key):
+        removed = self.data.pop(key, None) is not None
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return removed
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Minimal Redis-protocol server: GET, SET [NX] [PX], DEL, WATCH, UNWATCH, MULTI, EXEC, PING"""
+    store: RespStore = None
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self.reply(item) for item in value)
+        if value == "OK":
+            return b"+OK\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def execute(self, args):
+        name, store = args[0].upper(), self.store
+        if name == b"PING":
+            return "OK"
+        if name == b"GET":
+            return store.get(args[1])
+        if name == b"DEL":
+            return int(store.delete(args[1]))
+        if name == b"SET":
+            options = [arg.upper() for arg in args[3:]]
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.time() + int(args[3 + options.index(b"PX") + 1]) / 1000
+            if b"NX" in options and store.get(args[1]) is not None:
+                return None
+            store.set(args[1], args[2], expires_at)
+            return "OK"
+        raise ValueError(name)
+
+    def handle(self):
+        watched, queued = {}, None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            with self.store.lock:
+                if name == b"WATCH":
+                    watched[args[1]] = self.store.versions.get(args[1], 0)
+                    result = "OK"
+                elif name == b"UNWATCH":
+                    watched, result = {}, "OK"
+                elif name == b"MULTI":
+                    queued, result = [], "OK"
+                elif name == b"EXEC":
+                    changed = any(self.store.versions.get(key, 0) != version for key, version in watched.items())
+                    result = None if changed else [self.execute(command) for command in queued]
+                    watched, queued = {}, None
+                elif queued is not None:
+                    queued.append(args)
+                    result = b"QUEUED"
+                else:
+                    result = self.execute(args)
+            self.wfile.write(b"+QUEUED\r\n" if result == b"QUEUED" else self.reply(result))
+
+
+@pytest.fixture
+def redis_url():
+    RespHandler.store = RespStore()
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RespHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(config, "CACHE_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(config, "CACHE_LOCK_WAIT", 5)
+    monkeypatch.setattr(config, "CACHE_LOCK_TTL", 5)
+
+
+def test_redis_get_add_set_delete(redis_url):
+    cache = RedisCache(redis_url)
+    assert cache.get("k") is None
+    assert cache.add("k", b"one", 10)
+    assert not cache.add("k", b"two", 10)
+    assert cache.get("k") == b"one"
+    cache.set("k", b"three", 10)
+    assert cache.get("k") == b"three"
+    cache.delete("k")
+    assert cache.get("k") is None
+    cache.set_json("j", {"a": [1, 2]}, 10)
+    assert cache.get_json("j") == {"a": [1, 2]}
+    cache.set("short", b"x", 0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_release_only_deletes_own_lock(backend, redis_url, tmp_path):
+    cache = RedisCache(redis_url) if backend == "redis" else SQLiteCache(str(tmp_path / "cache.db"))
+    assert cache.add("lock", b"first", 10)
+    assert not cache.release("lock", b"second")
+    assert cache.get("lock") == b"first"
+    assert cache.release("lock", b"first")
+    assert cache.get("lock") is None
+
+
+def test_sqlite_purges_expired_rows_on_set(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_module, "PURGE_INTERVAL", 0.05)
+    cache = SQLiteCache(str(tmp_path / "cache.db"))
+    for index in range(20):
+        cache.set(f"query{index}", b"result", 0.01)
+    cache.set("kept", b"result", 60)
+    time.sleep(0.1)
+
+    cache.set("new", b"result", 60)
+    count, = cache._connection().execute("SELECT COUNT(*) FROM cache").fetchone()
+    assert count == 2
+    assert cache.get("kept") == b"result"
+
+
+def test_lock_expired_during_compute_is_not_released(redis_url):
+    """A run outliving its lock leaves the lock another worker took alone"""
+    cache = RedisCache(redis_url)
+
+    async def slow():
+        # Our lock expires and another worker takes it
+        cache.delete("key:lock")
+        assert cache.add("key:lock", b"other-worker", 10)
+        return {"value": 1}
+
+    asyncio.run(single_flight(cache, "key", slow, ttl=10))
+    assert cache.get("key:lock") == b"other-worker"
+
+
+def test_redis_single_flight_across_callers(redis_url):
+    """Two workers (separate connections) asking for one key compute it once"""
+    calls = []
+
+    def worker(results):
+        cache = RedisCache(redis_url)
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.2)
+            return {"status": "success", "data": [1]}
+
+        results.append(asyncio.run(single_flight(cache, "movie", compute, ttl=10)))
+
+    results = []
+    threads = [threading.Thread(target=worker, args=(results,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [body for body, _ in results] == [b'{"status":"success","data":[1]}'] * 2
+    assert all(cacheable for _, cacheable in results)
+    assert RedisCache(redis_url).get("movie:lock") is None
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from backend.function_cache import CostAwareCache, cost_aware_cache
+
+KB = 1024
+
+
+def value(tag: str, size: int = KB) -> bytes:
+    """A value whose pickled size is a little over size bytes"""
+    return tag.encode() * (size // len(tag))
+
+
+def test_evicts_cheapest_to_recompute_per_byte():
+    cache = CostAwareCache(max_bytes=int(3.5 * KB), ttl_seconds=60)
+    cache.put("slow", value("slow"), cost=10.0)
+    cache.put("quick", value("quick"), cost=0.001)
+    cache.put("medium", value("medium"), cost=1.0)
+
+    cache.put("new", value("new"), cost=0.5)
+    assert cache.get("quick") == (False, None)
+    assert all(cache.get(key)[0] for key in ("slow", "medium", "new"))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_equal_cost_evicts_larger_entry_first():
+    cache = CostAwareCache(max_bytes=5 * KB, ttl_seconds=60)
+    cache.put("large", value("large", 2 * KB), cost=1.0)
+    cache.put("small", value("small"), cost=1.0)
+    cache.put("other", value("other", 2 * KB), cost=5.0)
+    assert cache.get("large") == (False, None)
+    assert cache.get("small")[0] and cache.get("other")[0]
+
+
+def test_stays_within_byte_bound():
+    cache = CostAwareCache(max_bytes=10 * KB, ttl_seconds=60)
+    for index in range(100):
+        cache.put(f"key{index}", value(f"v{index:03d}"), cost=index % 7 + 0.1)
+        assert cache.stats()["bytes"] <= 10 * KB
+    assert cache.stats()["entries"] < 100
+
+    # A value larger than the whole budget is not stored at all
+    cache.put("huge", value("huge", 20 * KB), cost=100.0)
+    assert cache.get("huge") == (False, None)
+    assert cache.stats()["uncacheable"] == 1
+
+
+def test_spills_evicted_entries_and_reloads_them(tmp_path):
+    cache = CostAwareCache(max_bytes=int(2.5 * KB), ttl_seconds=60, spill_dir=str(tmp_path), spill_max_bytes=100 * KB)
+    cache.put("first", value("first"), cost=0.01)
+    cache.put("second", value("second"), cost=1.0)
+    cache.put("third", value("third"), cost=1.0)
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["spills"] == 1 and stats["spilled_entries"] == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+    assert cache.get("first") == (True, value("first"))
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1 and stats["misses"] == 0
+    # Reloading made room by evicting the cheapest entry again, which went back to disk
+    assert stats["spills"] == 2 and stats["spilled_entries"] == 1 and len(os.listdir(tmp_path)) == 1
+
+
+def test_spill_directory_stays_within_its_budget(tmp_path):
+    cache = CostAwareCache(max_bytes=int(1.5 * KB), ttl_seconds=60, spill_dir=str(tmp_path), spill_max_bytes=int(2.5 * KB))
+    for index in range(6):
+        cache.put(f"key{index}", value(f"v{index}"), cost=1.0)
+    assert cache.stats()["spilled_bytes"] <= int(2.5 * KB)
+    assert len(os.listdir(tmp_path)) == cache.stats()["spilled_entries"] <= 2
+
+
+def test_entries_expire(tmp_path):
+    cache = CostAwareCache(max_bytes=int(1.5 * KB), ttl_seconds=0.05, spill_dir=str(tmp_path), spill_max_bytes=100 * KB)
+    cache.put("memory", value("memory"), cost=1.0)
+    assert cache.get("memory")[0]
+    cache.put("spilled", value("spilled"), cost=0.1)
+    time.sleep(0.1)
+
+    assert cache.get("memory") == (False, None)
+    assert cache.stats()["expirations"] == 1
+    # An expired entry on disk is not reloaded either
+    assert cache.get("spilled") == (False, None)
+
+
+def test_decorator_does_not_cache_none():
+    calls = []
+
+    @cost_aware_cache(ttl_seconds=60, cacheable=lambda result: result is not None)
+    def lookup(name):
+        calls.append(name)
+        return None if name == "missing" else {"name": name}
+
+    assert lookup("missing") is None
+    assert lookup("missing") is None
+    assert calls == ["missing", "missing"]
+
+    assert lookup("found") == {"name": "found"}
+    assert lookup("found") == {"name": "found"}
+    assert calls.count("found") == 1
+    assert lookup.cache_stats()["hits"] == 1
+
+    lookup.cache_clear()
+    lookup("found")
+    assert calls.count("found") == 2
+
+
+def test_decorator_wraps_coroutines():
+    calls = []
+
+    @cost_aware_cache(ttl_seconds=60)
+    async def lookup(name, scale=1):
+        calls.append((name, scale))
+        await asyncio.sleep(0)
+        return name * scale
+
+    assert asyncio.run(lookup("a", scale=2)) == "aa"
+    assert asyncio.run(lookup("a", scale=2)) == "aa"
+    assert asyncio.run(lookup("a", scale=3)) == "aaa"
+    assert calls == [("a", 2), ("a", 3)]
+
+
+def test_module_does_not_pull_in_the_frontend():
+    code = "import sys, logging, backend.function_cache; " \
+           "assert 'streamlit' not in sys.modules and not logging.getLogger().handlers"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
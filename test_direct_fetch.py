@@ -0,0 +1,173 @@
+import os
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import backend.movie.planner as planner
+import backend.store as store
+import config
+from backend.cache import MemoryCache, canonical_title
+from backend.movie import fast_path, pages, platforms
+from backend.store import RatingsStore, get_ratings_store
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pages")
+MOVIE = "Dune: Part Two"
+PAGES = {
+    "BookMyShow": "bookmyshow-dune-part-two.html",
+    "Paytm": "paytm-dune-part-two.html",
+    "PVR Cinemas": "pvr-dune-part-two.html",
+    "INOX Movies": "inox-dune-part-two.html",
+    "Cinepolis": "cinepolis-dune-part-two.html",
+}
+EXPECTED_RATINGS = {"BookMyShow": 8.7, "Paytm": 8.6, "PVR Cinemas": 8.6, "INOX Movies": 8.8, "Cinepolis": 8.4}
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    served = []
+
+    def do_GET(self):
+        FixtureHandler.served.append(self.path)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server():
+    """Serve the saved platform pages on a free local port"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(FixtureHandler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def no_search(*args, **kwargs):
+    raise AssertionError("Serper was called although every platform page is known")
+
+
+@pytest.fixture(autouse=True)
+def scratch_state(monkeypatch, tmp_path):
+    """Keep the URL map in a scratch database and nothing in any shared cache"""
+    monkeypatch.setattr(store, "_ratings_store", RatingsStore(str(tmp_path / "ratings.db")))
+    cache = MemoryCache()
+    monkeypatch.setattr(planner, "get_shared_cache", lambda: cache)
+    monkeypatch.setattr(config, "SINGLE_SHOT_ENABLED", False)
+    monkeypatch.setattr(config, "DIRECT_FETCH_ENABLED", True)
+
+
+@pytest.fixture
+def fixture_server(monkeypatch):
+    """Serve the saved pages locally; its http://127.0.0.1 URLs are let through the page URL checks"""
+    server, base = start_fixture_server()
+    FixtureHandler.served = []
+    check = pages.check_page_url
+    monkeypatch.setattr(pages, "check_page_url", lambda url, adapter=None: None if url.startswith(base) else check(url, adapter))
+    yield base
+    server.shutdown()
+    server.server_close()
+
+
+def test_learn_pages():
+    """Movie pages in search results are remembered; other platform links are not"""
+    learned = pages.learn_pages(MOVIE, [
+        {"link": "https://in.bookmyshow.com/movies/dune-part-two/ET00361325", "title": "Dune: Part Two"},
+        {"link": "https://in.bookmyshow.com/explore/movies-mumbai", "title": "Dune: Part Two and more"},
+        {"link": "https://www.pvrcinemas.com/moviesessions/dune-part-two", "title": "Dune: Part Two"},
+        {"link": "https://www.imdb.com/title/tt15239678/dune-part-two", "title": "Dune: Part Two"},
+    ])
+    assert learned == {
+        "BookMyShow": "https://in.bookmyshow.com/movies/dune-part-two/ET00361325",
+        "PVR Cinemas": "https://www.pvrcinemas.com/moviesessions/dune-part-two",
+    }, learned
+    assert get_ratings_store().page_urls(canonical_title(MOVIE)) == learned
+    # Seen again: nothing new to store
+    assert pages.learn_pages(MOVIE, [{"link": learned["BookMyShow"]}]) == {}
+
+
+def test_streaming_parser():
+    """Parsing a page fed in small chunks gives the same result as parsing it whole"""
+    with open(os.path.join(FIXTURES, PAGES["BookMyShow"]), encoding="utf-8") as handle:
+        html = handle.read()
+    whole = pages.RatingPageParser()
+    whole.feed(html)
+    chunked = pages.RatingPageParser()
+    for start in range(0, len(html), 7):
+        chunked.feed(html[start:start + 7])
+    assert whole.result() == chunked.result()
+    assert whole.result()["rating"] == 8.7 and whole.result()["ratingCount"] == 125400
+    # Script and style text never reaches the snippet patterns
+    assert "0/10" not in whole.result()["snippet"] and "1/10" not in whole.result()["snippet"]
+
+
+def test_platform_hosts():
+    """Only hosts on a platform's domains belong to it, whatever the rest of the URL says"""
+    assert platforms.for_link("https://in.bookmyshow.com/movies/dune-part-two").name == "BookMyShow"
+    assert platforms.for_link("https://bookmyshow.com/movies/dune-part-two").name == "BookMyShow"
+    for link in (
+        "http://127.0.0.1:8000/bookmyshow.com/dune-part-two",
+        "https://evil.example/?next=bookmyshow.com",
+        "https://bookmyshow.com.evil.example/dune-part-two",
+        "https://notbookmyshow.com/dune-part-two",
+    ):
+        assert platforms.for_link(link) is None, link
+
+
+def test_unsafe_pages_are_not_learned_or_fetched():
+    """Plain http, IP literal and off-platform URLs are neither learned nor fetched"""
+    adapter = platforms.get("BookMyShow")
+    for url in (
+        "http://in.bookmyshow.com/movies/dune-part-two",
+        "https://127.0.0.1/movies/dune-part-two",
+        "https://[::1]/movies/dune-part-two",
+        "https://localhost/movies/dune-part-two",
+    ):
+        with pytest.raises(ValueError):
+            pages.check_page_url(url)
+    with pytest.raises(ValueError):
+        pages.check_page_url("https://evil.example/movies/dune-part-two", adapter)
+    pages.check_page_url("https://in.bookmyshow.com/movies/dune-part-two", adapter)
+
+    assert pages.learn_pages(MOVIE, [
+        {"link": "http://in.bookmyshow.com/movies/dune-part-two"},
+        {"link": "http://127.0.0.1:8000/bookmyshow.com/dune-part-two"},
+    ]) == {}
+
+
+def test_direct_lookup(fixture_server, monkeypatch):
+    """With every page known, a lookup reads the pages and never searches"""
+    title = canonical_title(MOVIE)
+    get_ratings_store().remember_pages(title, {platform: f"{fixture_server}/{name}" for platform, name in PAGES.items()})
+    monkeypatch.setattr(requests, "request", no_search)
+
+    ratings = fast_path.try_fast_path(MOVIE)
+
+    assert ratings is not None, "direct lookup fell through"
+    by_platform = {item["platform"]: item for item in ratings}
+    for platform, expected in EXPECTED_RATINGS.items():
+        assert abs(by_platform[platform]["movie_rating"] - expected) < 0.01, (platform, by_platform[platform])
+    assert by_platform["BookMyShow"]["positive_review_percentage"] == 92
+    assert "Sci-Fi" in by_platform["BookMyShow"]["type_of_movie"]
+    assert sorted(FixtureHandler.served) == sorted(f"/{name}" for name in PAGES.values())
+
+
+def test_gone_page_is_forgotten(fixture_server):
+    """A page that is gone is dropped from the URL map, so it is learned again"""
+    title = canonical_title("Arrival")
+    get_ratings_store().remember_pages(title, {"Paytm": f"{fixture_server}/paytm-arrival.html"})
+    assert pages.read_known_pages("Arrival") == {}
+    assert get_ratings_store().page_urls(title) == {}
+
+
+def test_refused_page_is_forgotten():
+    """A stored URL that fails the checks (learned by an older, looser version) is dropped, not fetched"""
+    title = canonical_title(MOVIE)
+    get_ratings_store().remember_pages(title, {"BookMyShow": "http://127.0.0.1:8000/bookmyshow.com/dune-part-two"})
+    assert pages.read_known_pages(MOVIE) == {}
+    assert get_ratings_store().page_urls(title) == {}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
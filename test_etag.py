@@ -0,0 +1,109 @@
+import asyncio
+import sys
+
+import httpx
+import pytest
+
+import backend.main as main
+import config
+from backend import encoding
+from backend.main import app, etag_matches
+
+RESULT = {
+    "status": "success",
+    "data": [{
+        "platform": platform,
+        "movie_title": "Arrival",
+        "movie_rating": 7.9,
+        "type_of_movie": "Sci-Fi, Drama",
+        "positive_review_percentage": 86,
+        "negative_review_percentage": 14,
+    } for platform in ("BookMyShow", "Paytm", "PVR Cinemas", "INOX Movies", "Cinepolis")]
+}
+BODY = encoding.dumps(RESULT)
+
+
+@pytest.fixture
+def lookup(monkeypatch):
+    """Serve a fixed body instead of running the agent; set .body and .cacheable to change it"""
+    async def fake_lookup(movie_name, client, on_progress=None):
+        return fake_lookup.body, fake_lookup.cacheable
+
+    fake_lookup.body, fake_lookup.cacheable = BODY, True
+    monkeypatch.setattr(main, "lookup_movie_ratings", fake_lookup)
+    return fake_lookup
+
+
+def get(*header_sets):
+    """GET /movie-ratings/Arrival once per set of request headers"""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get("/movie-ratings/Arrival", headers=headers) for headers in header_sets]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"abd"', False),
+    ('abc', False),
+    ("*", True),
+    (' * ', True),
+    ('"x", W/"abc"', True),
+    ('"x",W/"y"', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+def test_strong_etag_and_revalidation(lookup):
+    first, = get({"Accept-Encoding": "identity"})
+    assert first.status_code == 200
+    assert first.content == BODY
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and first.headers["Cache-Control"] == f"max-age={config.CACHE_TTL}"
+
+    for if_none_match in (etag, "W/" + etag, "*", f'"stale", {etag}'):
+        response, = get({"Accept-Encoding": "identity", "If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    response, = get({"Accept-Encoding": "identity", "If-None-Match": '"stale"'})
+    assert response.status_code == 200 and response.content == BODY
+
+
+def test_compressed_response_has_weak_etag(lookup):
+    assert len(BODY) >= config.COMPRESSION_MIN_SIZE
+    identity, compressed = get({"Accept-Encoding": "identity"}, {"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.content == BODY
+    assert compressed.headers["ETag"] == "W/" + identity.headers["ETag"]
+
+    # The weak tag the client got back revalidates, and the 304 repeats it
+    response, = get({"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == compressed.headers["ETag"]
+
+
+def test_etag_changes_with_body(lookup):
+    before, = get({"Accept-Encoding": "identity"})
+    lookup.body = encoding.dumps({**RESULT, "data": RESULT["data"][:1]})
+    after, = get({"Accept-Encoding": "identity", "If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+
+def test_uncacheable_result_has_no_etag(lookup):
+    lookup.cacheable = False
+    response, = get({"Accept-Encoding": "identity", "If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert response.headers["Cache-Control"] == "no-store"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,57 @@
+import asyncio
+import csv
+import io
+import sys
+
+import httpx
+import pytest
+
+import backend.store as store
+import config
+from backend.main import app
+from backend.store import RatingsStore
+
+ROWS = 23
+
+
+@pytest.fixture(autouse=True)
+def ratings(monkeypatch, tmp_path):
+    ratings_store = RatingsStore(str(tmp_path / "ratings.db"))
+    for index in range(ROWS):
+        ratings_store.record(f"movie {index}", [{
+            "platform": "Paytm",
+            "movie_title": f"Movie {index}",
+            "movie_rating": 7.5,
+            "type_of_movie": "Drama",
+            "positive_review_percentage": 80,
+            "negative_review_percentage": 20,
+        }])
+    monkeypatch.setattr(store, "_ratings_store", ratings_store)
+    monkeypatch.setattr(config, "EXPORT_BATCH_SIZE", 5)
+
+
+async def export(count: int, format: str = "csv"):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.get("/export", params={"format": format}) for _ in range(count)))
+
+
+def test_concurrent_exports():
+    """Each export's batches are fetched on whichever threadpool thread is free"""
+    responses = asyncio.run(export(30))
+    for response in responses:
+        assert response.status_code == 200
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == store.RATING_COLUMNS
+        assert [row[3] for row in rows[1:]] == [f"Movie {index}" for index in range(ROWS)]
+
+
+def test_concurrent_arrow_exports():
+    pa = pytest.importorskip("pyarrow")
+    for response in asyncio.run(export(10, "arrow")):
+        assert response.status_code == 200
+        assert pa.ipc.open_stream(response.content).read_all().num_rows == ROWS
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
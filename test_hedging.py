@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from backend.hedging import Hedger
+from backend.scheduler import OutboundScheduler, RateLimited
+
+
+def trained_hedger(**kwargs) -> Hedger:
+    """Hedger that has seen enough 10 ms calls to hedge after about 10 ms"""
+    hedger = Hedger("test", percentile=95, max_extra_ratio=1.0, **kwargs)
+    for _ in range(hedger.latency.min_samples):
+        hedger.latency.add(0.01)
+    return hedger
+
+
+def slow_first_call():
+    """The first call hangs for a second, later ones answer at once"""
+    calls = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            calls.append(time.monotonic())
+            first = len(calls) == 1
+        if first:
+            time.sleep(1)
+            return "primary"
+        return "duplicate"
+
+    call.calls = calls
+    return call
+
+
+def test_slow_call_is_hedged():
+    call = slow_first_call()
+    assert trained_hedger().call(call) == "duplicate"
+    assert len(call.calls) == 2
+
+
+def test_no_duplicate_while_held_off():
+    call = slow_first_call()
+    assert trained_hedger(hold_off=lambda: True).call(call) == "primary"
+    assert len(call.calls) == 1
+
+
+def test_scheduler_backs_off_after_rate_limit():
+    scheduler = OutboundScheduler("test", requests_per_minute=0, max_retries=1)
+    assert not scheduler.backing_off()
+
+    answers = iter([RateLimited(0.05), "ok"])
+
+    def call():
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert scheduler.call(call) == "ok"
+    assert scheduler.backing_off()
+
+
+def test_scheduler_wait_is_not_hedge_latency():
+    """Inside the scheduler's slot, time spent waiting for it is not taken for a slow call"""
+    scheduler = OutboundScheduler("test", requests_per_minute=0, min_concurrency=1, max_concurrency=1)
+    hedger = Hedger("test", percentile=95, max_extra_ratio=1.0)
+
+    def search():
+        time.sleep(0.05)
+        return "result"
+
+    threads = [threading.Thread(target=scheduler.call, args=(lambda: hedger.call(search),)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Calls ran one at a time, so the last waited about 150 ms for the slot
+    assert max(hedger.latency._samples) < 0.1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
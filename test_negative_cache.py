@@ -0,0 +1,81 @@
+import asyncio
+import sys
+import time
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage
+
+import backend.admission as admission
+import backend.main as main
+import config
+from backend import encoding
+from backend.admission import ClientRateLimiter
+from backend.cache import MemoryCache, TieredCache
+from backend.movie.schema import MovieRatingRequest
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Stand-in for the agent strategy; set .result to change its answer, .calls counts runs"""
+    def resolve(payload, on_progress=None):
+        resolve.calls += 1
+        return resolve.result(payload.movie_name)
+
+    resolve.calls = 0
+    resolve.result = main.not_found_result
+    monkeypatch.setattr(main, "resolve_movie_ratings", resolve)
+    monkeypatch.setattr(main, "ratings_cache", TieredCache(MemoryCache(), MemoryCache(), 60))
+    monkeypatch.setattr(admission, "client_limiter", ClientRateLimiter(per_minute=600, burst=100))
+    return resolve
+
+
+def get(*titles):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(f"/movie-ratings/{title}", headers={"Accept-Encoding": "identity"})
+                    for title in titles]
+    return asyncio.run(run())
+
+
+def test_is_not_found():
+    assert main.is_not_found(encoding.dumps(main.not_found_result("Nope")))
+    assert not main.is_not_found(encoding.dumps({"status": "success", "data": []}))
+    estimated = encoding.dumps(main.estimated_result("Arrival", []))
+    assert not main.is_not_found(estimated) and main.is_short_lived(estimated)
+
+
+def test_not_found_is_cached_for_the_negative_ttl(agent):
+    hits = main.negative_cache_hits.value()
+    first, again, respelled = get("Nonexistent Movie", "Nonexistent Movie", "nonexistent  movie!")
+    assert first.json()["status"] == "not_found" and first.json()["data"] == []
+    assert first.headers["Cache-Control"] == f"max-age={config.NEGATIVE_CACHE_TTL}"
+    # Repeats, however spelled, are answered from the cache under the canonical title
+    assert again.content == respelled.content == first.content
+    assert agent.calls == 1
+    assert main.negative_cache_hits.value() == hits + 2
+
+
+def test_negative_entry_expires(agent, monkeypatch):
+    monkeypatch.setattr(config, "NEGATIVE_CACHE_TTL", 0.2)
+    get("Misspeled Title")
+    time.sleep(0.3)
+    get("Misspeled Title")
+    assert agent.calls == 2
+
+
+def test_estimated_ratings_are_flagged_and_short_lived(agent, monkeypatch):
+    answer = AIMessage(content="On BookMyShow the rating is 8.4/10, and Paytm rates it 8 out of 10.")
+    monkeypatch.setattr(main, "run_agent", lambda prompt, on_progress=None, cancelled=None: {"messages": [answer]})
+    agent.result = lambda movie_name: main.fetch_movie_ratings(MovieRatingRequest(movie_name=movie_name))
+
+    response, = get("Arrival")
+    body = response.json()
+    assert body["status"] == "estimated" and "estimated" in body["message"]
+    assert {item["platform"]: item["movie_rating"] for item in body["data"]} == {"BookMyShow": 8.4, "Paytm": 8.0}
+    assert response.headers["Cache-Control"] == f"max-age={config.NEGATIVE_CACHE_TTL}"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,81 @@
+import sys
+import time
+
+import pytest
+import requests
+from langchain_core.messages import AIMessage, HumanMessage
+
+import backend.movie.planner as planner
+from backend.cache import MemoryCache
+from backend.scheduler import OutboundScheduler
+
+SEARCH_LATENCY = 0.5  # seconds per stubbed Serper call
+PLATFORMS = ["bookmyshow", "paytm", "pvr", "inox", "cinepolis"]
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return {"organic": [{"title": "Dune: Part Two - BookMyShow", "link": "https://in.bookmyshow.com/dune", "snippet": "Rating 8.7/10"}]}
+
+
+def slow_search(method, url, **kwargs):
+    time.sleep(SEARCH_LATENCY)
+    return FakeResponse()
+
+
+class FakeModel:
+    """Asks for one search per platform (or just one), then answers"""
+    def __init__(self, platforms):
+        self.platforms = platforms
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        if messages[-1].type == "tool":
+            return AIMessage(content="[]")
+        return AIMessage(content="", tool_calls=[
+            {"name": "filtered_movie_search", "args": {"query": f"Dune {platform} {time.time()}"}, "id": f"call_{index}"}
+            for index, platform in enumerate(self.platforms)
+        ])
+
+
+@pytest.fixture
+def stubbed_upstreams(monkeypatch):
+    """Serper and the model are stubbed: searches stay out of any shared cache and are not paced against quotas"""
+    cache = MemoryCache()
+    monkeypatch.setattr(planner, "get_shared_cache", lambda: cache)
+    monkeypatch.setattr(planner, "groq_scheduler", OutboundScheduler("groq", requests_per_minute=0))
+    monkeypatch.setattr(planner, "serper_scheduler", OutboundScheduler("serper", requests_per_minute=0, max_concurrency=16))
+    monkeypatch.setattr(requests, "request", slow_search)
+    return monkeypatch
+
+
+def run_turn(monkeypatch, platforms):
+    """Run the agent with a model making one tool call per platform and return the elapsed time"""
+    monkeypatch.setattr(planner, "model", FakeModel(platforms))
+    agent = planner.create_langgraph_agent()
+    start = time.perf_counter()
+    result = agent.invoke({"messages": [HumanMessage(content="Dune: Part Two")]})
+    elapsed = time.perf_counter() - start
+
+    tool_messages = [message for message in result["messages"] if message.type == "tool"]
+    assert len(tool_messages) == len(platforms), tool_messages
+    assert all(message.status == "success" for message in tool_messages), tool_messages
+    return elapsed
+
+
+def test_parallel_tool_calls(stubbed_upstreams):
+    """Five tool calls in one turn take about as long as one"""
+    one = run_turn(stubbed_upstreams, PLATFORMS[:1])
+    five = run_turn(stubbed_upstreams, PLATFORMS)
+
+    print(f"1 tool call: {one:.2f}s, 5 tool calls: {five:.2f}s")
+    assert five < one + SEARCH_LATENCY, f"5 tool calls took {five:.2f}s, 1 took {one:.2f}s"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
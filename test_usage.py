@@ -0,0 +1,135 @@
+import itertools
+import sys
+
+import pytest
+import requests
+from langchain_core.messages import AIMessage, HumanMessage
+
+import backend.movie.planner as planner
+from backend import usage
+from backend.cache import MemoryCache
+from backend.scheduler import OutboundScheduler
+from backend.usage import BudgetExceeded, Usage
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return {"organic": [{"title": "Arrival - BookMyShow", "link": "https://in.bookmyshow.com/arrival", "snippet": "Rating 7.9/10"}]}
+
+
+class SearchingModel:
+    """Asks for another search every turn and never answers, so only a budget ends the run"""
+    def __init__(self):
+        self.calls = 0
+        self.queries = itertools.count()
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": "filtered_movie_search", "args": {"query": f"Arrival {next(self.queries)}"}, "id": f"call_{self.calls}"}],
+            usage_metadata={"input_tokens": 50, "output_tokens": 10, "total_tokens": 60},
+        )
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """The model and Serper are stubbed; .posts counts the searches sent to Serper"""
+    cache = MemoryCache()
+    monkeypatch.setattr(planner, "get_shared_cache", lambda: cache)
+    monkeypatch.setattr(planner, "groq_scheduler", OutboundScheduler("groq", requests_per_minute=0))
+    monkeypatch.setattr(planner, "serper_scheduler", OutboundScheduler("serper", requests_per_minute=0))
+
+    def search(method, url, **kwargs):
+        fake.posts += 1
+        return FakeResponse()
+
+    fake = SearchingModel()
+    fake.posts = 0
+    monkeypatch.setattr(requests, "request", search)
+    monkeypatch.setattr(planner, "model", fake)
+    return fake
+
+
+def run_agent(request_usage: Usage):
+    """Run the agent for one title within the given request usage"""
+    token = usage.usage_var.set(request_usage)
+    try:
+        with usage.track("arrival") as lookup_usage:
+            with pytest.raises(BudgetExceeded) as exceeded:
+                planner.create_langgraph_agent().invoke({"messages": [HumanMessage(content="Arrival")]})
+        return exceeded.value, lookup_usage
+    finally:
+        usage.usage_var.reset(token)
+
+
+def test_child_usage_adds_into_parent():
+    request_usage = Usage()
+    token = usage.usage_var.set(request_usage)
+    try:
+        with usage.track("arrival") as first:
+            usage.record_model_call(AIMessage(content="", usage_metadata={"input_tokens": 30, "output_tokens": 5, "total_tokens": 35}))
+            usage.record_search(cached=False)
+        with usage.track("dune") as second:
+            usage.record_model_call(AIMessage(content="", usage_metadata={"input_tokens": 20, "output_tokens": 4, "total_tokens": 24}))
+            usage.record_search(cached=True)
+            usage.record_search(cached=False)
+    finally:
+        usage.usage_var.reset(token)
+
+    assert first.totals() == {"prompt_tokens": 30, "completion_tokens": 5, "model_calls": 1, "searches": 1, "cached_searches": 0}
+    assert second.totals() == {"prompt_tokens": 20, "completion_tokens": 4, "model_calls": 1, "searches": 1, "cached_searches": 1}
+    assert request_usage.totals() == {"prompt_tokens": 50, "completion_tokens": 9, "model_calls": 2, "searches": 2, "cached_searches": 1}
+    assert request_usage.lookups == 2
+    assert request_usage.headers()["X-Usage-Searches"] == "2"
+
+
+def test_child_is_stopped_by_parent_budget():
+    parent = Usage(token_budget=100)
+    child = Usage("arrival", parent)
+    child.add_model_call(60, 10)
+    child.check_budget()
+    child.add_model_call(25, 5)
+    with pytest.raises(BudgetExceeded) as exceeded:
+        child.check_budget()
+    assert (exceeded.value.budget, exceeded.value.used, exceeded.value.limit) == ("token", 100, 100)
+
+
+def test_token_budget_stops_the_agent(model):
+    stopped = usage.budget_exceeded.value(budget="token")
+    exceeded, lookup_usage = run_agent(Usage(token_budget=100))
+
+    # 60 tokens, then 120: the third turn is refused before the model is called
+    assert exceeded.budget == "token" and exceeded.used == 120
+    assert model.calls == 2
+    assert lookup_usage.tokens == 120
+    assert usage.budget_exceeded.value(budget="token") == stopped + 1
+
+
+def test_search_budget_stops_the_agent(model):
+    exceeded, lookup_usage = run_agent(Usage(search_budget=2))
+
+    # Two searches are sent; the turn after them is refused before the model is called
+    assert exceeded.budget == "search" and exceeded.used == 2
+    assert model.posts == 2
+    assert model.calls == 2
+    assert lookup_usage.searches == 2
+
+    # A search over the budget is refused before it is sent
+    token = usage.usage_var.set(lookup_usage)
+    try:
+        with pytest.raises(BudgetExceeded):
+            planner.serper_search("Arrival elsewhere")
+    finally:
+        usage.usage_var.reset(token)
+    assert model.posts == 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
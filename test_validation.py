@@ -0,0 +1,63 @@
+import math
+import random
+import sys
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from backend.movie.validation import platform_frame, validate_platform_data, validate_platform_frame
+
+# Cells that factorize or the DataFrame constructor could take for one another
+MIXED = [True, False, 1, 0, 1.0, 0.0, "1", "True", 7, 2.5, None, math.nan, "Drama"]
+
+
+def per_record(rows):
+    """The per-record function sees a missing key where the frame has None/NaN"""
+    return validate_platform_data([
+        {key: value for key, value in row.items()
+         if value is not None and not (isinstance(value, float) and math.isnan(value))}
+        for row in rows
+    ])
+
+
+def assert_identical(rows):
+    expected = per_record(rows)
+    validated = validate_platform_frame(platform_frame(rows)).to_dict("records")
+    # Compare types too: 1 == 1.0 == True would hide a difference
+    assert [[(type(value), value) for value in row.values()] for row in validated] == \
+        [[(type(value), value) for value in row.values()] for row in expected]
+
+
+def test_matches_per_record_validation_on_mixed_types():
+    rng = random.Random(7)
+    rows = [{
+        "platform": rng.choice(MIXED + ["Paytm", "BookMyShow"]),
+        "movie_title": rng.choice(MIXED + ["Dune"]),
+        "movie_rating": rng.choice([8.7, "9.1", "N/A", None, math.nan, 12.5, -1, "7", 4.25, True]),
+        "type_of_movie": rng.choice(MIXED),
+        "positive_review_percentage": rng.choice([85, "90", "unknown", None, math.nan, 140, -3, 72.6, True]),
+        "negative_review_percentage": rng.choice([15, "10", None, 40, 27.4, False]),
+    } for _ in range(2000)]
+    assert_identical(rows)
+
+
+@pytest.mark.parametrize("column", ["platform", "movie_title", "type_of_movie"])
+def test_text_column_of_ints_and_none_keeps_the_ints(column):
+    rows = [{column: 1}, {column: None}, {column: 2}, {column: True}, {column: 1.0}]
+    assert_identical(rows)
+    assert validate_platform_frame(platform_frame(rows))[column].tolist()[:3] == \
+        [value[column] for value in per_record(rows)][:3]
+
+
+def test_missing_columns_and_unhashable_cells():
+    rows = [{"platform": ["a", "list"]}, {"movie_title": {"a": 1}}, {}]
+    assert_identical(rows)
+
+
+def test_empty_input():
+    assert validate_platform_frame(platform_frame([])).empty
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -5,12 +5,17 @@ import re
 import json
 import time
 import logging
+import threading
 import requests
+import urllib3
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from urllib.parse import quote
 import streamlit as st
 from typing import Dict, List, Any, Optional, Union, Tuple
 
 import config
+from backend.function_cache import CostAwareCache, cost_aware_cache  # noqa: F401 (re-exported)
 
 # Configure logging
 logging.basicConfig(
@@ -19,16 +24,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Cache decorator for expensive operations
-def st_cache_with_ttl(ttl_seconds=config.CACHE_TTL):
+# Shared HTTP session
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
     """
-    Custom cache decorator with time-to-live (TTL)
+    Return the process-wide HTTP session used for all API calls.
+    
+    The session keeps connections to the API alive between searches (and
+    across Streamlit reruns, since this module is only imported once) and
+    advertises every content coding urllib3 can decode, so compressed
+    responses are accepted.
+    
+    Returns:
+        Shared requests session
     """
-    def decorator(func):
-        # Use streamlit's cache mechanism
-        cached_func = st.cache_data(ttl=ttl_seconds)(func)
-        return cached_func
-    return decorator
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=config.HTTP_POOL_SIZE,
+                pool_maxsize=config.HTTP_POOL_SIZE
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Accept-Encoding"] = urllib3.util.request.ACCEPT_ENCODING
+            session.headers["Connection"] = "keep-alive"
+            _http_session = session
+        return _http_session
 
 # Price extraction and formatting
 def extract_price(price_str: Union[str, float, int, None]) -> float:
@@ -149,7 +174,7 @@ def calculate_duration_estimate(departure_time: str, arrival_time: str) -> str:
     return "Duration information not available"
 
 # API interaction
-@st_cache_with_ttl(ttl_seconds=300)  # Cache for 5 minutes
+@cost_aware_cache(ttl_seconds=300, cacheable=lambda result: result is not None)  # Cache for 5 minutes; failures are retried
 def fetch_itinerary_data(
     origin: str, 
     destination: str, 
@@ -191,7 +216,7 @@ def fetch_itinerary_data(
     
     for attempt in range(max_retries + 1):
         try:
-            response = requests.post(
+            response = get_http_session().post(
                 url, 
                 json=payload,
                 timeout=config.API_TIMEOUT
@@ -232,6 +257,95 @@ def fetch_itinerary_data(
     
     return None
 
+class RatingsPrefetcher:
+    """
+    Fetch movie ratings in background threads and keep the results for instant display.
+
+    Results are revalidated with If-None-Match once they are older than the TTL,
+    so refreshing an unchanged movie costs a 304 instead of a full download.
+    """
+
+    def __init__(self, max_workers: int = config.PREFETCH_WORKERS, ttl_seconds: int = config.CACHE_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._results: Dict[str, Tuple[float, List[Dict[str, Any]], Optional[str]]] = {}
+        self._pending: Dict[str, Future] = {}
+
+    def get(self, movie_name: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return fresh ratings for a movie if they are available.
+        
+        Args:
+            movie_name: Movie name
+            
+        Returns:
+            List of platform ratings, or None if not fetched or expired
+        """
+        with self._lock:
+            entry = self._results.get(movie_name)
+        if entry and time.time() - entry[0] < self.ttl_seconds:
+            return entry[1]
+        return None
+
+    def put(self, movie_name: str, data: List[Dict[str, Any]], etag: Optional[str] = None):
+        """
+        Store ratings fetched elsewhere (e.g. by a foreground search).
+        
+        Args:
+            movie_name: Movie name
+            data: List of platform ratings
+            etag: ETag of the response, if known
+        """
+        with self._lock:
+            self._results[movie_name] = (time.time(), data, etag)
+
+    def prefetch(self, movie_names: List[str], client_id: str = ""):
+        """
+        Start fetching every movie that is not fresh or already in flight.
+        
+        Args:
+            movie_names: Movie names to prefetch concurrently
+            client_id: X-Client-ID of the session asking, so its prefetches are
+                charged to its own rate limit rather than to the frontend's address
+        """
+        for movie_name in movie_names:
+            if self.get(movie_name) is not None:
+                continue
+            with self._lock:
+                if movie_name in self._pending:
+                    continue
+                self._pending[movie_name] = self._executor.submit(self._fetch, movie_name, client_id)
+
+    def _fetch(self, movie_name: str, client_id: str = ""):
+        try:
+            url = f"{config.API_BASE_URL}/movie-ratings/{quote(movie_name, safe='')}"
+            with self._lock:
+                entry = self._results.get(movie_name)
+
+            # Prefetches yield to interactive searches for the backend's model and search quota
+            headers = {"X-Priority": "background"}
+            if client_id:
+                headers["X-Client-ID"] = client_id
+            if entry and entry[2]:
+                headers["If-None-Match"] = entry[2]
+
+            response = get_http_session().get(url, headers=headers, timeout=config.API_TIMEOUT)
+
+            if response.status_code == 304 and entry:
+                self.put(movie_name, entry[1], entry[2])
+            elif response.status_code == 200:
+                data = response.json()
+                if data.get("status") == "success" and data.get("data"):
+                    self.put(movie_name, data["data"], response.headers.get("ETag"))
+            else:
+                logger.warning(f"Prefetch of '{movie_name}' failed: HTTP {response.status_code}")
+        except Exception as e:
+            logger.warning(f"Prefetch of '{movie_name}' failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.pop(movie_name, None)
+
 # Data validation
 def is_valid_date_range(start_date: datetime.date, end_date: datetime.date) -> bool:
     """